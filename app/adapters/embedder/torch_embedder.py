@@ -1,79 +1,167 @@
 # app/adapters/torch_embedder_adapter.py
 import os
 import json
-from typing import List, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, NamedTuple, Tuple
 import numpy as np
 import torch
-from torch import nn
+import torch.nn.functional as F
 from app.core.ports.embedder import EmbedderInterface
-from app.models.skipgram_model import SkipGramModel  
+from app.models.model_registry import ModelRegistry
 from app.utils.config import settings
+from app.utils.metrics import STAGE_SECONDS, TEXTS_ENCODED
+
+_TOKENIZE_SECONDS = STAGE_SECONDS.labels("tokenize")
+_ENCODE_SECONDS = STAGE_SECONDS.labels("encode")
+
+
+class _LoadedModel(NamedTuple):
+    """Immutable snapshot of what encode() needs; swapped as a single reference."""
+    version: str | None
+    word2idx: Dict[str, int]
+    weights: torch.Tensor | None  # (V, D) inference matrix
+
 
 class TorchSkipGramEmbedderAdapter(EmbedderInterface):
     """
     Adapter that:
-    - Loads SkipGram model weights saved by training (models/skipgram.pt)
-    - Loads the saved vocab mapping (models/skipgram_vocab.json)
+    - Loads the current model version from the ModelRegistry (models/CURRENT); the
+      embedding matrix is memory-mapped and wrapped with torch.from_numpy (zero-copy)
+    - Falls back to the legacy models/skipgram.pt + models/skipgram_vocab.json if no version was published
+    - Hot-swaps: at most every MODEL_RELOAD_INTERVAL seconds encode() checks the pointer and,
+      if it moved, loads the new version in a background thread while requests keep using
+      the old one; the swap is a single reference assignment
     - encode(texts): tokenizes by whitespace, averages word embeddings for tokens in vocab
+      (one embedding_bag mean over the whole batch against the loaded weight matrix)
     - train(sentences): convenience wrapper that calls the training function via service (or direct call)
     """
 
-    def __init__(self, model_path: str = None, vocab_path: str = None, device: str | None = None):
+    def __init__(
+        self, model_path: str = None, vocab_path: str = None, device: str | None = None,
+        registry: ModelRegistry | None = None
+    ):
         self.model_path = model_path or settings.MODEL_PATH
         self.vocab_path = vocab_path or settings.VOCAB_PATH
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.model: SkipGramModel | None = None
-        self.word2idx: Dict[str,int] = {}
-        self._load_model_and_vocab()
+        self.registry = registry or ModelRegistry()
+        self.reload_interval = settings.MODEL_RELOAD_INTERVAL
+        self.encode_threads = settings.ENCODE_THREADS
+        self.parallel_min_batch = settings.ENCODE_PARALLEL_MIN_BATCH
+        self._pool: ThreadPoolExecutor | None = None
+        self._reload_lock = threading.Lock()
+        self._next_check = time.monotonic() + self.reload_interval
+        self._state = self._load(self.registry.current_version())
+
+    @property
+    def model_version(self) -> str | None:
+        return self._state.version
+
+    @property
+    def word2idx(self) -> Dict[str, int]:
+        return self._state.word2idx
+
+    def reload(self) -> str | None:
+        """Synchronously load the registry's current version. Returns the active version."""
+        with self._reload_lock:
+            version = self.registry.current_version()
+            if version != self._state.version:
+                self._state = self._load(version)
+        return self._state.version
+
+    def _load(self, version: str | None) -> _LoadedModel:
+        if version is not None:
+            word2idx, embeddings = self.registry.load(version)
+            return _LoadedModel(version, word2idx, torch.from_numpy(embeddings).to(self.device))
+        return self._load_legacy()
 
-    def _load_model_and_vocab(self):
-        # load vocab
+    def _load_legacy(self) -> _LoadedModel:
         if os.path.exists(self.vocab_path):
             with open(self.vocab_path, "r", encoding="utf-8") as f:
-                self.word2idx = json.load(f)
-        else:
-            self.word2idx = {}
-
-        # instantiate model only if vocab exists
-        if self.word2idx:
-            vocab_size = len(self.word2idx)
-            emb_dim = settings.EMBEDDING_DIM
-            model = SkipGramModel(vocab_size=vocab_size, embedding_dim=emb_dim)
-            if os.path.exists(self.model_path):
-                state = torch.load(self.model_path, map_location=self.device)
-                model.load_state_dict(state)
-            model.eval()
-            self.model = model.to(self.device)
+                word2idx = json.load(f)
         else:
+            word2idx = {}
+        if not word2idx:
             # no model/vocab yet
-            self.model = None
+            return _LoadedModel(None, {}, None)
+        if os.path.exists(self.model_path):
+            state = torch.load(self.model_path, map_location=self.device)
+            # only the input embeddings are needed for inference; this also accepts
+            # checkpoints of the negative-sampling / hierarchical-softmax models
+            weights = state["embed.weight"].detach()
+        else:
+            weights = torch.randn(len(word2idx), settings.EMBEDDING_DIM, device=self.device)
+        return _LoadedModel("legacy", word2idx, weights)
+
+    def _current(self) -> _LoadedModel:
+        """Current snapshot; kicks off a background reload when the registry pointer moved."""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            version = self.registry.current_version()
+            if version is not None and version != self._state.version and self._reload_lock.acquire(blocking=False):
+                threading.Thread(target=self._background_reload, args=(version,), name="model-reload", daemon=True).start()
+        return self._state
+
+    def _background_reload(self, version: str) -> None:
+        try:
+            self._state = self._load(version)
+        except Exception:
+            # keep serving the previous version; the next check retries
+            pass
+        finally:
+            self._reload_lock.release()
 
-    def encode(self, texts: List[str]) -> List[List[float]]:
+    def encode(self, texts: List[str]) -> np.ndarray:
         """
-        Encode a list of texts into embeddings.
-        Strategy: average word embeddings for tokens present in vocab.
+        Encode a list of texts into an (N, D) float32 array of embeddings.
+        Strategy: average word embeddings for tokens present in vocab; texts with no
+        known token get a zero vector. Large batches are split across encode_threads
+        (embedding_bag releases the GIL).
         """
-        if not self.model or not self.word2idx:
+        return self.encode_versioned(texts)[0]
+
+    def encode_versioned(self, texts: List[str]) -> Tuple[np.ndarray, str | None]:
+        """encode() plus the model version that produced the vectors (one snapshot for the whole batch)."""
+        state = self._current()
+        if state.weights is None:
             # fallback: random small vectors to avoid crashing the pipeline
-            return [np.random.randn(settings.EMBEDDING_DIM).astype(np.float32).tolist() for _ in texts]
+            return np.random.randn(len(texts), settings.EMBEDDING_DIM).astype(np.float32), None
 
-        # get word embedding matrix from model.embed.weight (nn.Embedding)
-        # model.embed.weight shape: (vocab_size, emb_dim)
-        with torch.no_grad():
-            emb_weights = self.model.embed.weight.cpu().numpy()  # (V, D)
+        encode_batch = partial(self._encode_batch, state=state)
+        if self.encode_threads > 1 and len(texts) >= self.parallel_min_batch:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.encode_threads, thread_name_prefix="encode")
+            step = -(-len(texts) // self.encode_threads)
+            shards = [texts[i:i + step] for i in range(0, len(texts), step)]
+            return np.concatenate(list(self._pool.map(encode_batch, shards))), state.version
+        return encode_batch(texts), state.version
 
-        results = []
+    def _encode_batch(self, texts: List[str], state: _LoadedModel) -> np.ndarray:
+        # flatten all token ids of the batch + per-text offsets for embedding_bag
+        start = time.perf_counter()
+        word2idx = state.word2idx
+        ids: List[int] = []
+        offsets: List[int] = []
         for text in texts:
-            tokens = [t.lower() for t in text.split()]
-            idxs = [self.word2idx[t] for t in tokens if t in self.word2idx]
-            if not idxs:
-                # no known tokens -> zero vector
-                vec = np.zeros(settings.EMBEDDING_DIM, dtype=np.float32)
-            else:
-                vecs = emb_weights[idxs]           # (n_tokens, D)
-                vec = np.mean(vecs, axis=0).astype(np.float32)
-            results.append(vec.tolist())
-        return results
+            offsets.append(len(ids))
+            ids.extend(idx for idx in map(word2idx.get, text.lower().split()) if idx is not None)
+        tokenized = time.perf_counter()
+        device = state.weights.device
+        with torch.no_grad():
+            out = F.embedding_bag(
+                torch.from_numpy(np.asarray(ids, dtype=np.int64)).to(device),
+                state.weights,
+                torch.from_numpy(np.asarray(offsets, dtype=np.int64)).to(device),
+                mode="mean",
+            )
+        vectors = out.cpu().numpy().astype(np.float32, copy=False)
+        _TOKENIZE_SECONDS.observe(tokenized - start)
+        _ENCODE_SECONDS.observe(time.perf_counter() - tokenized)
+        TEXTS_ENCODED.inc(len(texts))
+        return vectors
 
     def train(self, sentences: List[str], **train_kwargs):
         """
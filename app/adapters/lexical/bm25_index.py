@@ -0,0 +1,418 @@
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+from app.core.ports.lexical_index import LexicalIndexInterface, PendingDocument
+from app.utils.config import settings
+from app.utils.metrics import CACHE_HITS, CACHE_MISSES, STAGE_SECONDS
+from app.utils.snapshot import load_snapshot, save_snapshot
+
+_LEXICAL_SECONDS = STAGE_SECONDS.labels("lexical")
+_SCORED_HITS, _SCORED_MISSES = CACHE_HITS.labels("lexical_scores"), CACHE_MISSES.labels("lexical_scores")
+_DECODED_HITS, _DECODED_MISSES = CACHE_HITS.labels("lexical_postings"), CACHE_MISSES.labels("lexical_postings")
+
+# words, keeping codes such as "err-404", "v2.3.1" or "x86_64" as one term
+_TOKEN = re.compile(r"\w+(?:[-.]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased NFC terms of a text, as indexed and queried by BM25Index."""
+    return _TOKEN.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """LEB128 varints of non-negative integers (vectorized)."""
+    v = np.asarray(values, dtype=np.uint64)
+    if not len(v):
+        return b""
+    nbytes = np.ones(len(v), dtype=np.int64)
+    rest = v >> np.uint64(7)
+    while rest.any():
+        nbytes += rest > 0
+        rest >>= np.uint64(7)
+    ends = np.cumsum(nbytes)
+    starts = ends - nbytes
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+    for j in range(int(nbytes.max())):
+        sel = nbytes > j
+        byte = (v[sel] >> np.uint64(7 * j)) & np.uint64(0x7F)
+        more = (nbytes[sel] > j + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + j] = byte | more
+    return out.tobytes()
+
+
+def decode_varints(buf: bytes) -> np.ndarray:
+    """Inverse of encode_varints (vectorized)."""
+    b = np.frombuffer(buf, dtype=np.uint8)
+    if not len(b):
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(b < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shift = 7 * (np.arange(len(b)) - np.repeat(starts, ends - starts + 1))
+    return np.add.reduceat((b & 0x7F).astype(np.int64) << shift, starts)
+
+
+def _append_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class _PendingPostings(PendingDocument):
+    """
+    Postings of one document, built one chunk at a time before its chunk ids are known:
+    per term, the position of its first and last chunk plus the varints that follow the
+    first id delta (tf, then (position delta, tf) pairs). Committing only has to prepend
+    that first delta, so the index lock is held O(terms) instead of O(postings).
+    """
+
+    def __init__(self, index: "BM25Index"):
+        self._index = index
+        self.lengths: List[int] = []
+        self.terms: Dict[str, list] = {}  # term -> [first position, last position, bytearray]
+
+    def add(self, chunk: str) -> None:
+        pos = len(self.lengths)
+        counts = Counter(tokenize(chunk))
+        self.lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            entry = self.terms.get(term)
+            if entry is None:
+                tail = bytearray()
+                self.terms[term] = [pos, pos, tail]
+            else:
+                tail = entry[2]
+                _append_varint(tail, pos - entry[1])
+                entry[1] = pos
+            _append_varint(tail, tf)
+
+    def commit(self, doc_id: str) -> None:
+        self._index._commit(doc_id, self)
+
+
+class BM25Index(LexicalIndexInterface):
+    """
+    In-process BM25 inverted index over the stored chunks.
+    - Every chunk gets a sequential internal id; a document's chunks are consecutive ids
+    - One posting list per term: (id delta, term frequency) pairs as varints in a bytearray.
+      New chunks always get higher ids, so indexing a document only appends; hot lists are
+      decoded (vectorized) into an LRU of numpy arrays of settings.LEXICAL_DECODED_CACHE terms
+    - The per-chunk BM25 length norms k1 * (1 - b + b * len / avgdl) are precomputed in one
+      array, refreshed lazily after writes; document frequencies are counted on the live
+      postings, so deletes only clear a liveness bit. The resulting per-term score arrays
+      are cached until the next write, so a query is mostly lookups plus a top-k
+    - Postings are compacted (dead entries dropped, ids renumbered) once a third of the ids are dead
+    - persist()/load() snapshot the index (npz arrays plus a JSON header, no pickle) to
+      settings.LEXICAL_INDEX_PATH every settings.LEXICAL_PERSIST_EVERY document changes;
+      the storage service reconciles it with the stored documents on startup
+    """
+
+    def __init__(self, index_path: str = None, k1: float = None, b: float = None):
+        self.index_path = str(index_path or settings.LEXICAL_INDEX_PATH)
+        self.k1 = settings.BM25_K1 if k1 is None else k1
+        self.b = settings.BM25_B if b is None else b
+        self.persist_every = settings.LEXICAL_PERSIST_EVERY
+        self.cache_size = settings.LEXICAL_DECODED_CACHE
+        self._lock = threading.RLock()
+        self._persist_lock = threading.Lock()  # one snapshot writer at a time
+        self._reset()
+        if os.path.exists(self.index_path):
+            self.load()
+
+    def _reset(self) -> None:
+        self._postings: Dict[str, bytearray] = {}
+        self._last: Dict[str, int] = {}  # last chunk id appended to each posting list
+        self._decoded: OrderedDict[str, Tuple[np.ndarray, np.ndarray]] = OrderedDict()
+        self._scored: OrderedDict[str, Tuple[np.ndarray, np.ndarray]] = OrderedDict()  # cleared on writes
+        self._chunk_doc: List[str] = []  # chunk id -> doc_id
+        self._chunk_pos = np.empty(1024, dtype=np.int32)  # chunk id -> index within its document
+        self._lengths = np.empty(1024, dtype=np.float32)  # chunk id -> number of terms
+        self._live = np.zeros(1024, dtype=bool)
+        self._doc_chunks: Dict[str, Tuple[int, int]] = {}  # doc_id -> (first chunk id, count)
+        self._next = 0
+        self._live_chunks = 0
+        self._total_length = 0.0
+        self._norms: np.ndarray | None = None
+        self._dirty = 0
+
+    # ------------------------------------------------------------------
+    # LexicalIndexInterface
+    # ------------------------------------------------------------------
+    def new_document(self) -> PendingDocument:
+        # tokenized outside the lock, chunk by chunk, so queries are not held up by a large document
+        return _PendingPostings(self)
+
+    def remove_document(self, doc_id: str) -> bool:
+        with self._lock:
+            removed = self._remove(doc_id)
+            if removed:
+                if self._next - self._live_chunks > max(1024, self._next // 3):
+                    self.compact()
+                self._dirty += 1
+        if removed:
+            self._maybe_persist()
+        return removed
+
+    def search(self, query: str, top_k: int = 10, doc_ids: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+        with _LEXICAL_SECONDS.time():
+            return self._search(query, top_k, doc_ids)
+
+    def _search(self, query: str, top_k: int, doc_ids: Iterable[str] | None) -> List[Dict[str, Any]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._live_chunks or top_k <= 0:
+                return []
+            parts = [scored for scored in (self._term_scores(term) for term in terms) if len(scored[0])]
+            if not parts:
+                return []
+            cids, scores = self._merge(parts)
+            if doc_ids is not None:
+                keep = self._in_documents(cids, doc_ids)
+                cids, scores = cids[keep], scores[keep]
+            k = min(top_k, len(cids))
+            if not k:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(cids) else np.arange(len(cids))
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"doc_id": self._chunk_doc[c], "chunk_index": int(self._chunk_pos[c]), "score": float(scores[i])}
+                for i, c in zip(top, cids[top])
+            ]
+
+    def documents(self) -> List[str]:
+        with self._lock:
+            return list(self._doc_chunks)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self._doc_chunks),
+                "chunks": self._live_chunks,
+                "dead_chunks": self._next - self._live_chunks,
+                "terms": len(self._postings),
+                "postings_bytes": sum(len(p) for p in self._postings.values()),
+                "avg_chunk_terms": self._total_length / self._live_chunks if self._live_chunks else 0.0,
+                "decoded_cached": len(self._decoded),
+            }
+
+    def persist(self) -> None:
+        """
+        Write an atomic snapshot of the index to index_path. The state is copied under the
+        index lock and written after releasing it, so queries and commits are not held up
+        by the disk write.
+        """
+        with self._persist_lock:
+            with self._lock:
+                terms = list(self._postings)
+                postings = [bytes(self._postings[term]) for term in terms]
+                header = {"terms": terms, "chunk_doc": list(self._chunk_doc), "doc_chunks": dict(self._doc_chunks)}
+                arrays = {
+                    "last": np.fromiter((self._last[term] for term in terms), dtype=np.int64, count=len(terms)),
+                    "chunk_pos": self._chunk_pos[:self._next].copy(),
+                    "lengths": self._lengths[:self._next].copy(),
+                    "live": self._live[:self._next].copy(),
+                }
+                self._dirty = 0
+            arrays["posting_sizes"] = np.fromiter(map(len, postings), dtype=np.int64, count=len(postings))
+            arrays["postings"] = np.frombuffer(b"".join(postings), dtype=np.uint8)
+            save_snapshot(self.index_path, header, arrays)
+
+    def load(self) -> None:
+        """Restore the index from the last snapshot (if any)."""
+        if not os.path.exists(self.index_path):
+            return
+        header, arrays = load_snapshot(self.index_path)
+        data = arrays["postings"].tobytes()
+        ends = np.cumsum(arrays["posting_sizes"]).tolist()
+        terms = header["terms"]
+        with self._lock:
+            self._reset()
+            self._postings = {term: bytearray(data[start:end]) for term, start, end in zip(terms, [0] + ends, ends)}
+            self._last = dict(zip(terms, arrays["last"].tolist()))
+            self._chunk_doc = header["chunk_doc"]
+            self._next = len(self._chunk_doc)
+            self._reserve(self._next)
+            self._chunk_pos[:self._next] = arrays["chunk_pos"]
+            self._lengths[:self._next] = arrays["lengths"]
+            self._live[:self._next] = arrays["live"]
+            self._doc_chunks = {doc_id: tuple(span) for doc_id, span in header["doc_chunks"].items()}
+            live = self._live[:self._next]
+            self._live_chunks = int(live.sum())
+            self._total_length = float(self._lengths[:self._next][live].sum())
+
+    def close(self) -> None:
+        if self._dirty:
+            self.persist()
+
+    def compact(self) -> None:
+        """Drop the postings of deleted chunks and renumber the live ones densely."""
+        with self._lock:
+            live = np.flatnonzero(self._live[:self._next])
+            new_id = np.full(self._next, -1, dtype=np.int64)
+            new_id[live] = np.arange(len(live))
+            for term in list(self._postings):
+                cids, tfs = self._decode(self._postings[term])
+                keep = new_id[cids] >= 0
+                if not keep.any():
+                    del self._postings[term]
+                    del self._last[term]
+                    continue
+                cids = new_id[cids[keep]]
+                self._postings[term] = self._encode(cids, tfs[keep])
+                self._last[term] = int(cids[-1])
+            self._decoded.clear()
+            self._chunk_doc = [self._chunk_doc[c] for c in live]
+            count = len(live)
+            self._chunk_pos[:count] = self._chunk_pos[live]
+            self._lengths[:count] = self._lengths[live]
+            self._live[:count] = True
+            self._live[count:] = False
+            self._doc_chunks = {doc_id: (int(new_id[first]) if n else 0, n) for doc_id, (first, n) in self._doc_chunks.items()}
+            self._next = count
+            self._invalidate()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _reserve(self, n: int) -> None:
+        if n <= len(self._lengths):
+            return
+        capacity = max(n, 2 * len(self._lengths))
+        for name in ("_chunk_pos", "_lengths", "_live"):
+            old = getattr(self, name)
+            grown = np.zeros(capacity, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _commit(self, doc_id: str, doc: _PendingPostings) -> None:
+        count = len(doc.lengths)
+        with self._lock:
+            self._remove(doc_id)
+            first = self._next
+            self._reserve(first + count)
+            self._chunk_doc.extend([doc_id] * count)
+            self._chunk_pos[first:first + count] = np.arange(count)
+            self._lengths[first:first + count] = doc.lengths
+            self._live[first:first + count] = True
+            self._next += count
+            for term, (first_pos, last_pos, tail) in doc.terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = bytearray()
+                _append_varint(postings, first + first_pos - self._last.get(term, -1))
+                postings += tail
+                self._last[term] = first + last_pos
+                self._decoded.pop(term, None)
+            self._doc_chunks[doc_id] = (first, count)
+            self._live_chunks += count
+            self._total_length += float(sum(doc.lengths))
+            self._invalidate()
+            self._dirty += 1
+        self._maybe_persist()
+
+    def _remove(self, doc_id: str) -> bool:
+        span = self._doc_chunks.pop(doc_id, None)
+        if span is None:
+            return False
+        first, count = span
+        self._live[first:first + count] = False
+        self._live_chunks -= count
+        self._total_length -= float(self._lengths[first:first + count].sum())
+        self._invalidate()
+        return True
+
+    def _invalidate(self) -> None:
+        self._norms = None
+        self._scored.clear()
+
+    def _maybe_persist(self) -> None:
+        # called after releasing the index lock (see persist)
+        if self.persist_every and self._dirty >= self.persist_every:
+            self.persist()
+
+    def _norm_array(self) -> np.ndarray:
+        if self._norms is None:
+            avgdl = self._total_length / self._live_chunks if self._live_chunks else 1.0
+            lengths = self._lengths[:self._next]
+            self._norms = self.k1 * (1.0 - self.b + self.b * lengths / max(avgdl, 1e-9))
+        return self._norms
+
+    def _term_scores(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(live chunk ids, BM25 score of the term in each), cached until the next write."""
+        cached = self._scored.get(term)
+        if cached is not None:
+            self._scored.move_to_end(term)
+            _SCORED_HITS.inc()
+            return cached
+        _SCORED_MISSES.inc()
+        cids, tfs = self._term(term)
+        live = self._live[cids]
+        cids, tfs = cids[live], tfs[live]
+        df = len(cids)
+        idf = math.log(1.0 + (self._live_chunks - df + 0.5) / (df + 0.5))
+        scored = (cids, (idf * (self.k1 + 1.0)) * tfs / (tfs + self._norm_array()[cids]))
+        if self.cache_size:
+            self._scored[term] = scored
+            if len(self._scored) > self.cache_size:
+                self._scored.popitem(last=False)
+        return scored
+
+    def _term(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._decoded.get(term)
+        if cached is not None:
+            self._decoded.move_to_end(term)
+            _DECODED_HITS.inc()
+            return cached
+        _DECODED_MISSES.inc()
+        postings = self._postings.get(term)
+        if postings is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        decoded = self._decode(postings)
+        if self.cache_size:
+            self._decoded[term] = decoded
+            if len(self._decoded) > self.cache_size:
+                self._decoded.popitem(last=False)
+        return decoded
+
+    @staticmethod
+    def _decode(postings: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        values = decode_varints(bytes(postings))
+        return np.cumsum(values[0::2]) - 1, values[1::2].astype(np.float32)
+
+    @staticmethod
+    def _encode(cids: np.ndarray, tfs: np.ndarray) -> bytearray:
+        pairs = np.empty(2 * len(cids), dtype=np.int64)
+        pairs[0::2] = np.diff(cids, prepend=-1)
+        pairs[1::2] = tfs
+        return bytearray(encode_varints(pairs))
+
+    def _merge(self, parts: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sum the per-term scores of chunks matched by several query terms."""
+        if len(parts) == 1:
+            return parts[0]
+        cids = np.concatenate([c for c, _ in parts])
+        scores = np.concatenate([s for _, s in parts])
+        if len(cids) > self._next // 8:
+            # dense accumulation is cheaper than sorting once the terms cover much of the corpus
+            dense = np.bincount(cids, weights=scores, minlength=self._next)
+            cids = np.flatnonzero(dense)
+            return cids, dense[cids]
+        order = np.argsort(cids, kind="stable")
+        cids, scores = cids[order], scores[order]
+        starts = np.flatnonzero(np.concatenate(([True], cids[1:] != cids[:-1])))
+        return cids[starts], np.add.reduceat(scores, starts)
+
+    def _in_documents(self, cids: np.ndarray, doc_ids: Iterable[str]) -> np.ndarray:
+        spans = sorted(self._doc_chunks[d] for d in set(doc_ids) if d in self._doc_chunks)
+        if not spans:
+            return np.zeros(len(cids), dtype=bool)
+        starts = np.array([first for first, _ in spans])
+        ends = np.array([first + n for first, n in spans])
+        slot = np.searchsorted(starts, cids, side="right") - 1
+        return (slot >= 0) & (cids < ends[np.maximum(slot, 0)])
@@ -0,0 +1,177 @@
+import mmap
+import os
+import struct
+from typing import Iterable, List
+
+import numpy as np
+
+MAGIC = b"MCPDOC\x00\x01"
+# magic, flags, n_chunks, text_len, block_size, n_blocks, text_pos, offsets_pos, blocks_pos
+_HEADER = struct.Struct("<8sQQQQQQQQ")
+FLAG_ZSTD = 1
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd document compression requires the 'zstandard' package") from None
+    return zstandard
+
+
+class CompactDocumentWriter:
+    """
+    Writes one document as a single .doc file:
+        [header][text region][chunk offsets (n, 2) uint64][block table (m, 2) uint64]
+    The chunks overlap (see split_into_chunks), so the text is stored only once: each new
+    chunk is merged onto the tail of the text written so far and recorded as a (start, end)
+    byte range. With compression the text region is a sequence of independent zstd frames
+    of `block_size` uncompressed bytes, listed in the block table as (file offset, length).
+    Only the current tail and block are kept in memory.
+    """
+
+    def __init__(self, path: str, compression: str = "none", block_size: int = 1 << 16, level: int = 3):
+        self.path = path
+        self.block_size = block_size
+        self._compressor = _zstd().ZstdCompressor(level=level) if compression == "zstd" else None
+        self._flags = FLAG_ZSTD if self._compressor else 0
+        self._file = open(path, "wb")
+        self._file.write(b"\0" * _HEADER.size)
+        self._tail = ""  # end of the text written so far (longest possible overlap)
+        self._tail_cap = 0
+        self._text_len = 0  # bytes of text written
+        self._offsets: List[tuple] = []
+        self._pending = bytearray()  # uncompressed bytes of the current block
+        self._blocks: List[tuple] = []
+
+    def add(self, chunk: str) -> None:
+        overlap = self._overlap(chunk)
+        new_text = chunk[overlap:]
+        start = self._text_len - len(chunk[:overlap].encode("utf-8"))
+        self._write_text(new_text.encode("utf-8"))
+        self._offsets.append((start, self._text_len))
+        self._tail_cap = max(self._tail_cap, len(chunk))
+        self._tail = (self._tail + new_text)[-self._tail_cap:]
+
+    @property
+    def count(self) -> int:
+        return len(self._offsets)
+
+    def _overlap(self, chunk: str) -> int:
+        """Longest suffix of the text so far that is a prefix of chunk."""
+        if not chunk:
+            return 0
+        tail = self._tail
+        # candidate suffixes start where tail holds chunk[0]; the first match is the longest
+        p = tail.find(chunk[0], max(0, len(tail) - len(chunk)))
+        while p != -1:
+            if chunk.startswith(tail[p:]):
+                return len(tail) - p
+            p = tail.find(chunk[0], p + 1)
+        return 0
+
+    def _write_text(self, data: bytes) -> None:
+        self._text_len += len(data)
+        if not self._compressor:
+            self._file.write(data)
+            return
+        self._pending += data
+        while len(self._pending) >= self.block_size:
+            self._flush_block(bytes(self._pending[:self.block_size]))
+            del self._pending[:self.block_size]
+
+    def _flush_block(self, data: bytes) -> None:
+        frame = self._compressor.compress(data)
+        self._blocks.append((self._file.tell(), len(frame)))
+        self._file.write(frame)
+
+    def close(self) -> None:
+        if self._compressor and self._pending:
+            self._flush_block(bytes(self._pending))
+            self._pending.clear()
+        offsets_pos = self._file.tell()
+        self._file.write(np.asarray(self._offsets, dtype=np.uint64).reshape(-1, 2).tobytes())
+        blocks_pos = self._file.tell()
+        self._file.write(np.asarray(self._blocks, dtype=np.uint64).reshape(-1, 2).tobytes())
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(
+            MAGIC, self._flags, len(self._offsets), self._text_len, self.block_size,
+            len(self._blocks), _HEADER.size, offsets_pos, blocks_pos,
+        ))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def abort(self) -> None:
+        self._file.close()
+        os.remove(self.path)
+
+
+def write_document(path: str, chunks: Iterable[str], compression: str = "none", block_size: int = 1 << 16, level: int = 3) -> int:
+    """Write chunks to `path` (atomically, through path + ".tmp"). Returns the chunk count."""
+    writer = CompactDocumentWriter(f"{path}.tmp", compression, block_size, level)
+    try:
+        for chunk in chunks:
+            writer.add(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    os.replace(f"{path}.tmp", path)
+    return writer.count
+
+
+class CompactDocument:
+    """
+    Read side of the .doc format. The file is memory-mapped: opening it reads only the
+    header, chunk(i) touches just the bytes (or zstd blocks) of that chunk.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.flags, n_chunks, self.text_len, self.block_size,
+         n_blocks, self.text_pos, offsets_pos, blocks_pos) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a compact document: {path}")
+        self.offsets = np.frombuffer(self._mm, dtype=np.uint64, count=n_chunks * 2, offset=offsets_pos).reshape(-1, 2)
+        self.blocks = np.frombuffer(self._mm, dtype=np.uint64, count=n_blocks * 2, offset=blocks_pos).reshape(-1, 2)
+        self._decompressor = _zstd().ZstdDecompressor() if self.flags & FLAG_ZSTD else None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _text(self, start: int, end: int) -> bytes:
+        if self._decompressor is None:
+            return self._mm[self.text_pos + start:self.text_pos + end]
+        first, last = start // self.block_size, max(start, end - 1) // self.block_size
+        data = b"".join(
+            self._decompressor.decompress(self._mm[int(pos):int(pos) + int(length)], max_output_size=self.block_size)
+            for pos, length in self.blocks[first:last + 1]
+        )
+        base = first * self.block_size
+        return data[start - base:end - base]
+
+    def chunk(self, index: int) -> str:
+        start, end = (int(x) for x in self.offsets[index])
+        return self._text(start, end).decode("utf-8")
+
+    def chunks(self) -> List[str]:
+        text = self._text(0, self.text_len)  # one pass over the blocks instead of one per chunk
+        return [text[int(start):int(end)].decode("utf-8") for start, end in self.offsets]
+
+    def text(self) -> str:
+        """The deduplicated text all chunks are slices of."""
+        return self._text(0, self.text_len).decode("utf-8") if self.text_len else ""
+
+    def close(self) -> None:
+        # drop the numpy views before unmapping
+        self.offsets = self.blocks = None
+        self._mm.close()
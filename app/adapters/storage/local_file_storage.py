@@ -1,41 +1,142 @@
+import json
 import os
+import threading
+import time
 import uuid
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Tuple
+from app.adapters.storage.compact_doc import CompactDocument, write_document
 from app.core.ports.file_storage import FileStorageInterface
+from app.utils.config import settings
+from app.utils.content_hash import document_hash
+from app.utils.metrics import STORAGE_SECONDS
+
+DOC_EXTENSIONS = (".doc", ".chunks", ".txt")
+PAGES_EXTENSION = ".pages"  # JSON [[first, last], ...] source pages of each chunk (PDF/DOCX uploads)
+HASH_LOG = "content_hashes.log"
+
+_READ_SECONDS = STORAGE_SECONDS.labels("read")
+_WRITE_SECONDS = STORAGE_SECONDS.labels("write")
+_DELETE_SECONDS = STORAGE_SECONDS.labels("delete")
+
+
+class _ProducerClock:
+    """
+    Iterates `items` and accumulates the time spent producing them, so a streaming write
+    can report its own I/O time without the extraction/chunking that feeds it.
+    """
+
+    def __init__(self, items: Iterable[str]):
+        self.items = iter(items)
+        self.seconds = 0.0
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            start = time.perf_counter()
+            item = next(self.items, None)
+            self.seconds += time.perf_counter() - start
+            if item is None:
+                return
+            yield item
 
 class LocalFileStorageAdapter(FileStorageInterface):
     """
     Simple local file storage adapter.
-    - Saves raw text into data/docs/<doc_id>.txt
-    - Saves chunks into data/docs/<doc_id>.chunks (one chunk per line)
+    - Compact format (settings.DOC_STORAGE_FORMAT = "compact", default): one data/docs/<doc_id>.doc
+      holding the text once plus (start, end) chunk offsets, optionally zstd-compressed
+      in blocks (see app.adapters.storage.compact_doc); loads are memory-mapped
+    - Legacy format: raw text into data/docs/<doc_id>.txt and
+      chunks into data/docs/<doc_id>.chunks (joined by a ---CHUNK--- marker)
+    Documents in either format are readable; migrate_docs converts legacy ones.
+    Paginated uploads also get a data/docs/<doc_id>.pages file with the source pages of each chunk.
+    Content hashes of stored documents are kept in an append-only data/docs/content_hashes.log
+    ("<hash> <doc_id>" lines), built from the existing documents the first time it is needed.
     """
 
-    def __init__(self, base_path: str = "data/docs"):
+    def __init__(self, base_path: str = "data/docs", storage_format: str | None = None, compression: str | None = None):
         self.base_path = base_path
+        self.storage_format = (storage_format or settings.DOC_STORAGE_FORMAT).lower()
+        self.compression = (compression or settings.DOC_COMPRESSION).lower()
         os.makedirs(self.base_path, exist_ok=True)
+        self._hashes: Dict[str, str] | None = None
+        self._hash_lock = threading.Lock()
+
+    def _path(self, doc_id: str, ext: str) -> str:
+        return os.path.join(self.base_path, f"{doc_id}{ext}")
 
     def save(self, chunks: List[str]) -> str:
         """
         Save list of chunks and return generated doc_id.
         """
+        if self.storage_format == "compact":
+            return self.save_stream(chunks)
         doc_id = str(uuid.uuid4())
-        raw_path = os.path.join(self.base_path, f"{doc_id}.txt")
-        chunks_path = os.path.join(self.base_path, f"{doc_id}.chunks")
-        # Save raw concatenated
-        with open(raw_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(chunks))
-        # Save chunks separately (fallback)
-        with open(chunks_path, "w", encoding="utf-8") as f:
-            f.write("\n---CHUNK---\n".join(chunks))
+        raw_path = self._path(doc_id, ".txt")
+        chunks_path = self._path(doc_id, ".chunks")
+        with _WRITE_SECONDS.time():
+            # Save raw concatenated
+            with open(raw_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(chunks))
+            # Save chunks separately (fallback)
+            with open(chunks_path, "w", encoding="utf-8") as f:
+                f.write("\n---CHUNK---\n".join(chunks))
         return doc_id
 
+    def save_stream(self, chunks: Iterable[str]) -> str:
+        """
+        Same files as save(), written chunk by chunk as the iterable produces them.
+        Files are written under temporary names and renamed at the end, so a partially
+        ingested document is never visible.
+        """
+        doc_id = str(uuid.uuid4())
+        started = time.perf_counter()
+        chunks = _ProducerClock(chunks)
+        if self.storage_format == "compact":
+            self.write_compact(doc_id, chunks)
+            _WRITE_SECONDS.observe(time.perf_counter() - started - chunks.seconds)
+            return doc_id
+        raw_path = self._path(doc_id, ".txt")
+        chunks_path = self._path(doc_id, ".chunks")
+        try:
+            with open(f"{raw_path}.tmp", "w", encoding="utf-8") as raw, \
+                    open(f"{chunks_path}.tmp", "w", encoding="utf-8") as sep:
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        raw.write("\n")
+                        sep.write("\n---CHUNK---\n")
+                    raw.write(chunk)
+                    sep.write(chunk)
+            os.replace(f"{raw_path}.tmp", raw_path)
+            os.replace(f"{chunks_path}.tmp", chunks_path)
+        except BaseException:
+            for path in (f"{raw_path}.tmp", f"{chunks_path}.tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        _WRITE_SECONDS.observe(time.perf_counter() - started - chunks.seconds)
+        return doc_id
+
+    def write_compact(self, doc_id: str, chunks: Iterable[str]) -> int:
+        """(Over)write the .doc file of doc_id. Returns the number of chunks written."""
+        return write_document(
+            self._path(doc_id, ".doc"), chunks, self.compression,
+            block_size=settings.DOC_BLOCK_SIZE, level=settings.DOC_ZSTD_LEVEL,
+        )
+
     def load(self, doc_id: str) -> List[str]:
         """
         Return list of chunks for a given doc_id.
-        Prefer the .chunks file; fall back to .txt split by newline.
+        Prefer the compact .doc file, then the .chunks file; fall back to .txt split by newline.
         """
-        chunks_path = os.path.join(self.base_path, f"{doc_id}.chunks")
-        raw_path = os.path.join(self.base_path, f"{doc_id}.txt")
+        with _READ_SECONDS.time():
+            return self._load(doc_id)
+
+    def _load(self, doc_id: str) -> List[str]:
+        doc_path = self._path(doc_id, ".doc")
+        chunks_path = self._path(doc_id, ".chunks")
+        raw_path = self._path(doc_id, ".txt")
+        if os.path.exists(doc_path):
+            with CompactDocument(doc_path) as doc:
+                return doc.chunks()
         if os.path.exists(chunks_path):
             with open(chunks_path, "r", encoding="utf-8") as f:
                 content = f.read()
@@ -47,14 +148,123 @@ class LocalFileStorageAdapter(FileStorageInterface):
             return [p for p in text.split("\n") if p.strip()]
         return []
 
+    def load_chunk(self, doc_id: str, index: int) -> str:
+        """
+        Return a single chunk; for compact documents only its bytes (or zstd block) are read.
+        """
+        doc_path = self._path(doc_id, ".doc")
+        with _READ_SECONDS.time():
+            if os.path.exists(doc_path):
+                with CompactDocument(doc_path) as doc:
+                    return doc.chunk(index)
+            return self._load(doc_id)[index]
+
+    def load_chunks(self, doc_id: str, indices: List[int]) -> List[str]:
+        """Several chunks of one document, opening its .doc file once."""
+        doc_path = self._path(doc_id, ".doc")
+        with _READ_SECONDS.time():
+            if os.path.exists(doc_path):
+                with CompactDocument(doc_path) as doc:
+                    return [doc.chunk(i) for i in indices]
+            chunks = self._load(doc_id)
+        return [chunks[i] for i in indices]
+
+    def save_chunk_pages(self, doc_id: str, pages: List[Tuple[int, int]]) -> None:
+        path = self._path(doc_id, PAGES_EXTENSION)
+        with _WRITE_SECONDS.time():
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump([list(span) for span in pages], f, separators=(",", ":"))
+            os.replace(f"{path}.tmp", path)
+
+    def load_chunk_pages(self, doc_id: str) -> List[Tuple[int, int]] | None:
+        path = self._path(doc_id, PAGES_EXTENSION)
+        if not os.path.exists(path):
+            return None
+        with _READ_SECONDS.time(), open(path, "r", encoding="utf-8") as f:
+            return [tuple(span) for span in json.load(f)]
+
     def delete(self, doc_id: str) -> None:
         """
         Delete stored files for a document.
         """
-        for ext in (".chunks", ".txt"):
-            path = os.path.join(self.base_path, f"{doc_id}{ext}")
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception:
-                pass
+        with _DELETE_SECONDS.time():
+            for ext in DOC_EXTENSIONS + (PAGES_EXTENSION,):
+                path = self._path(doc_id, ext)
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except Exception:
+                    pass
+
+    def _exists(self, doc_id: str) -> bool:
+        return any(os.path.exists(self._path(doc_id, ext)) for ext in DOC_EXTENSIONS)
+
+    def list_ids(self) -> List[str]:
+        """
+        IDs of every stored document, oldest first.
+        """
+        first_seen: Dict[str, float] = {}
+        with os.scandir(self.base_path) as entries:
+            for entry in entries:
+                doc_id, ext = os.path.splitext(entry.name)
+                if ext in DOC_EXTENSIONS and entry.is_file():
+                    mtime = entry.stat().st_mtime
+                    first_seen[doc_id] = min(mtime, first_seen.get(doc_id, mtime))
+        return sorted(first_seen, key=lambda d: (first_seen[d], d))
+
+    def _hash_index(self) -> Dict[str, str]:
+        """hash -> doc_id, loaded from the hash log (or built from the stored documents). Caller holds _hash_lock."""
+        if self._hashes is None:
+            log_path = os.path.join(self.base_path, HASH_LOG)
+            hashes: Dict[str, str] = {}
+            if os.path.exists(log_path):
+                with open(log_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 2:
+                            hashes[parts[0]] = parts[1]
+            else:
+                # first run: the oldest copy of each content becomes the canonical document
+                for doc_id in self.list_ids():
+                    hashes.setdefault(document_hash(self.load(doc_id)), doc_id)
+                with open(f"{log_path}.tmp", "w", encoding="utf-8") as f:
+                    f.writelines(f"{h} {doc_id}\n" for h, doc_id in hashes.items())
+                os.replace(f"{log_path}.tmp", log_path)
+            self._hashes = hashes
+        return self._hashes
+
+    def find_by_hash(self, content_hash: str) -> str | None:
+        """
+        Return the stored document with this content hash; entries whose files were deleted are ignored.
+        """
+        with self._hash_lock:
+            doc_id = self._hash_index().get(content_hash)
+        return doc_id if doc_id and self._exists(doc_id) else None
+
+    def register_hash(self, doc_id: str, content_hash: str) -> None:
+        """
+        Record the content hash of a stored document (appended to the hash log).
+        """
+        with self._hash_lock:
+            self._register_hash(doc_id, content_hash)
+
+    def claim_hash(self, content_hash: str, doc_id: str) -> str | None:
+        """
+        Register doc_id under content_hash unless another stored document already holds it,
+        whose ID is returned instead. Lookup and registration happen under one lock, so of
+        two concurrent uploads of the same content exactly one is kept.
+        """
+        with self._hash_lock:
+            existing = self._hash_index().get(content_hash)
+            if existing == doc_id:
+                return None  # the index was just built from disk, which already holds this copy
+            if existing is not None and self._exists(existing):
+                return existing
+            self._register_hash(doc_id, content_hash)
+        return None
+
+    def _register_hash(self, doc_id: str, content_hash: str) -> None:
+        """Caller holds _hash_lock."""
+        self._hash_index()[content_hash] = doc_id
+        with open(os.path.join(self.base_path, HASH_LOG), "a", encoding="utf-8") as f:
+            f.write(f"{content_hash} {doc_id}\n")
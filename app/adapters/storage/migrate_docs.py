@@ -0,0 +1,70 @@
+"""
+Convert legacy documents (<doc_id>.txt + <doc_id>.chunks) to the compact .doc format.
+
+Usage:
+    python -m app.adapters.storage.migrate_docs --path data/docs [--compression zstd] [--remove-legacy] [--dry-run]
+
+Each converted document is read back and compared chunk by chunk before the legacy
+files are (optionally) removed; documents that already have a .doc file are skipped.
+"""
+import argparse
+import os
+from typing import Dict, Any
+
+from app.adapters.storage.compact_doc import CompactDocument
+from app.adapters.storage.local_file_storage import LocalFileStorageAdapter
+
+LEGACY_EXTENSIONS = (".txt", ".chunks")
+
+
+def migrate(base_path: str, compression: str = "none", remove_legacy: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    storage = LocalFileStorageAdapter(base_path, storage_format="compact", compression=compression)
+    doc_ids = sorted({
+        name.rsplit(".", 1)[0] for name in os.listdir(base_path)
+        if name.endswith(LEGACY_EXTENSIONS)
+    })
+    report = {"migrated": 0, "skipped": 0, "failed": [], "bytes_before": 0, "bytes_after": 0}
+    for doc_id in doc_ids:
+        doc_path = os.path.join(base_path, f"{doc_id}.doc")
+        legacy = [p for p in (os.path.join(base_path, f"{doc_id}{ext}") for ext in LEGACY_EXTENSIONS) if os.path.exists(p)]
+        if os.path.exists(doc_path):
+            report["skipped"] += 1
+            continue
+        chunks = storage.load(doc_id)  # no .doc yet: reads the legacy files
+        if dry_run:
+            report["migrated"] += 1
+            continue
+        storage.write_compact(doc_id, chunks)
+        with CompactDocument(doc_path) as doc:
+            same = doc.chunks() == chunks
+        if not same:
+            os.remove(doc_path)
+            report["failed"].append(doc_id)
+            continue
+        report["migrated"] += 1
+        report["bytes_before"] += sum(os.path.getsize(p) for p in legacy)
+        report["bytes_after"] += os.path.getsize(doc_path)
+        if remove_legacy:
+            for path in legacy:
+                os.remove(path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="data/docs")
+    parser.add_argument("--compression", choices=["none", "zstd"], default="none")
+    parser.add_argument("--remove-legacy", action="store_true", help="delete .txt/.chunks once the .doc is verified")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    report = migrate(args.path, args.compression, args.remove_legacy, args.dry_run)
+    print(f"migrated: {report['migrated']}  skipped: {report['skipped']}  failed: {len(report['failed'])}")
+    if report["bytes_before"]:
+        print(f"size: {report['bytes_before']} -> {report['bytes_after']} bytes")
+    for doc_id in report["failed"]:
+        print(f"  verification failed: {doc_id}")
+
+
+if __name__ == "__main__":
+    main()
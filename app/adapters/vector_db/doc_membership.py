@@ -0,0 +1,51 @@
+from typing import Dict, Iterable, List, Set
+
+
+def chunk_order(id: str):
+    """Sort key putting <doc>_chunk_2 before <doc>_chunk_10 (same prefix, shorter number first)."""
+    return len(id), id
+
+
+class DocumentMembership:
+    """
+    doc_id -> vector ids secondary index for the in-process adapters (HNSW, mmap segments),
+    so document-scoped reads and deletes touch only that document's vectors.
+    Vectors are grouped by the "doc_id" field of their metadata; vectors without one are not tracked.
+    Not thread-safe on its own: callers hold their adapter lock.
+    """
+
+    def __init__(self):
+        self._members: Dict[str, Set[str]] = {}
+        self._doc_of: Dict[str, str] = {}
+
+    def add(self, id: str, metadata: Dict | None) -> None:
+        doc_id = (metadata or {}).get("doc_id")
+        previous = self._doc_of.get(id)
+        if previous is not None and previous != doc_id:
+            self.discard(id)
+        if doc_id is not None:
+            self._members.setdefault(str(doc_id), set()).add(id)
+            self._doc_of[id] = str(doc_id)
+
+    def discard(self, id: str) -> None:
+        doc_id = self._doc_of.pop(id, None)
+        if doc_id is None:
+            return
+        members = self._members.get(doc_id)
+        if members is not None:
+            members.discard(id)
+            if not members:
+                del self._members[doc_id]
+
+    def ids_of(self, doc_id: str) -> List[str]:
+        return sorted(self._members.get(doc_id, ()), key=chunk_order)
+
+    def ids_of_many(self, doc_ids: Iterable[str]) -> List[str]:
+        return [id for doc_id in doc_ids for id in self._members.get(doc_id, ())]
+
+    def documents(self) -> List[str]:
+        return list(self._members)
+
+    def clear(self) -> None:
+        self._members.clear()
+        self._doc_of.clear()
@@ -0,0 +1,39 @@
+from app.core.ports.async_vector_db import AsyncVectorDBInterface
+from app.core.ports.vector_db import VectorDBInterface
+from app.utils.config import settings
+
+
+def build_vector_db(backend: str | None = None) -> VectorDBInterface:
+    """
+    Instantiate the vector DB adapter selected by settings.VECTOR_DB_BACKEND.
+    Adapters are imported lazily so unused backends don't pull in their dependencies.
+    """
+    backend = (backend or settings.VECTOR_DB_BACKEND).lower()
+    if backend == "redis":
+        from app.adapters.vector_db.redis_db import RedisVectorDBAdapter
+        return RedisVectorDBAdapter()
+    if backend == "hnsw":
+        from app.adapters.vector_db.hnsw_db import HNSWVectorDBAdapter
+        return HNSWVectorDBAdapter()
+    if backend == "mmap":
+        from app.adapters.vector_db.mmap_db import MmapSegmentVectorDBAdapter
+        return MmapSegmentVectorDBAdapter()
+    raise ValueError(f"Unknown vector DB backend: {backend}")
+
+
+def build_async_vector_db(backend: str | None = None, sync_db: VectorDBInterface | None = None) -> AsyncVectorDBInterface:
+    """
+    Async adapter for the selected backend: redis.asyncio for "redis"; in-process backends
+    are wrapped in ThreadedAsyncVectorDB. Given `sync_db`, the async adapter reuses its
+    state so the process keeps a single copy of the index (the Redis mirror, the HNSW
+    graph) and a single writer on the segment directory.
+    """
+    backend = (backend or settings.VECTOR_DB_BACKEND).lower()
+    if backend == "redis":
+        from app.adapters.vector_db.redis_db import RedisIndexMirror
+        from app.adapters.vector_db.redis_async_db import AsyncRedisVectorDBAdapter
+        return AsyncRedisVectorDBAdapter(mirror=sync_db if isinstance(sync_db, RedisIndexMirror) else None)
+    from app.adapters.vector_db.threaded_async_db import ThreadedAsyncVectorDB
+    if sync_db is None:
+        return ThreadedAsyncVectorDB(build_vector_db(backend), owns_sync_db=True)
+    return ThreadedAsyncVectorDB(sync_db)
@@ -0,0 +1,359 @@
+import os
+import threading
+import time
+from typing import List, Dict, Any
+import numpy as np
+from app.adapters.vector_db.doc_membership import DocumentMembership
+from app.adapters.vector_db.metadata_filter import AttributeIndex, matches, parse_filters
+from app.core.ports.vector_db import VectorDBInterface
+from app.utils.config import settings
+from app.utils.metrics import STAGE_SECONDS, VECTORS_INSERTED, VECTORS_SCANNED
+from app.utils.snapshot import load_snapshot, save_snapshot
+
+_SCORE_SECONDS = STAGE_SECONDS.labels("score")
+_TOPK_SECONDS = STAGE_SECONDS.labels("topk")
+
+
+def _hnswlib():
+    try:
+        import hnswlib
+    except ImportError:
+        raise RuntimeError("the hnsw vector DB backend requires the 'hnswlib' package") from None
+    return hnswlib
+
+
+class HNSWVectorDBAdapter(VectorDBInterface):
+    """
+    In-process HNSW (Hierarchical Navigable Small World) approximate nearest neighbour index,
+    backed by hnswlib (graph construction and search run in C++ without the GIL).
+    - Vectors are L2-normalized and scored by inner product (cosine similarity)
+    - M / ef_construction / ef_search are tunable (defaults from settings.HNSW_*)
+    - each vector is a graph node labelled by its position in insertion order; insert_many
+      adds a whole batch in one add_items call, spread over the available cores
+    - re-inserting an id replaces the old node; delete() tombstones the node (hnswlib
+      mark_deleted): it keeps routing searches but is never returned
+    - once settings.HNSW_COMPACTION_THRESHOLD of the nodes are tombstones, compact()
+      rebuilds the graph from the live nodes and renumbers them densely; the rebuild runs
+      outside the index lock and replays the inserts/deletes that land meanwhile
+    - a doc_id -> ids map (DocumentMembership) serves document listings and bulk deletes
+    - filtered queries resolve the indexed fields on an inverted attribute index: small
+      candidate sets are checked against the remaining (residual) fields and scored
+      exactly, broad ones walk the graph with an hnswlib filter that only admits matching
+      nodes into the beam, so residual fields are checked only on the nodes it visits
+    - persist()/load() snapshot and restore the whole graph to settings.HNSW_INDEX_PATH
+      (npz arrays plus a JSON header for ids, metadata and the graph parameters; no pickle)
+    """
+
+    def __init__(
+        self,
+        dim: int = None,
+        M: int = None,
+        ef_construction: int = None,
+        ef_search: int = None,
+        index_path: str = None,
+        seed: int = 42,
+    ):
+        self.dim = dim or settings.EMBEDDING_DIM
+        self.M = M or settings.HNSW_M
+        self.ef_construction = ef_construction or settings.HNSW_EF_CONSTRUCTION
+        self.ef_search = ef_search or settings.HNSW_EF_SEARCH
+        self.index_path = str(index_path or settings.HNSW_INDEX_PATH)
+        self.persist_every = settings.HNSW_PERSIST_EVERY
+        self.filter_exact_limit = settings.HNSW_FILTER_EXACT_LIMIT
+        self.compaction_threshold = settings.HNSW_COMPACTION_THRESHOLD
+        self.seed = seed
+        self._hnswlib = _hnswlib()
+        self._lock = threading.RLock()
+        self._persist_lock = threading.Lock()  # one snapshot writer at a time
+        self._compact_lock = threading.Lock()  # one graph rebuild at a time
+        self._reset()
+        if os.path.exists(self.index_path):
+            self.load()
+
+    def _reset(self) -> None:
+        self._graph = self._new_graph(1024)
+        self._ids: List[str] = []  # node -> id
+        self._metadata: List[Dict[str, Any]] = []
+        self._deleted: set[int] = set()
+        self._node_of: Dict[str, int] = {}
+        self._members = DocumentMembership()
+        self._attributes = AttributeIndex(settings.VECTOR_FILTER_FIELDS)  # live node -> filterable metadata
+        self._dirty = 0
+
+    def _new_graph(self, capacity: int):
+        graph = self._hnswlib.Index(space="ip", dim=self.dim)
+        graph.init_index(max_elements=capacity, M=self.M, ef_construction=self.ef_construction, random_seed=self.seed)
+        return graph
+
+    def __len__(self) -> int:
+        return len(self._node_of)
+
+    # ------------------------------------------------------------------
+    # VectorDBInterface
+    # ------------------------------------------------------------------
+    def insert(self, id: str, vector: List[float], metadata: Dict[str, Any] = None) -> None:
+        self.insert_many([id], [vector], [metadata])
+
+    def insert_many(self, ids: List[str], vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        if not len(ids):
+            return
+        vecs = self._normalize(vectors)
+        if vecs.shape[0] != len(ids):
+            raise ValueError(f"Got {vecs.shape[0]} vectors for {len(ids)} ids")
+        rows = sorted({id: i for i, id in enumerate(ids)}.values())  # in-batch duplicates: the last one wins
+        with self._lock:
+            self._add([ids[i] for i in rows], vecs[rows], [metadata[i] or {} for i in rows])
+        VECTORS_INSERTED.inc(len(ids))
+        self._maybe_compact()
+        self._maybe_persist()
+
+    def query(self, vector: List[float], top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        parsed = parse_filters(filters)
+        q = self._normalize(vector)[0]
+        with self._lock:
+            if not self._node_of or top_k <= 0:
+                return []
+            if parsed is None:
+                k = min(top_k, len(self._node_of))
+                results = self._graph_search(q, k)
+                if len(results) < k:  # the beam could not reach enough live nodes
+                    return self._exact_search(q, top_k, self._live_nodes())
+                return results
+            nodes, residual = self._attributes.lookup(parsed)
+            candidates = len(self._node_of) if nodes is None else len(nodes)
+            if candidates <= self.filter_exact_limit:
+                return self._exact_search(q, top_k, self._filter_nodes(nodes, residual))
+            results = self._graph_search(q, min(top_k, candidates), self._node_filter(nodes, residual))
+            if len(results) < top_k:
+                # fewer matches than top_k, or the beam could not reach them
+                return self._exact_search(q, top_k, self._filter_nodes(nodes, residual))
+            return results
+
+    def delete(self, id: str) -> None:
+        with self._lock:
+            removed = self._tombstone(id)
+        if removed:
+            self._maybe_compact()
+            self._maybe_persist()
+
+    def fetch_vectors(self, ids: List[str]) -> np.ndarray:
+        """Normalized vectors of the live nodes of `ids` (zero rows for unknown ids)."""
+        out = np.zeros((len(ids), self.dim), dtype=np.float32)
+        with self._lock:
+            found = [(i, self._node_of[id]) for i, id in enumerate(ids) if id in self._node_of]
+            if found:
+                rows, nodes = zip(*found)
+                out[list(rows)] = self._graph.get_items(list(nodes))
+        return out
+
+    def document_vector_ids(self, doc_id: str) -> List[str]:
+        with self._lock:
+            return self._members.ids_of(doc_id)
+
+    def list_documents(self) -> List[str]:
+        with self._lock:
+            return self._members.documents()
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        with self._lock:
+            removed = sum(self._tombstone(id) for id in self._members.ids_of_many(doc_ids))
+        if removed:
+            self._maybe_compact()
+            self._maybe_persist()
+        return removed
+
+    def persist(self) -> None:
+        """
+        Write an atomic snapshot of the graph to index_path. The state is copied under the
+        index lock and written after releasing it, so searches and inserts are not held up
+        by the disk write.
+        """
+        with self._persist_lock:
+            with self._lock:
+                header, arrays = self._snapshot()
+                self._dirty = 0
+            save_snapshot(self.index_path, header, arrays)
+
+    def compact(self) -> int:
+        """
+        Rebuild the graph without its tombstones, renumbering the live nodes densely in
+        insertion order. Returns the number of nodes dropped. The new graph is built from a
+        copy of the live vectors without holding the index lock; nodes inserted or deleted
+        during the build are replayed onto it before it is swapped in.
+        """
+        with self._compact_lock:
+            with self._lock:
+                live = np.sort(self._live_nodes())
+                vectors = self._graph.get_items(live) if len(live) else np.empty((0, self.dim), dtype=np.float32)
+                seen = len(self._ids)
+            graph = self._new_graph(max(len(live), 1024))
+            if len(live):
+                graph.add_items(vectors, np.arange(len(live)))
+            with self._lock:
+                # catch up with the writes made while the graph was being built
+                added = np.array([n for n in range(seen, len(self._ids)) if n not in self._deleted], dtype=np.int64)
+                nodes = np.concatenate([live, added])
+                if len(added):
+                    graph.resize_index(max(len(nodes), graph.get_max_elements()))
+                    graph.add_items(self._graph.get_items(added), np.arange(len(live), len(nodes)))
+                for new, old in enumerate(live.tolist()):
+                    if old in self._deleted:
+                        graph.mark_deleted(new)
+                dropped = len(self._ids) - len(nodes)
+                self._graph = graph
+                self._ids = [self._ids[n] for n in nodes.tolist()]
+                self._metadata = [self._metadata[n] for n in nodes.tolist()]
+                self._deleted = {new for new, old in enumerate(live.tolist()) if old in self._deleted}
+                self._node_of = {id: n for n, id in enumerate(self._ids) if n not in self._deleted}
+                self._attributes = AttributeIndex(settings.VECTOR_FILTER_FIELDS)
+                for node in self._node_of.values():
+                    self._attributes.add(node, self._metadata[node])
+                self._dirty += 1
+            return dropped
+
+    def _snapshot(self) -> tuple:
+        # hnswlib's pickle state: scalar parameters plus numpy arrays, so it maps onto the npz
+        state = self._graph.__getstate__()[0]
+        header = {
+            "dim": self.dim,
+            "graph": {k: v for k, v in state.items() if not isinstance(v, np.ndarray)},
+            "ids": list(self._ids),
+            "metadata": list(self._metadata),
+        }
+        arrays = {f"graph_{k}": v for k, v in state.items() if isinstance(v, np.ndarray)}
+        arrays["deleted"] = np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))
+        return header, arrays
+
+    def load(self) -> None:
+        """Restore the graph from the last snapshot (if any)."""
+        if not os.path.exists(self.index_path):
+            return
+        header, arrays = load_snapshot(self.index_path)
+        if header["dim"] != self.dim:
+            raise ValueError(f"Snapshot dim {header['dim']} does not match index dim {self.dim}")
+        if "graph" not in header:
+            raise ValueError(f"{self.index_path} is not an hnswlib snapshot; rebuild it with a forced reindex")
+        state = dict(header["graph"])
+        state.update({name[len("graph_"):]: a for name, a in arrays.items() if name.startswith("graph_")})
+        with self._lock:
+            self._reset()
+            self._graph = self._hnswlib.Index(state)
+            self.M = self._graph.M
+            self._ids = header["ids"]
+            self._metadata = header["metadata"]
+            self._deleted = set(arrays["deleted"].tolist())
+            self._node_of = {id: n for n, id in enumerate(self._ids) if n not in self._deleted}
+            for id, node in self._node_of.items():
+                self._members.add(id, self._metadata[node])
+                self._attributes.add(node, self._metadata[node])
+
+    # ------------------------------------------------------------------
+    # Graph construction and search
+    # ------------------------------------------------------------------
+    def _normalize(self, vectors) -> np.ndarray:
+        v = np.asarray(vectors, dtype=np.float32)
+        v = v.reshape(-1, v.shape[-1])
+        if v.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got {v.shape[1]}")
+        return v / (np.linalg.norm(v, axis=1, keepdims=True) + 1e-12)
+
+    def _live_nodes(self) -> np.ndarray:
+        return np.fromiter(self._node_of.values(), dtype=np.int64, count=len(self._node_of))
+
+    def _graph_search(self, q: np.ndarray, k: int, node_filter=None) -> List[Dict[str, Any]]:
+        ef = max(self.ef_search, k)
+        self._graph.set_ef(ef)
+        start = time.perf_counter()
+        try:
+            labels, distances = self._graph.knn_query(q, k=k, filter=node_filter)
+        except RuntimeError:  # hnswlib found fewer than k nodes
+            return []
+        scored = time.perf_counter()
+        results = [
+            {"id": self._ids[node], "score": 1.0 - dist, "metadata": self._metadata[node]}
+            for node, dist in zip(labels[0].tolist(), distances[0].tolist())
+        ]
+        _SCORE_SECONDS.observe(scored - start)
+        _TOPK_SECONDS.observe(time.perf_counter() - scored)
+        VECTORS_SCANNED.inc(ef)  # hnswlib does not report its distance count; the beam width is a lower bound
+        return results
+
+    def _filter_nodes(self, nodes: np.ndarray | None, residual) -> np.ndarray:
+        """Live nodes matching a filter, from its attribute-index lookup (nodes, residual)."""
+        if nodes is None:
+            nodes = self._live_nodes()
+        if residual:
+            metadata = self._metadata
+            nodes = np.fromiter((n for n in nodes.tolist() if matches(metadata[n], residual)), dtype=np.int64)
+        return nodes.astype(np.int64, copy=False)
+
+    def _node_filter(self, nodes: np.ndarray | None, residual):
+        """
+        The same filter as a per-node predicate for hnswlib, evaluated lazily on the nodes
+        the beam visits (deleted nodes are already skipped by hnswlib).
+        """
+        metadata = self._metadata
+        if nodes is None:
+            return lambda n: matches(metadata[n], residual)
+        mask = np.zeros(len(self._ids), dtype=bool)
+        mask[nodes] = True
+        allowed = mask.tolist()  # list indexing is cheaper per call than numpy scalar access
+        if not residual:
+            return allowed.__getitem__
+        return lambda n: allowed[n] and matches(metadata[n], residual)
+
+    def _exact_search(self, q: np.ndarray, top_k: int, nodes: np.ndarray) -> List[Dict[str, Any]]:
+        if not len(nodes):
+            return []
+        start = time.perf_counter()
+        sims = self._graph.get_items(nodes) @ q
+        scored = time.perf_counter()
+        k = min(top_k, len(nodes))
+        top = np.argpartition(-sims, k - 1)[:k] if k < len(nodes) else np.arange(len(nodes))
+        top = top[np.argsort(-sims[top])]
+        _SCORE_SECONDS.observe(scored - start)
+        _TOPK_SECONDS.observe(time.perf_counter() - scored)
+        VECTORS_SCANNED.inc(len(nodes))
+        return [
+            {"id": self._ids[n], "score": float(sims[i]), "metadata": self._metadata[n]}
+            for i, n in zip(top, nodes[top])
+        ]
+
+    def _tombstone(self, id: str) -> bool:
+        node = self._node_of.pop(id, None)
+        if node is None:
+            return False
+        self._graph.mark_deleted(node)
+        self._deleted.add(node)
+        self._attributes.discard(node)
+        self._members.discard(id)
+        self._dirty += 1
+        return True
+
+    def _maybe_compact(self) -> None:
+        dead = len(self._deleted)
+        if self.compaction_threshold and dead >= 1024 and dead >= self.compaction_threshold * len(self._ids):
+            if not self._compact_lock.locked():  # a rebuild already in progress catches up on its own
+                self.compact()
+
+    def _maybe_persist(self) -> None:
+        if self.persist_every and self._dirty >= self.persist_every:
+            self.persist()
+
+    def _add(self, ids: List[str], vecs: np.ndarray, metadata: List[Dict[str, Any]]) -> None:
+        """Append one node per id (ids unique within the call), replacing existing ids."""
+        for id in ids:
+            self._tombstone(id)
+        first = len(self._ids)
+        needed = first + len(ids)
+        capacity = self._graph.get_max_elements()
+        if needed > capacity:
+            self._graph.resize_index(max(needed, 2 * capacity))
+        self._graph.add_items(vecs, np.arange(first, needed))
+        for node, (id, meta) in enumerate(zip(ids, metadata), start=first):
+            self._ids.append(id)
+            self._metadata.append(meta)
+            self._node_of[id] = node
+            self._members.add(id, meta)
+            self._attributes.add(node, meta)
+        self._dirty += len(ids)
@@ -0,0 +1,340 @@
+import threading
+import time
+from typing import Callable, List, Dict, Any, Iterable
+import numpy as np
+from app.adapters.vector_db.metadata_filter import AttributeIndex, matches, parse_filters
+from app.adapters.vector_db.quantization import Float32Codec
+from app.utils.config import settings
+from app.utils.metrics import STAGE_SECONDS, VECTORS_SCANNED
+
+_SCORE_SECONDS = STAGE_SECONDS.labels("score")
+_TOPK_SECONDS = STAGE_SECONDS.labels("topk")
+
+
+class InMemoryVectorIndex:
+    """
+    Contiguous in-process vector index shared by the vector DB adapters.
+    - Vectors are L2-normalized once on insert and stored as codec rows in one (N, W) array
+      (float32 by default; float16 / int8 / PQ codes through app.adapters.vector_db.quantization)
+    - Ids and metadata live in parallel lists indexed by row
+    - search(): one blocked scan over the codes plus argpartition top-k, optionally
+      re-ranking the best candidates with full-precision vectors
+    - Metadata filters (see metadata_filter.parse_filters) are resolved on an inverted
+      (field, value) -> rows index first, and only the matching rows are scored, so a
+      selective filter costs O(matches) instead of a full scan
+    Deletes swap the last row into the freed slot so the arrays stay dense.
+    """
+
+    scan_block = 4096  # rows decoded per step when scoring compressed codes (cache-sized)
+
+    def __init__(self, dim: int, initial_capacity: int = 1024, codec=None, filter_fields: Iterable[str] | None = None):
+        self.dim = dim
+        self.codec = codec or Float32Codec()
+        self._initial_capacity = initial_capacity
+        self._codes = np.empty((initial_capacity, self.codec.width(dim)), dtype=self.codec.dtype)
+        self._scales = np.empty(initial_capacity, dtype=np.float32)
+        self._size = 0
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self.attributes = AttributeIndex(settings.VECTOR_FILTER_FIELDS if filter_fields is None else filter_fields)
+        self.filter_scan_ratio = settings.VECTOR_FILTER_SCAN_RATIO
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    @property
+    def codes(self) -> np.ndarray:
+        """View over the populated rows of the encoded matrix."""
+        return self._codes[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the vector payload (codes + scales) of the populated rows."""
+        return self.codes.nbytes + self._scales[:self._size].nbytes
+
+    @property
+    def needs_retrain(self) -> bool:
+        """True when a trained codec (PQ) was fitted on far fewer vectors than it now holds."""
+        trained_on = getattr(self.codec, "trained_on", 0)
+        return bool(trained_on) and self._size > 4 * trained_on
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / (norms + 1e-12)
+
+    def _reserve(self, n: int) -> None:
+        if n <= self._codes.shape[0]:
+            return
+        capacity = max(n, self._codes.shape[0] * 2)
+        codes = np.empty((capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+        codes[:self._size] = self._codes[:self._size]
+        scales = np.empty(capacity, dtype=np.float32)
+        scales[:self._size] = self._scales[:self._size]
+        self._codes, self._scales = codes, scales
+
+    def add(self, ids: List[str], vectors: Iterable, metadata: List[Dict[str, Any]]) -> None:
+        """Insert or overwrite a batch of vectors."""
+        vecs = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got {vecs.shape[1]}")
+        vecs = self.normalize(vecs)
+        with self._lock:
+            if not self.codec.trained:
+                self.codec.fit(vecs)
+            codes, scales = self.codec.encode(vecs)
+            self._reserve(self._size + len(ids))
+            for id, code, scale, meta in zip(ids, codes, scales, metadata):
+                row = self._rows.get(id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._rows[id] = row
+                    self.ids.append(id)
+                    self.metadata.append(meta)
+                else:
+                    self.metadata[row] = meta
+                self.attributes.add(row, meta)
+                self._codes[row] = code
+                self._scales[row] = scale
+
+    def remove(self, id: str) -> bool:
+        """Remove a vector by id. Returns False if it was not indexed."""
+        with self._lock:
+            row = self._rows.pop(id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            self.attributes.discard(row)
+            if row != last:
+                moved_id = self.ids[last]
+                self._codes[row] = self._codes[last]
+                self._scales[row] = self._scales[last]
+                self.ids[row] = moved_id
+                self.metadata[row] = self.metadata[last]
+                self._rows[moved_id] = row
+                self.attributes.move(last, row)
+            self.ids.pop()
+            self.metadata.pop()
+            self._size = last
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._size = 0
+            self.ids = []
+            self.metadata = []
+            self._rows = {}
+            self.attributes.clear()
+            if getattr(self.codec, "trained_on", 0):
+                # trained codecs are refitted on the next bulk load
+                self.codec.trained = False
+                self.codec.trained_on = 0
+
+    def _scores(self, q: np.ndarray) -> np.ndarray:
+        scores = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, self.scan_block):
+            end = min(start + self.scan_block, self._size)
+            scores[start:end] = self.codec.score(self._codes[start:end], self._scales[start:end], q)
+        return scores
+
+    def _scores_rows(self, q: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), self.scan_block):
+            block = rows[start:start + self.scan_block]
+            scores[start:start + len(block)] = self.codec.score(self._codes[block], self._scales[block], q)
+        return scores
+
+    def _score_blocks(self, queries: np.ndarray, rows: np.ndarray | None):
+        """Yield (rows, scores of those rows for every query) one scan block at a time."""
+        if rows is not None and len(rows) <= self.filter_scan_ratio * self._size:
+            for start in range(0, len(rows), self.scan_block):
+                block = rows[start:start + self.scan_block]
+                yield block, self.codec.score_many(self._codes[block], self._scales[block], queries)
+            return
+        # a broad filter is cheaper as one contiguous scan than as a gather of most rows
+        keep = None
+        if rows is not None:
+            keep = np.zeros(self._size, dtype=bool)
+            keep[rows] = True
+        for start in range(0, self._size, self.scan_block):
+            end = min(start + self.scan_block, self._size)
+            block = np.arange(start, end)
+            scores = self.codec.score_many(self._codes[start:end], self._scales[start:end], queries)
+            if keep is not None:
+                mask = keep[start:end]
+                block, scores = block[mask], scores[mask]
+            yield block, scores
+
+    @staticmethod
+    def _merge_top(best: tuple, rows: np.ndarray, scores: np.ndarray, k: int) -> tuple:
+        # keeps the k best (rows, scores) per query column; never more than 2k rows are held
+        if len(rows) > k:
+            part = np.argpartition(-scores, k - 1, axis=0)[:k]
+            rows, scores = rows[part], np.take_along_axis(scores, part, axis=0)
+        else:
+            rows = np.broadcast_to(rows[:, None], scores.shape)
+        rows, scores = np.concatenate([best[0], rows]), np.concatenate([best[1], scores])
+        if len(rows) > k:
+            part = np.argpartition(-scores, k - 1, axis=0)[:k]
+            rows, scores = np.take_along_axis(rows, part, axis=0), np.take_along_axis(scores, part, axis=0)
+        return rows, scores
+
+    def filter_rows(self, filters: Dict[str, Any] | None) -> np.ndarray | None:
+        """
+        Sorted rows whose metadata satisfies `filters`, or None when there is no filter.
+        Indexed fields come from the inverted index; the rest are checked on the candidates.
+        """
+        parsed = parse_filters(filters)
+        if parsed is None:
+            return None
+        with self._lock:
+            rows, residual = self.attributes.lookup(parsed)
+            if rows is None:
+                rows = np.arange(self._size)
+            if residual:
+                rows = np.array([row for row in rows if matches(self.metadata[row], residual)], dtype=np.int64)
+            return rows.astype(np.int64, copy=False)
+
+    def _filtered_scores(self, score_all, score_rows, rows: np.ndarray) -> np.ndarray:
+        # a broad filter is cheaper as one contiguous scan than as a gather of most rows
+        if len(rows) > self.filter_scan_ratio * self._size:
+            return score_all()[rows]
+        return score_rows(rows)
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top])]
+
+    def search(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        rerank: Callable[[List[str]], np.ndarray] | None = None,
+        rerank_factor: int = 4,
+        filters: Dict[str, Any] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the top_k rows by cosine similarity, best first.
+        With `rerank`, the top_k * rerank_factor candidates found on the (compressed) codes
+        are re-scored on the full-precision vectors that rerank(ids) returns.
+        With `filters`, only rows whose metadata matches are considered.
+        """
+        k = top_k * rerank_factor if rerank else top_k
+        q = self.normalize(np.asarray(vector, dtype=np.float32))
+        with self._lock:
+            if self._size == 0 or top_k <= 0:
+                return []
+            start = time.perf_counter()
+            rows = self.filter_rows(filters)
+            if rows is None:
+                scores = self._scores(q)
+            else:
+                scores = self._filtered_scores(lambda: self._scores(q), lambda r: self._scores_rows(q, r), rows)
+            scored = time.perf_counter()
+            top = self._top(scores, min(k, len(scores)))
+            picked = top if rows is None else rows[top]
+            results = [
+                {"id": self.ids[row], "score": float(scores[i]), "metadata": self.metadata[row]}
+                for i, row in zip(top, picked)
+            ]
+            _SCORE_SECONDS.observe(scored - start)
+            _TOPK_SECONDS.observe(time.perf_counter() - scored)
+            VECTORS_SCANNED.inc(len(scores))
+        if rerank is None:
+            return results
+        return self.rescore(vector, results, rerank([r["id"] for r in results]), top_k)
+
+    def rescore(
+        self, vector: List[float], candidates: List[Dict[str, Any]], vectors: np.ndarray, top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Re-rank search() candidates by exact cosine against their full-precision `vectors`."""
+        if not candidates:
+            return []
+        q = self.normalize(np.asarray(vector, dtype=np.float32))
+        exact = self.normalize(vectors) @ q
+        order = self._top(exact, min(top_k, len(candidates)))
+        return [{**candidates[i], "score": float(exact[i])} for i in order]
+
+    def search_many(
+        self,
+        vectors: Iterable,
+        top_k: int = 5,
+        rerank: Callable[[List[str]], np.ndarray] | None = None,
+        rerank_factor: int = 4,
+        filters: Dict[str, Any] | None = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        search() for a batch of queries: all of them are scored together block by block
+        over the codes (matrix-matrix), keeping a running top-k per query, so memory stays
+        O(scan_block x queries) instead of a full rows x queries matrix. With `rerank`, the
+        full-precision vectors of the union of all candidates are requested in a single
+        rerank(ids) call. `filters` applies to every query.
+        """
+        queries = self.normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        k = top_k * rerank_factor if rerank else top_k
+        with self._lock:
+            if self._size == 0 or top_k <= 0:
+                return [[] for _ in range(len(queries))]
+            score_seconds = topk_seconds = 0.0
+            scanned = 0
+            best = (np.empty((0, len(queries)), dtype=np.int64), np.empty((0, len(queries)), dtype=np.float32))
+            start = time.perf_counter()
+            for rows, scores in self._score_blocks(queries, self.filter_rows(filters)):
+                scored = time.perf_counter()
+                best = self._merge_top(best, rows, scores, k)
+                merged = time.perf_counter()
+                score_seconds += scored - start
+                topk_seconds += merged - scored
+                scanned += scores.size
+                start = merged
+            rows, scores = best
+            order = np.argsort(-scores, axis=0, kind="stable")
+            results = [
+                [
+                    {"id": self.ids[row], "score": float(scores[i, j]), "metadata": self.metadata[row]}
+                    for i, row in zip(order[:, j], rows[order[:, j], j])
+                ]
+                for j in range(len(queries))
+            ]
+            _SCORE_SECONDS.observe(score_seconds)
+            _TOPK_SECONDS.observe(topk_seconds + time.perf_counter() - start)
+            VECTORS_SCANNED.inc(scanned)
+        if rerank is None:
+            return results
+        return self.rescore_many(queries, results, rerank, top_k)
+
+    def rescore_many(
+        self,
+        vectors: Iterable,
+        candidates: List[List[Dict[str, Any]]],
+        fetch: Callable[[List[str]], np.ndarray] | np.ndarray,
+        top_k: int,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        rescore() for a batch. `fetch` is either rerank(ids) or the full-precision
+        vectors already fetched for candidate_ids(candidates).
+        """
+        ids = self.candidate_ids(candidates)
+        full = fetch(ids) if callable(fetch) else fetch
+        rows = {id: i for i, id in enumerate(ids)}
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(candidates), -1)
+        return [
+            self.rescore(q, cands, full[[rows[c["id"]] for c in cands]], top_k) if cands else []
+            for q, cands in zip(queries, candidates)
+        ]
+
+    @staticmethod
+    def candidate_ids(candidates: List[List[Dict[str, Any]]]) -> List[str]:
+        """Distinct ids over the candidate lists of a batch, in first-seen order."""
+        return list(dict.fromkeys(c["id"] for cands in candidates for c in cands))
@@ -0,0 +1,149 @@
+from typing import Any, Dict, Hashable, Iterable, List, Set, Tuple
+import numpy as np
+
+Filters = Dict[str, Tuple[Hashable, ...]]
+
+
+def parse_filters(filters: Dict[str, Any] | None) -> Filters | None:
+    """
+    Validate a metadata filter and normalize it to {field: allowed values}.
+    Accepted forms, combined with AND across fields:
+        {"doc_id": "a"}                  equality
+        {"doc_id": ["a", "b"]}           IN
+        {"tenant": {"$eq": "x"}}         explicit equality
+        {"tags": {"$in": ["p", "q"]}}    explicit IN
+    A metadata field holding a list (e.g. tags) matches when any of its items is allowed.
+    Raises ValueError on malformed filters.
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object of field -> value(s)")
+    parsed: Filters = {}
+    for field, value in filters.items():
+        if isinstance(value, dict):
+            if set(value) == {"$eq"}:
+                value = [value["$eq"]]
+            elif set(value) == {"$in"} and isinstance(value["$in"], list):
+                value = value["$in"]
+            else:
+                raise ValueError(f"Unsupported operator for field '{field}': only $eq and $in are allowed")
+        elif not isinstance(value, list):
+            value = [value]
+        if not all(isinstance(v, (str, int, float, bool)) or v is None for v in value):
+            raise ValueError(f"Filter values for field '{field}' must be scalars")
+        parsed[field] = tuple(value)
+    return parsed
+
+
+def _values(value: Any) -> Iterable[Hashable]:
+    if value is None or isinstance(value, (str, int, float)):  # fast path: isinstance(Hashable) is an ABC check
+        return (value,)
+    if isinstance(value, (list, tuple, set)):
+        return [v for v in value if isinstance(v, Hashable)]
+    return [value] if isinstance(value, Hashable) else []
+
+
+def matches(metadata: Dict[str, Any] | None, filters: Filters) -> bool:
+    """True if the metadata satisfies every field of a parsed filter."""
+    metadata = metadata or {}
+    for field, allowed in filters.items():
+        if field not in metadata or not any(v in allowed for v in _values(metadata[field])):
+            return False
+    return True
+
+
+def _sorted_union(arrays: List[np.ndarray]) -> np.ndarray:
+    merged = np.sort(np.concatenate(arrays))
+    if len(merged) < 2:
+        return merged
+    return merged[np.concatenate(([True], merged[1:] != merged[:-1]))]
+
+
+class AttributeIndex:
+    """
+    Inverted index (field, value) -> keys of the rows/vectors carrying it, for the fields
+    listed in `fields` (see settings.VECTOR_FILTER_FIELDS). lookup() resolves the indexed
+    part of a filter by union (IN) and intersection (AND) of the posting lists, so a
+    filtered search only visits the matching subset. Postings are sets for O(1) updates,
+    with a sorted array copy cached per posting until it changes so lookups are vectorized.
+    Keys are whatever the adapter addresses rows by (row numbers, node ids or vector ids).
+    Not thread-safe on its own: callers hold their lock.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = set(fields)
+        self._postings: Dict[Tuple[str, Hashable], Set] = {}
+        self._arrays: Dict[Tuple[str, Hashable], np.ndarray] = {}
+        self._attrs: Dict[Hashable, List[Tuple[str, Hashable]]] = {}
+
+    def add(self, key: Hashable, metadata: Dict[str, Any] | None) -> None:
+        self.discard(key)
+        metadata = metadata or {}
+        attrs = [
+            (field, value)
+            for field in self.fields if field in metadata
+            for value in _values(metadata[field])
+        ]
+        if attrs:
+            self._attrs[key] = attrs
+            for attr in attrs:
+                self._postings.setdefault(attr, set()).add(key)
+                self._arrays.pop(attr, None)
+
+    def discard(self, key: Hashable) -> None:
+        for attr in self._attrs.pop(key, ()):
+            keys = self._postings.get(attr)
+            if keys is not None:
+                keys.discard(key)
+                self._arrays.pop(attr, None)
+                if not keys:
+                    del self._postings[attr]
+
+    def move(self, old: Hashable, new: Hashable) -> None:
+        """Re-key a row (used when an adapter relocates it)."""
+        attrs = self._attrs.pop(old, None)
+        if attrs is None:
+            return
+        self._attrs[new] = attrs
+        for attr in attrs:
+            keys = self._postings[attr]
+            keys.discard(old)
+            keys.add(new)
+            self._arrays.pop(attr, None)
+
+    def _array(self, attr: Tuple[str, Hashable]) -> np.ndarray | None:
+        keys = self._postings.get(attr)
+        if keys is None:
+            return None
+        array = self._arrays.get(attr)
+        if array is None:
+            array = self._arrays[attr] = np.sort(np.array(list(keys)))
+        return array
+
+    def lookup(self, filters: Filters) -> Tuple[np.ndarray | None, Filters]:
+        """
+        (sorted keys matching the indexed fields of the filter, or None if none is indexed;
+        the remaining non-indexed part, to be checked with matches()).
+        """
+        indexed = [field for field in filters if field in self.fields]
+        residual = {field: values for field, values in filters.items() if field not in self.fields}
+        if not indexed:
+            return None, residual
+        groups = []
+        for field in indexed:
+            arrays = [a for a in (self._array((field, value)) for value in filters[field]) if a is not None]
+            if not arrays:
+                return np.empty(0, dtype=np.int64), residual
+            # a list-valued field (tags) can put one key under several of the values
+            groups.append(arrays[0] if len(arrays) == 1 else _sorted_union(arrays))
+        groups.sort(key=len)
+        result = groups[0]
+        for keys in groups[1:]:
+            result = np.intersect1d(result, keys, assume_unique=True)
+        return result, residual
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._arrays.clear()
+        self._attrs.clear()
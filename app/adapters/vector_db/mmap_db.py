@@ -0,0 +1,487 @@
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from app.adapters.vector_db.doc_membership import DocumentMembership
+from app.adapters.vector_db.metadata_filter import AttributeIndex, matches, parse_filters
+from app.core.ports.vector_db import VectorDBInterface
+from app.utils.config import settings
+from app.utils.metrics import STAGE_SECONDS, VECTORS_INSERTED, VECTORS_SCANNED
+
+_SCORE_SECONDS = STAGE_SECONDS.labels("score")
+_TOPK_SECONDS = STAGE_SECONDS.labels("topk")
+
+
+class _Segment:
+    """
+    One append-only segment on disk:
+    - <name>.vec   float32 memmap (capacity, dim) of L2-normalized vectors
+    - <name>.meta  JSON lines {"id": ..., "metadata": ...}, one per row
+    - <name>.off   int64 memmap (capacity, 2) of (offset, length) into .meta
+    - <name>.tomb  packed tombstone bitmap, one bit per row
+    """
+
+    def __init__(self, directory: str, name: str, dim: int, capacity: int, count: int, create: bool = False):
+        self.directory = directory
+        self.name = name
+        self.dim = dim
+        self.capacity = capacity
+        self.count = count
+        mode = "w+" if create else "r+"
+        self.vectors = np.memmap(self.path(".vec"), dtype=np.float32, mode=mode, shape=(capacity, dim))
+        self.offsets = np.memmap(self.path(".off"), dtype=np.int64, mode=mode, shape=(capacity, 2))
+        self.tomb = np.memmap(self.path(".tomb"), dtype=np.uint8, mode=mode, shape=((capacity + 7) // 8,))
+        if create:
+            open(self.path(".meta"), "wb").close()
+        self._meta_fd = os.open(self.path(".meta"), os.O_RDWR)
+
+    def path(self, ext: str) -> str:
+        return os.path.join(self.directory, f"{self.name}{ext}")
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def dead_mask(self) -> np.ndarray:
+        return np.unpackbits(self.tomb, count=self.count, bitorder="little").astype(bool)
+
+    def dead_count(self) -> int:
+        return int(self.dead_mask().sum())
+
+    def mark_dead(self, row: int) -> None:
+        self.tomb[row >> 3] |= np.uint8(1 << (row & 7))
+
+    def append(self, vectors: np.ndarray, records: List[Dict[str, Any]]) -> int:
+        """Append rows (caller guarantees capacity). Returns the first new row number."""
+        start = self.count
+        end = start + len(vectors)
+        self.vectors[start:end] = vectors
+        offset = os.lseek(self._meta_fd, 0, os.SEEK_END)
+        lines = [(json.dumps(r) + "\n").encode("utf-8") for r in records]
+        for i, line in enumerate(lines):
+            self.offsets[start + i] = (offset, len(line))
+            offset += len(line)
+        os.write(self._meta_fd, b"".join(lines))
+        self.count = end
+        return start
+
+    def record(self, row: int) -> Dict[str, Any]:
+        offset, length = self.offsets[row]
+        return json.loads(os.pread(self._meta_fd, int(length), int(offset)))
+
+    def records(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        record() for many rows with a single read (of the sidecar range spanning them) and
+        a single JSON parse.
+        """
+        if not len(rows):
+            return []
+        spans = self.offsets[rows]
+        start = int(spans[:, 0].min())
+        data = os.pread(self._meta_fd, int((spans[:, 0] + spans[:, 1]).max()) - start, start)
+        lines = [data[offset - start:offset - start + length] for offset, length in spans.tolist()]
+        return json.loads(b"[" + b",".join(lines) + b"]")
+
+    def flush(self) -> None:
+        self.vectors.flush()
+        self.offsets.flush()
+        self.tomb.flush()
+        os.fsync(self._meta_fd)
+
+    def close(self) -> None:
+        os.close(self._meta_fd)
+
+    def remove_files(self) -> None:
+        for ext in (".vec", ".meta", ".off", ".tomb"):
+            try:
+                os.remove(self.path(ext))
+            except FileNotFoundError:
+                pass
+
+
+class MmapSegmentVectorDBAdapter(VectorDBInterface):
+    """
+    Persistent single-node vector store built from append-only np.memmap segments.
+    - Opening the store only reads MANIFEST.json and maps the segment files, so cold start
+      is O(#segments) and the working set is served from the page cache (larger-than-RAM ok)
+    - Queries scan each segment with one matrix-vector product (matrix-matrix for
+      query_many), mask tombstones and read metadata only for the final top_k rows
+    - delete() flips a tombstone bit; a background thread compacts segments whose
+      dead-row ratio exceeds settings.MMAP_COMPACTION_THRESHOLD
+    - Writes are made durable in batches: after settings.MMAP_MANIFEST_EVERY inserted or
+      deleted rows (and on persist(), close() and every compactor tick) the dirty segments
+      are fsynced and the manifest replaced. A crash loses at most the writes since then:
+      rows past a segment's manifest count are ignored on reopen
+    - The id -> (segment, row) map needed for upserts/deletes, the doc_id -> ids map used
+      by document listings and bulk deletes, and the attribute index used by filtered
+      queries are built lazily on first use, from one read and one JSON parse of each
+      segment's sidecar (about 3 s per 200k rows). They are deliberately not persisted:
+      the sidecars already are their log, a second on-disk copy would have to be kept in
+      step on every write, and the in-memory maps would still be rebuilt row by row
+    - Filtered queries gather only the matching rows of each segment, falling back to a
+      masked full scan when a segment is mostly matches
+    """
+
+    manifest_name = "MANIFEST.json"
+
+    def __init__(self, directory: str = None, dim: int = None, segment_size: int = None, compaction_interval: float = None):
+        self.directory = str(directory or settings.MMAP_INDEX_DIR)
+        self.dim = dim or settings.EMBEDDING_DIM
+        self.segment_size = segment_size or settings.MMAP_SEGMENT_SIZE
+        self.compaction_threshold = settings.MMAP_COMPACTION_THRESHOLD
+        self.compaction_interval = settings.MMAP_COMPACTION_INTERVAL if compaction_interval is None else compaction_interval
+        self.manifest_every = settings.MMAP_MANIFEST_EVERY
+        self.segments: List[_Segment] = []
+        self._next_segment = 0
+        self._locations: Dict[str, Tuple[_Segment, int]] | None = None
+        self._members = DocumentMembership()
+        self._attributes = AttributeIndex(settings.VECTOR_FILTER_FIELDS)  # id -> filterable metadata
+        self.filter_scan_ratio = settings.VECTOR_FILTER_SCAN_RATIO
+        self._dirty: set = set()  # segments with unflushed appends/tombstones
+        self._unsynced = 0  # rows inserted or deleted since the last manifest write
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        os.makedirs(self.directory, exist_ok=True)
+        self.load()
+        self._compactor = None
+        if self.compaction_interval:
+            self._compactor = threading.Thread(target=self._compaction_loop, name="mmap-compactor", daemon=True)
+            self._compactor.start()
+
+    # ------------------------------------------------------------------
+    # VectorDBInterface
+    # ------------------------------------------------------------------
+    def insert(self, id: str, vector: List[float], metadata: Dict[str, Any] = None) -> None:
+        self.insert_many([id], [vector], [metadata])
+
+    def insert_many(self, ids: List[str], vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        vecs = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got {vecs.shape[1]}")
+        last = {id: i for i, id in enumerate(ids)}
+        if len(last) < len(ids):
+            # an id repeated within the batch: only its last occurrence is written
+            keep = sorted(last.values())
+            ids, vecs, metadata = [ids[i] for i in keep], vecs[keep], [metadata[i] for i in keep]
+        vecs = vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
+        records = [{"id": id, "metadata": meta or {}} for id, meta in zip(ids, metadata)]
+        with self._lock:
+            locations = self._ensure_locations()
+            for id in ids:
+                self._tombstone(id)
+            pos = 0
+            while pos < len(ids):
+                segment = self._active_segment()
+                n = min(segment.capacity - segment.count, len(ids) - pos)
+                first = segment.append(vecs[pos:pos + n], records[pos:pos + n])
+                self._dirty.add(segment)
+                for i in range(n):
+                    locations[ids[pos + i]] = (segment, first + i)
+                    self._members.add(ids[pos + i], records[pos + i]["metadata"])
+                    self._attributes.add(ids[pos + i], records[pos + i]["metadata"])
+                pos += n
+            self._unsynced += len(ids)
+            self._maybe_write_manifest()
+        VECTORS_INSERTED.inc(len(ids))
+
+    def query(self, vector: List[float], top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        return self.query_many([vector], top_k=top_k, filters=filters)[0]
+
+    def query_many(
+        self, vectors: List[List[float]], top_k: int = 5, filters: Dict[str, Any] | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Each segment is scanned once for the whole batch (one matrix-matrix product)."""
+        parsed = parse_filters(filters)
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+        with self._lock:
+            snapshot = [(s, s.count) for s in self.segments if s.count]
+            selected = None if parsed is None else self._filter_rows(parsed)
+        if not snapshot or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+        candidates = [[] for _ in range(len(queries))]  # per query: (score, segment, row)
+        score_seconds = topk_seconds = 0.0
+        scanned = 0
+        for segment, count in snapshot:
+            start = time.perf_counter()
+            rows = None if selected is None else selected.get(segment)
+            if selected is not None and rows is None:
+                continue
+            if rows is None or len(rows) > self.filter_scan_ratio * count:
+                scores = np.asarray(segment.vectors[:count] @ queries.T)
+                excluded = segment.dead_mask()[:count]
+                if rows is not None:
+                    keep = np.zeros(count, dtype=bool)
+                    keep[rows] = True
+                    excluded |= ~keep
+                scores[excluded] = -np.inf
+                rows = np.arange(count)
+            else:
+                scores = np.asarray(segment.vectors[rows] @ queries.T)
+            scored = time.perf_counter()
+            score_seconds += scored - start
+            scanned += scores.size
+            k = min(top_k, len(rows))
+            for j in range(len(queries)):
+                column = scores[:, j]
+                top = np.argpartition(-column, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+                candidates[j].extend(
+                    (float(column[i]), segment, int(rows[i])) for i in top if column[i] != -np.inf
+                )
+            topk_seconds += time.perf_counter() - scored
+        results = []
+        start = time.perf_counter()
+        with self._lock:
+            for cands in candidates:
+                cands.sort(key=lambda c: c[0], reverse=True)
+                hits = []
+                for score, segment, row in cands[:top_k]:
+                    if segment not in self.segments:
+                        continue  # compacted away while scanning
+                    rec = segment.record(row)
+                    hits.append({"id": rec["id"], "score": score, "metadata": rec["metadata"]})
+                results.append(hits)
+        _SCORE_SECONDS.observe(score_seconds)
+        _TOPK_SECONDS.observe(topk_seconds + time.perf_counter() - start)
+        VECTORS_SCANNED.inc(scanned)
+        return results
+
+    def delete(self, id: str) -> None:
+        with self._lock:
+            self._ensure_locations()
+            if self._tombstone(id):
+                self._unsynced += 1
+                self._maybe_write_manifest()
+
+    def fetch_vectors(self, ids: List[str]) -> np.ndarray:
+        """Normalized vectors of `ids` read from their segments (zero rows for unknown ids)."""
+        out = np.zeros((len(ids), self.dim), dtype=np.float32)
+        with self._lock:
+            locations = self._ensure_locations()
+            for i, id in enumerate(ids):
+                location = locations.get(id)
+                if location is not None:
+                    segment, row = location
+                    out[i] = segment.vectors[row]
+        return out
+
+    def document_vector_ids(self, doc_id: str) -> List[str]:
+        with self._lock:
+            self._ensure_locations()
+            return self._members.ids_of(doc_id)
+
+    def list_documents(self) -> List[str]:
+        with self._lock:
+            self._ensure_locations()
+            return self._members.documents()
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """Tombstones every vector of the documents."""
+        with self._lock:
+            self._ensure_locations()
+            removed = sum(self._tombstone(id) for id in self._members.ids_of_many(doc_ids))
+            self._unsynced += removed
+            self._maybe_write_manifest()
+            return removed
+
+    def persist(self) -> None:
+        """Flush every segment and the manifest to disk."""
+        with self._lock:
+            self._dirty.update(self.segments)
+            self._write_manifest()
+
+    def load(self) -> None:
+        """(Re)open the segments listed in the manifest; does not read vectors into memory."""
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+            self.segments = []
+            self._locations = None
+            self._members.clear()
+            self._attributes.clear()
+            manifest_path = os.path.join(self.directory, self.manifest_name)
+            if not os.path.exists(manifest_path):
+                return
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["dim"] != self.dim:
+                raise ValueError(f"Store dim {manifest['dim']} does not match index dim {self.dim}")
+            self._next_segment = manifest["next_segment"]
+            self.segments = [
+                _Segment(self.directory, s["name"], self.dim, s["capacity"], s["count"])
+                for s in manifest["segments"]
+            ]
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._compactor:
+            self._compactor.join()
+        self.persist()
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+            self.segments = []
+
+    # ------------------------------------------------------------------
+    # Segment bookkeeping
+    # ------------------------------------------------------------------
+    def _new_segment(self, capacity: int) -> _Segment:
+        name = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        return _Segment(self.directory, name, self.dim, capacity, 0, create=True)
+
+    def _active_segment(self) -> _Segment:
+        if not self.segments or self.segments[-1].full:
+            self.segments.append(self._new_segment(self.segment_size))
+        return self.segments[-1]
+
+    def _flush_dirty(self) -> None:
+        for segment in self._dirty:
+            segment.flush()
+        self._dirty.clear()
+
+    def _maybe_write_manifest(self) -> None:
+        if self._unsynced >= self.manifest_every:
+            self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        """
+        Atomically replace the manifest; row counts only become visible once flushed here.
+        The segment files, the new manifest and its rename are fsynced in that order, so
+        the manifest on disk never points at rows or files that did not make it.
+        """
+        self._flush_dirty()
+        manifest = {
+            "dim": self.dim,
+            "next_segment": self._next_segment,
+            "segments": [{"name": s.name, "capacity": s.capacity, "count": s.count} for s in self.segments],
+        }
+        path = os.path.join(self.directory, self.manifest_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        self._fsync_directory()  # entries of new segment files and of the temp manifest
+        os.replace(tmp_path, path)
+        self._fsync_directory()
+        self._unsynced = 0
+
+    def _fsync_directory(self) -> None:
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _ensure_locations(self) -> Dict[str, Tuple[_Segment, int]]:
+        if self._locations is None:
+            self._locations = {}
+            try:
+                self._load_locations()
+            except BaseException:
+                self._locations = None
+                raise
+        return self._locations
+
+    def _load_locations(self) -> None:
+        for segment in self.segments:
+            # rows are located through the offsets file: the sidecar may hold lines past
+            # `count` (appends whose manifest was never written) that are not rows
+            live = np.nonzero(~segment.dead_mask())[0]
+            for row, record in zip(live.tolist(), segment.records(live)):
+                # a later row of the same id supersedes the earlier one
+                self._tombstone(record["id"])
+                self._locations[record["id"]] = (segment, row)
+                self._members.add(record["id"], record["metadata"])
+                self._attributes.add(record["id"], record["metadata"])
+
+    def _filter_rows(self, filters) -> Dict[_Segment, np.ndarray]:
+        """Live rows matching a parsed filter, as sorted row numbers per segment."""
+        locations = self._ensure_locations()
+        ids, residual = self._attributes.lookup(filters)
+        if ids is None:
+            ids = locations.keys()
+        by_segment: Dict[_Segment, List[int]] = {}
+        for id in ids:
+            segment, row = locations[id]
+            by_segment.setdefault(segment, []).append(row)
+        selected = {}
+        for segment, rows in by_segment.items():
+            rows = np.sort(np.asarray(rows, dtype=np.int64))
+            if residual:
+                # the residual fields are not indexed: read the candidates' records in one batch
+                keep = [matches(record["metadata"], residual) for record in segment.records(rows)]
+                rows = rows[np.asarray(keep, dtype=bool)]
+            if len(rows):
+                selected[segment] = rows
+        return selected
+
+    def _tombstone(self, id: str) -> bool:
+        location = self._locations.pop(id, None)
+        if location is None:
+            return False
+        segment, row = location
+        segment.mark_dead(row)
+        self._members.discard(id)
+        self._attributes.discard(id)
+        self._dirty.add(segment)
+        return True
+
+    # ------------------------------------------------------------------
+    # Background compaction
+    # ------------------------------------------------------------------
+    def _compaction_loop(self) -> None:
+        while not self._stop.wait(self.compaction_interval):
+            try:
+                self.compact()
+                with self._lock:
+                    if self._unsynced:
+                        self._write_manifest()
+            except Exception:
+                # compaction is best effort; the next round retries
+                pass
+
+    def compact(self) -> int:
+        """Rewrite sealed segments above the dead-row threshold. Returns segments compacted."""
+        with self._lock:
+            victims = [
+                s for s in self.segments[:-1]
+                if s.count and s.dead_count() / s.count >= self.compaction_threshold
+            ]
+        for segment in victims:
+            self._compact_segment(segment)
+        return len(victims)
+
+    def _compact_segment(self, segment: _Segment) -> None:
+        with self._lock:
+            live = np.nonzero(~segment.dead_mask())[0]
+            if not len(live):
+                self.segments.remove(segment)
+                self._dirty.discard(segment)
+                self._write_manifest()
+                segment.close()
+                segment.remove_files()
+                return
+            new = self._new_segment(len(live))
+        # copy outside the lock: old rows are immutable, only their tombstones can change
+        records = segment.records(live)
+        new.append(np.asarray(segment.vectors[live]), records)
+        with self._lock:
+            died_meanwhile = segment.dead_mask()[live]
+            for new_row in np.nonzero(died_meanwhile)[0]:
+                new.mark_dead(int(new_row))
+            self._dirty.add(new)
+            self._dirty.discard(segment)
+            if self._locations is not None:
+                for new_row, old_row in enumerate(live):
+                    if not died_meanwhile[new_row]:
+                        id = records[new_row]["id"]
+                        if self._locations.get(id) == (segment, int(old_row)):
+                            self._locations[id] = (new, new_row)
+            self.segments[self.segments.index(segment)] = new
+            self._write_manifest()
+            segment.close()
+            segment.remove_files()
@@ -0,0 +1,181 @@
+from typing import Tuple
+import numpy as np
+from app.utils.config import settings
+
+
+class Float32Codec:
+    """Identity codec: full-precision float32 rows (4 bytes/dim)."""
+
+    name = "float32"
+    dtype = np.float32
+    trained = True
+    trained_on = 0
+
+    def width(self, dim: int) -> int:
+        return dim
+
+    def fit(self, vectors: np.ndarray) -> None:
+        return
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors, np.ones(len(vectors), dtype=np.float32)
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def score(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        return codes @ q
+
+    def score_many(self, codes: np.ndarray, scales: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """(n, Q) scores of every row against a (Q, dim) query matrix, in one matrix-matrix product."""
+        return codes @ queries.T
+
+
+class Float16Codec(Float32Codec):
+    """Half-precision rows (2 bytes/dim)."""
+
+    name = "float16"
+    dtype = np.float16
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+    def score(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) @ q
+
+    def score_many(self, codes: np.ndarray, scales: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) @ queries.T
+
+
+class Int8Codec(Float32Codec):
+    """Symmetric int8 scalar quantization with one float32 scale per vector (1 byte/dim)."""
+
+    name = "int8"
+    dtype = np.int8
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * scales[:, None]
+
+    def score(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) @ q) * scales
+
+    def score_many(self, codes: np.ndarray, scales: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) @ queries.T) * scales[:, None]
+
+
+class ProductQuantizer(Float32Codec):
+    """
+    Product quantization: the vector is split into `subspaces` slices and each slice is
+    replaced by the index of its nearest centroid (1 byte per slice). Scores are computed
+    with asymmetric distance: a (subspaces, ks) table of query-slice x centroid products.
+    """
+
+    name = "pq"
+    dtype = np.uint8
+
+    def __init__(
+        self, dim: int, subspaces: int, ks: int = 256, iterations: int = 15, max_train: int = 20000, seed: int = 0
+    ):
+        if dim % subspaces:
+            raise ValueError(f"PQ subspaces ({subspaces}) must divide the embedding dim ({dim})")
+        self.dim = dim
+        self.subspaces = subspaces
+        self.sub_dim = dim // subspaces
+        self.ks = ks
+        self.iterations = iterations
+        self.max_train = max_train
+        self.seed = seed
+        self.centroids: np.ndarray | None = None  # (subspaces, ks, sub_dim)
+        self.trained = False
+        self.trained_on = 0
+
+    def width(self, dim: int) -> int:
+        return self.subspaces
+
+    def fit(self, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+        self.trained_on = len(vectors)
+        if len(vectors) > self.max_train:
+            vectors = vectors[rng.choice(len(vectors), size=self.max_train, replace=False)]
+        ks = min(self.ks, len(vectors))
+        centroids = np.zeros((self.subspaces, self.ks, self.sub_dim), dtype=np.float32)
+        for s, sub in enumerate(self._split(vectors)):
+            c = sub[rng.choice(len(sub), size=ks, replace=False)].copy()
+            for _ in range(self.iterations):
+                assign = self._nearest(sub, c)
+                sums = np.zeros_like(c)
+                np.add.at(sums, assign, sub)
+                counts = np.bincount(assign, minlength=ks)[:, None]
+                nonempty = counts[:, 0] > 0
+                c[nonempty] = sums[nonempty] / counts[nonempty]
+            centroids[s, :ks] = c
+            # unused slots (ks < self.ks) repeat real centroids so codes stay valid
+            if ks < self.ks:
+                centroids[s, ks:] = c[np.arange(self.ks - ks) % ks]
+        self.centroids = centroids
+        self.trained = True
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for s, sub in enumerate(self._split(vectors)):
+            codes[:, s] = self._nearest(sub, self.centroids[s])
+        return codes, np.ones(len(vectors), dtype=np.float32)
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        parts = [self.centroids[s][codes[:, s]] for s in range(self.subspaces)]
+        return np.concatenate(parts, axis=1)
+
+    def score(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        q_sub = q.reshape(self.subspaces, self.sub_dim)
+        lut = np.einsum("skd,sd->sk", self.centroids, q_sub)  # (subspaces, ks)
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for s in range(self.subspaces):
+            scores += lut[s][codes[:, s]]
+        return scores
+
+    def score_many(self, codes: np.ndarray, scales: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        q_sub = queries.reshape(len(queries), self.subspaces, self.sub_dim)
+        lut = np.einsum("skd,qsd->sqk", self.centroids, q_sub)  # (subspaces, Q, ks)
+        scores = np.zeros((len(codes), len(queries)), dtype=np.float32)
+        for s in range(self.subspaces):
+            scores += lut[s][:, codes[:, s]].T
+        return scores
+
+    def _split(self, vectors: np.ndarray):
+        return [vectors[:, s * self.sub_dim:(s + 1) * self.sub_dim] for s in range(self.subspaces)]
+
+    @staticmethod
+    def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        d = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * (x @ centroids.T)
+        return np.argmin(d, axis=1)
+
+
+SCALAR_CODECS = {
+    "float32": Float32Codec,
+    "float16": Float16Codec,
+    "int8": Int8Codec,
+}
+
+
+def build_codec(storage_dtype: str = "float32", dim: int = None, pq_subspaces: int = 0):
+    """
+    Codec used by InMemoryVectorIndex: product quantization when pq_subspaces > 0,
+    otherwise the scalar codec matching storage_dtype.
+    """
+    if pq_subspaces:
+        return ProductQuantizer(dim, pq_subspaces, max_train=settings.PQ_TRAIN_SIZE)
+    try:
+        return SCALAR_CODECS[storage_dtype.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown vector storage dtype: {storage_dtype}") from None
@@ -0,0 +1,249 @@
+import asyncio
+from typing import List, Dict, Any
+import numpy as np
+import redis
+import redis.asyncio as aioredis
+from app.core.ports.async_vector_db import AsyncVectorDBInterface
+from app.adapters.vector_db.redis_db import RedisIndexMirror
+from app.utils.concurrency import run_cpu
+from app.utils.config import settings
+from app.utils.metrics import VECTORS_INSERTED
+
+
+class AsyncRedisVectorDBAdapter(RedisIndexMirror, AsyncVectorDBInterface):
+    """
+    redis.asyncio variant of RedisVectorDBAdapter (same keys, same in-memory mirror).
+    - Redis round trips are awaited on a shared BlockingConnectionPool of
+      settings.REDIS_MAX_CONNECTIONS connections, so concurrent requests use separate
+      connections instead of queueing on one blocking client (beyond the limit they
+      wait for a free connection rather than failing)
+    - Index mutation and scoring run on the bounded CPU pool (app.utils.concurrency),
+      keeping the event loop free while numpy works
+    - Only one coroutine reloads the mirror at a time; concurrent queries wait for it
+    - Given `mirror` (the sync adapter of the same process), it shares that adapter's
+      in-memory index and version bookkeeping instead of loading a second copy
+    """
+
+    def __init__(
+        self, host: str = None, port: int = None, db: int = None, max_connections: int = None,
+        mirror: RedisIndexMirror | None = None,
+    ):
+        super().__init__(share_with=mirror)
+        self.pool = aioredis.BlockingConnectionPool(
+            host=host or settings.REDIS_HOST,
+            port=port or settings.REDIS_PORT,
+            db=db or settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD,
+            max_connections=max_connections or settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=False,
+        )
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        self._reload_lock = asyncio.Lock()
+
+    async def insert(self, id: str, vector: List[float], metadata: Dict[str, Any] = None) -> None:
+        await self.insert_many([id], [vector], [metadata])
+
+    async def insert_many(self, ids: List[str], vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        """One WATCHed MULTI/EXEC per `insert_batch` entries, as in the sync adapter."""
+        arr = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        metas = [m or {} for m in metadata]
+        for start in range(0, len(ids), self.insert_batch):
+            end = start + self.insert_batch
+            batch_ids, batch_vecs, batch_metas = ids[start:end], arr[start:end], metas[start:end]
+            mappings = await run_cpu(self._mappings, batch_vecs, batch_metas)
+            keys = [f"{self.ns_prefix}{id}" for id in batch_ids]
+
+            def read(reads):
+                for key in keys:
+                    reads.hmget(key, "doc_id", "metadata")
+
+            def write(pipe, rows):
+                self._queue_upserts(pipe, batch_ids, mappings, [self._doc_of(*row) for row in rows])
+
+            version = (await self._watched(keys, read, write, "insert"))[-1]
+            await run_cpu(self._apply, version, lambda: self.index.add(batch_ids, batch_vecs, batch_metas))
+            VECTORS_INSERTED.inc(len(batch_ids))
+
+    async def query(self, vector: List[float], top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        await self._sync()
+        if not self.reranks:
+            return await run_cpu(self.index.search, vector, top_k=top_k, filters=filters)
+        # candidates on the compressed codes, full-precision vectors fetched without blocking
+        candidates = await run_cpu(self.index.search, vector, top_k=top_k * self.rerank_factor, filters=filters)
+        vectors = await self._fetch_vectors([c["id"] for c in candidates])
+        return await run_cpu(self.index.rescore, vector, candidates, vectors, top_k)
+
+    async def query_many(
+        self, vectors: List[List[float]], top_k: int = 5, filters: Dict[str, Any] | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        """All queries scored in one matrix-matrix pass; one pipelined fetch for re-ranking."""
+        await self._sync()
+        if not self.reranks:
+            return await run_cpu(self.index.search_many, vectors, top_k=top_k, filters=filters)
+        candidates = await run_cpu(self.index.search_many, vectors, top_k=top_k * self.rerank_factor, filters=filters)
+        full = await self._fetch_vectors(self.index.candidate_ids(candidates))
+        return await run_cpu(self.index.rescore_many, vectors, candidates, full, top_k)
+
+    async def delete(self, id: str) -> None:
+        key = f"{self.ns_prefix}{id}"
+
+        def write(pipe, rows):
+            doc_id = self._doc_of(*rows[0])
+            pipe.delete(key)
+            if doc_id is not None:
+                pipe.srem(self._doc_key(doc_id), id)
+            pipe.incr(self.version_key)
+
+        version = (await self._watched([key], lambda reads: reads.hmget(key, "doc_id", "metadata"), write, "delete"))[-1]
+        await run_cpu(self._apply, version, lambda: self.index.remove(id))
+
+    async def document_vector_ids(self, doc_id: str) -> List[str]:
+        await self._ensure_docsets()
+        with self._round_trip("members"):
+            members = await self.client.smembers(self._doc_key(doc_id))
+        return self._member_ids(members)
+
+    async def list_documents(self) -> List[str]:
+        await self._ensure_docsets()
+        return [
+            key.decode()[len(self.doc_prefix):]
+            async for key in self.client.scan_iter(match=f"{self.doc_prefix}*", count=self.scan_batch)
+        ]
+
+    async def delete_documents(self, doc_ids: List[str]) -> int:
+        """Three round trips however many documents, WATCHing their sets as in the sync adapter."""
+        await self._ensure_docsets()
+        doc_keys = [self._doc_key(d) for d in doc_ids]
+        if not doc_keys:
+            return 0
+        ids: List[str] = []
+
+        def read(reads):
+            for key in doc_keys:
+                reads.smembers(key)
+
+        def write(pipe, members):
+            ids[:] = [id for m in members for id in self._member_ids(m)]
+            keys = [f"{self.ns_prefix}{id}" for id in ids] + doc_keys
+            for start in range(0, len(keys), self.delete_batch):
+                pipe.delete(*keys[start:start + self.delete_batch])
+            pipe.incr(self.version_key)
+
+        version = (await self._watched(doc_keys, read, write, "delete"))[-1]
+        await run_cpu(self._apply, version, lambda: [self.index.remove(id) for id in ids])
+        return len(ids)
+
+    async def persist(self) -> None:
+        # Redis persists per its config; no-op placeholder
+        return
+
+    async def load(self) -> None:
+        """Force a bulk reload of the in-memory index from Redis."""
+        async with self._reload_lock:
+            await self._reload(await self._remote_version())
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        await self.pool.aclose()
+
+    # ------------------------------------------------------------------
+    # Redis I/O
+    # ------------------------------------------------------------------
+    async def _fetch_vectors(self, ids: List[str]) -> np.ndarray:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for id in ids:
+                pipe.hmget(f"{self.ns_prefix}{id}", *self.fetch_fields)
+            with self._round_trip("fetch"):
+                rows = await pipe.execute()
+        return self._vectors_from_rows(rows)
+
+    async def _watched(self, keys: List[str], read, write, op: str) -> list:
+        """Optimistic WATCH / read / MULTI-EXEC transaction, retried on conflicts (see the sync adapter)."""
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    with self._round_trip("watch"):
+                        await pipe.watch(*keys)
+                    async with self.client.pipeline(transaction=False) as reads:
+                        read(reads)
+                        with self._round_trip("read"):
+                            replies = await reads.execute()
+                    pipe.multi()
+                    write(pipe, replies)
+                    with self._round_trip(op):
+                        return await pipe.execute()
+                except redis.WatchError:
+                    continue
+
+    async def _remote_version(self) -> int:
+        with self._round_trip("version"):
+            return int(await self.client.get(self.version_key) or 0)
+
+    async def _ensure_docsets(self) -> None:
+        """Build the per-document sets from the existing vectors, once per database."""
+        if self._docsets_ready or await self.client.exists(self.docsets_key):
+            self._docsets_ready = True
+            return
+        keys = []
+        async for key in self.client.scan_iter(match=f"{self.ns_prefix}*", count=self.scan_batch):
+            keys.append(key)
+            if len(keys) >= self.scan_batch:
+                await self._index_keys(keys)
+                keys = []
+        if keys:
+            await self._index_keys(keys)
+        await self.client.set(self.docsets_key, 1)
+        self._docsets_ready = True
+
+    async def _index_keys(self, keys: List[bytes]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for k in keys:
+                pipe.hmget(k, "doc_id", "metadata")
+            rows = await pipe.execute()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for k, row in zip(keys, rows):
+                doc_id = self._doc_of(*row)
+                if doc_id is not None:
+                    pipe.sadd(self._doc_key(doc_id), k.decode()[len(self.ns_prefix):])
+            await pipe.execute()
+
+    async def _sync(self) -> None:
+        version = await self._remote_version()
+        if not self._is_stale(version):
+            return
+        async with self._reload_lock:
+            if self._is_stale(version):
+                await self._reload(version)
+
+    async def _reload(self, version: int) -> None:
+        # a concurrent local write must not be applied onto a half-loaded index
+        generation = await run_cpu(self._begin_reload)
+        keys = []
+        pending = ([], [], [])
+        async for key in self.client.scan_iter(match=f"{self.ns_prefix}*", count=self.scan_batch):
+            keys.append(key)
+            if len(keys) >= self.scan_batch:
+                await self._load_keys(keys, pending)
+                keys = []
+                if self._flush_due(pending):
+                    await run_cpu(self._flush, pending, generation)
+        if keys:
+            await self._load_keys(keys, pending)
+        await run_cpu(self._flush, pending, generation)
+        self._finish_reload(version, generation)
+
+    async def _load_keys(self, keys: List[bytes], pending) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for k in keys:
+                pipe.hmget(k, self._load_field, "scale", "metadata")
+            with self._round_trip("load"):
+                rows = await pipe.execute()
+        missing = self._missing_vectors(keys, rows)
+        full = {}
+        if missing:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for k in missing:
+                    pipe.hget(k, "vector")
+                with self._round_trip("load"):
+                    full = dict(zip(missing, await pipe.execute()))
+        self._decode_rows(keys, rows, full, pending)
@@ -1,66 +1,484 @@
 # app/adapters/redis_vector_db_adapter.py
+import threading
 import redis
 import numpy as np
 import json
 from typing import List, Dict, Any
 from app.core.ports.vector_db import VectorDBInterface
+from app.adapters.vector_db.doc_membership import chunk_order
+from app.adapters.vector_db.in_memory_index import InMemoryVectorIndex
+from app.adapters.vector_db.quantization import build_codec
 from app.utils.config import settings
+from app.utils.metrics import REDIS_SECONDS, VECTORS_INSERTED
 
-class RedisVectorDBAdapter(VectorDBInterface):
+class _MirrorState:
     """
-    Simple Redis adapter storing each vector as a binary blob or JSON and performing
-    linear scan similarity queries. For production, prefer Redis 7.2+ vector search
-    (FT.CREATE ... WITH VECTOR) or a dedicated vector DB (Qdrant, Milvus).
+    The in-memory index and the Redis version it mirrors. One instance per process: the
+    sync and async adapters built for the same service share it (see RedisIndexMirror).
+    """
+
+    def __init__(self, index: InMemoryVectorIndex):
+        self.index = index
+        self.version: int | None = None  # Redis version mirrored by index
+        self.docsets_ready = False
+        self.generation = 0  # bumped by every bulk reload; stale loads drop their rows
+        self.lock = threading.RLock()
+
+
+class RedisIndexMirror:
+    """
+    Redis layout and in-memory mirror shared by the sync and async Redis adapters.
+    Each vector is stored as a float32 blob (or compressed codes, see below) plus JSON
+    metadata in a hash; queries run against an in-process InMemoryVectorIndex that is
+    bulk-loaded with SCAN + pipelined HMGET and kept in sync on insert/delete. A version
+    counter in Redis lets each instance detect writes made by other instances (or
+    processes) and reload before answering.
+
+    Opt-in compression (settings.VECTOR_STORAGE_DTYPE = "float16" | "int8") stores quantized
+    "codes" (+ per-vector "scale") instead of the float32 blob, so Redis, the mirror and the
+    bulk-load traffic all shrink. Bulk loads pull only the codes and the index scores on them:
+    - with PQ (VECTOR_PQ_SUBSPACES > 0) the index scores on coarser PQ codes and the top
+      candidates are re-ranked on the decoded storage codes
+    - without PQ the index already scores on the decoded storage codes, so there is nothing
+      better to re-rank on and searches skip the round trip
+    - VECTOR_RERANK_FULL_PRECISION keeps the float32 blob next to the codes and re-ranks on
+      it (mainly for int8); Redis then holds more than with plain float32
+
+    Each document also has a set vecdoc:<doc_id> with the ids of its vectors, maintained in
+    the same MULTI/EXEC as the inserts and deletes, so listing or deleting a document costs
+    O(its chunks) instead of a scan over every key. Writes that depend on what they read
+    (the previous doc_id of a re-inserted vector, the members of a deleted document) WATCH
+    those keys and retry if another client changed them before EXEC. Data written before these sets existed
+    is indexed once, on the first document-scoped call (marker key vecmeta:docsets).
+
+    Passing `share_with` (another adapter on the same Redis) reuses its index and version
+    bookkeeping, so a process holding a sync and an async adapter keeps a single mirror.
+    """
+
+    ns_prefix = "vec:"  # key prefix
+    doc_prefix = "vecdoc:"  # per-document set of vector ids
+    version_key = "vecmeta:version"  # bumped on every write
+    docsets_key = "vecmeta:docsets"  # set once the per-document sets cover all vectors
+    delete_batch = 1000  # keys per DEL command in bulk deletes
+
+    def __init__(self, share_with: "RedisIndexMirror | None" = None):
+        self.scan_batch = settings.REDIS_SCAN_BATCH
+        self.insert_batch = settings.REDIS_INSERT_BATCH
+        self.storage_codec = build_codec(settings.VECTOR_STORAGE_DTYPE)
+        self.compressed = self.storage_codec.name != "float32"
+        # compressed storage keeps the float32 blob only for an explicit full-precision re-rank (see above)
+        self.stores_full = not self.compressed or settings.VECTOR_RERANK_FULL_PRECISION
+        self.rerank_factor = settings.VECTOR_RERANK_FACTOR
+        self.pq_train_size = settings.PQ_TRAIN_SIZE
+        if share_with is not None:
+            self._state = share_with._state
+        else:
+            self._state = _MirrorState(InMemoryVectorIndex(
+                settings.EMBEDDING_DIM,
+                codec=build_codec(settings.VECTOR_STORAGE_DTYPE, settings.EMBEDDING_DIM, settings.VECTOR_PQ_SUBSPACES),
+            ))
+
+    @property
+    def index(self) -> InMemoryVectorIndex:
+        return self._state.index
+
+    @property
+    def _lock(self) -> threading.RLock:
+        return self._state.lock
+
+    @property
+    def _index_version(self) -> int | None:
+        return self._state.version
+
+    @_index_version.setter
+    def _index_version(self, version: int | None) -> None:
+        self._state.version = version
+
+    @property
+    def _docsets_ready(self) -> bool:
+        return self._state.docsets_ready
+
+    @_docsets_ready.setter
+    def _docsets_ready(self, ready: bool) -> None:
+        self._state.docsets_ready = ready
+
+    @property
+    def reranks(self) -> bool:
+        # Redis holds something finer than what the index scores on
+        return self.index.codec.name == "pq" or (self.compressed and self.stores_full)
+
+    @staticmethod
+    def _round_trip(op: str):
+        """Context manager timing one Redis round trip into mcp_redis_roundtrip_seconds{op}."""
+        return REDIS_SECONDS.labels(op).time()
+
+    # ------------------------------------------------------------------
+    # Encoding helpers
+    # ------------------------------------------------------------------
+    def _mappings(self, vectors: np.ndarray, metas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build the hash fields for a batch of vectors (quantized codes and / or the float32 blob)."""
+        mappings = [{"metadata": json.dumps(meta)} for meta in metas]
+        for mapping, vec, meta in zip(mappings, vectors, metas):
+            if self.stores_full:
+                mapping["vector"] = vec.tobytes()
+            if meta.get("doc_id") is not None:
+                mapping["doc_id"] = str(meta["doc_id"])
+        if self.compressed:
+            codes, scales = self.storage_codec.encode(InMemoryVectorIndex.normalize(vectors))
+            for mapping, code, scale in zip(mappings, codes, scales):
+                mapping["codes"] = code.tobytes()
+                mapping["scale"] = float(scale)
+        return mappings
+
+    def _doc_key(self, doc_id: str) -> str:
+        return f"{self.doc_prefix}{doc_id}"
+
+    def _queue_upserts(self, pipe, ids: List[str], mappings: List[Dict[str, Any]], previous: List[str | None]) -> None:
+        """Queue the HSETs of a batch, moving re-inserted ids out of their previous document's set."""
+        for id, mapping, old_doc in zip(ids, mappings, previous):
+            key = f"{self.ns_prefix}{id}"
+            doc_id = mapping.get("doc_id")
+            if old_doc is not None and old_doc != doc_id:
+                pipe.srem(self._doc_key(old_doc), id)
+            if doc_id is None:
+                pipe.hdel(key, "doc_id")
+            pipe.hset(key, mapping=mapping)
+            if doc_id is not None:
+                pipe.sadd(self._doc_key(doc_id), id)
+        pipe.incr(self.version_key)
+
+    @staticmethod
+    def _doc_of(raw_doc_id: bytes | None, meta_raw: bytes | None) -> str | None:
+        """doc_id of a stored vector: its own field, or the metadata of entries older than that field."""
+        if raw_doc_id:
+            return raw_doc_id.decode()
+        try:
+            doc_id = json.loads(meta_raw).get("doc_id") if meta_raw else None
+        except Exception:
+            return None
+        return None if doc_id is None else str(doc_id)
+
+    def _member_ids(self, members) -> List[str]:
+        return sorted((m.decode() if isinstance(m, bytes) else str(m) for m in members), key=chunk_order)
+
+    fetch_fields = ("vector", "codes", "scale")
+
+    def _vectors_from_rows(self, rows) -> np.ndarray:
+        """Vectors from HMGET fetch_fields rows: the float32 blob, else the decoded codes (zeros if missing)."""
+        out = np.zeros((len(rows), self.index.dim), dtype=np.float32)
+        for i, (raw, codes, scale) in enumerate(rows):
+            if raw:
+                out[i] = np.frombuffer(raw, dtype=np.float32)
+            elif codes and self.compressed:
+                codes = np.frombuffer(codes, dtype=self.storage_codec.dtype)[None, :]
+                out[i] = self.storage_codec.decode(codes, np.array([float(scale or 1.0)], dtype=np.float32))[0]
+        return out
+
+    # ------------------------------------------------------------------
+    # In-memory index synchronization
+    # ------------------------------------------------------------------
+    def _apply(self, version: int, mutate) -> None:
+        """
+        Apply a local write to the index if it is the only change since the last sync;
+        otherwise another writer got in between and the index is marked stale.
+        """
+        with self._lock:
+            if self._index_version is not None and version == self._index_version + 1:
+                mutate()
+                self._index_version = version
+            else:
+                self._index_version = None
+
+    def _is_stale(self, version: int) -> bool:
+        return self._index_version != version or self.index.needs_retrain
+
+    def _begin_reload(self) -> int:
+        """
+        Empty the index for a bulk load and return the load's generation. A local write
+        applied meanwhile only marks the index stale, and a newer reload (from the other
+        adapter sharing this mirror) makes this one's remaining rows be dropped.
+        """
+        with self._lock:
+            self._index_version = None
+            self.index.clear()
+            self._state.generation += 1
+            return self._state.generation
+
+    def _finish_reload(self, version: int, generation: int) -> None:
+        with self._lock:
+            if self._state.generation == generation:
+                self._index_version = version
+
+    def _flush(self, pending, generation: int) -> None:
+        ids, vectors, metas = pending
+        with self._lock:
+            if ids and self._state.generation == generation:
+                self.index.add(ids, np.stack(vectors), metas)
+        for part in pending:
+            part.clear()
+
+    def _flush_due(self, pending) -> bool:
+        # a trainable codec (PQ) is fitted on the first pq_train_size vectors
+        return self.index.codec.trained or len(pending[0]) >= self.pq_train_size
+
+    @property
+    def _load_field(self) -> str:
+        return "codes" if self.compressed else "vector"
+
+    def _decode_rows(self, keys: List[bytes], rows, full: Dict[bytes, bytes], pending) -> None:
+        """Decode HMGET rows (field, scale, metadata) into the pending (ids, vectors, metas) buffers."""
+        ids, vectors, metas = pending
+        for k, (raw, scale, meta_raw) in zip(keys, rows):
+            if raw and self.compressed:
+                codes = np.frombuffer(raw, dtype=self.storage_codec.dtype)[None, :]
+                vec = self.storage_codec.decode(codes, np.array([float(scale or 1.0)], dtype=np.float32))[0]
+            elif raw:
+                vec = np.frombuffer(raw, dtype=np.float32)
+            elif full.get(k):
+                vec = np.frombuffer(full[k], dtype=np.float32)
+            else:
+                continue
+            try:
+                meta = json.loads(meta_raw) if meta_raw else {}
+            except Exception:
+                meta = {}
+            key_decoded = k.decode() if isinstance(k, bytes) else str(k)
+            ids.append(key_decoded[len(self.ns_prefix):])
+            vectors.append(vec)
+            metas.append(meta)
+
+    def _missing_vectors(self, keys: List[bytes], rows) -> List[bytes]:
+        # entries written before compression was enabled only carry the float32 blob
+        return [k for k, (raw, _, _) in zip(keys, rows) if not raw] if self.compressed else []
+
+
+class RedisVectorDBAdapter(RedisIndexMirror, VectorDBInterface):
+    """
+    Redis adapter storing each vector (float32 blob and / or codes) plus JSON metadata in a hash,
+    mirrored by an in-process index (see RedisIndexMirror). Uses the blocking redis client;
+    AsyncRedisVectorDBAdapter is the redis.asyncio variant used by the API routes.
     """
 
     def __init__(self, host: str = None, port: int = None, db: int = None):
+        super().__init__()
         host = host or settings.REDIS_HOST
         port = port or settings.REDIS_PORT
         db = db or settings.REDIS_DB
         # decode_responses=False to get bytes for vector blobs if used
         self.client = redis.Redis(host=host, port=port, db=db, decode_responses=False)
-        self.ns_prefix = "vec:"  # key prefix
 
     def insert(self, id: str, vector: List[float], metadata: Dict[str, Any] = None) -> None:
         key = f"{self.ns_prefix}{id}"
         # store vector as bytes (float32) and metadata as json in a hash
         arr = np.array(vector, dtype=np.float32)
-        self.client.hset(key, mapping={
-            "vector": arr.tobytes(),
-            "metadata": json.dumps(metadata or {})
-        })
-
-    def query(self, vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
-        q = np.array(vector, dtype=np.float32)
-        keys = self.client.keys(f"{self.ns_prefix}*")
-        results = []
-        for k in keys:
-            raw = self.client.hget(k, "vector")
-            if not raw:
-                continue
-            vec = np.frombuffer(raw, dtype=np.float32)
-            denom = (np.linalg.norm(q) * np.linalg.norm(vec)) + 1e-12
-            score = float(np.dot(q, vec) / denom)
-            meta_raw = self.client.hget(k, "metadata")
-            try:
-                meta = json.loads(meta_raw) if meta_raw else {}
-            except Exception:
-                meta = {}
-            key_decoded = k.decode() if isinstance(k, bytes) else str(k)
-            id_only = key_decoded.replace(self.ns_prefix, "")
-            results.append({"id": id_only, "score": score, "metadata": meta})
-        # sort desc by score
-        results.sort(key=lambda r: r["score"], reverse=True)
-        return results[:top_k]
+        meta = metadata or {}
+        self.insert_many([id], arr[None, :], [meta])
+
+    def insert_many(self, ids: List[str], vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        """
+        Insert vectors in MULTI/EXEC pipelines of `insert_batch` entries, i.e. a fixed number
+        of round trips per batch instead of one per vector. The batch's keys are WATCHed while
+        their current doc_id is read, so an id moving to another document leaves the old set.
+        """
+        arr = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        metas = [m or {} for m in metadata]
+        for start in range(0, len(ids), self.insert_batch):
+            end = start + self.insert_batch
+            batch_ids, batch_vecs, batch_metas = ids[start:end], arr[start:end], metas[start:end]
+            mappings = self._mappings(batch_vecs, batch_metas)
+            keys = [f"{self.ns_prefix}{id}" for id in batch_ids]
+
+            def read(reads):
+                for key in keys:
+                    reads.hmget(key, "doc_id", "metadata")
+
+            def write(pipe, rows):
+                self._queue_upserts(pipe, batch_ids, mappings, [self._doc_of(*row) for row in rows])
+
+            version = self._watched(keys, read, write, "insert")[-1]
+            self._apply(version, lambda: self.index.add(batch_ids, batch_vecs, batch_metas))
+            VECTORS_INSERTED.inc(len(batch_ids))
+
+    def query(self, vector: List[float], top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        self._sync()
+        rerank = self.fetch_vectors if self.reranks else None
+        return self.index.search(vector, top_k=top_k, rerank=rerank, rerank_factor=self.rerank_factor, filters=filters)
+
+    def query_many(
+        self, vectors: List[List[float]], top_k: int = 5, filters: Dict[str, Any] | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        self._sync()
+        rerank = self.fetch_vectors if self.reranks else None
+        return self.index.search_many(
+            vectors, top_k=top_k, rerank=rerank, rerank_factor=self.rerank_factor, filters=filters
+        )
 
     def delete(self, id: str) -> None:
         key = f"{self.ns_prefix}{id}"
-        self.client.delete(key)
+
+        def write(pipe, rows):
+            doc_id = self._doc_of(*rows[0])
+            pipe.delete(key)
+            if doc_id is not None:
+                pipe.srem(self._doc_key(doc_id), id)
+            pipe.incr(self.version_key)
+
+        version = self._watched([key], lambda reads: reads.hmget(key, "doc_id", "metadata"), write, "delete")[-1]
+        self._apply(version, lambda: self.index.remove(id))
+
+    def fetch_vectors(self, ids: List[str]) -> np.ndarray:
+        """
+        Vectors for re-ranking and hybrid search, fetched in one pipelined round trip:
+        full precision, or decoded from the storage codes when no float32 blob is kept.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for id in ids:
+            pipe.hmget(f"{self.ns_prefix}{id}", *self.fetch_fields)
+        with self._round_trip("fetch"):
+            rows = pipe.execute()
+        return self._vectors_from_rows(rows)
+
+    def document_vector_ids(self, doc_id: str) -> List[str]:
+        self._ensure_docsets()
+        with self._round_trip("members"):
+            members = self.client.smembers(self._doc_key(doc_id))
+        return self._member_ids(members)
+
+    def list_documents(self) -> List[str]:
+        """Document ids, from a SCAN over the per-document sets only (Redis drops empty sets)."""
+        self._ensure_docsets()
+        return [
+            key.decode()[len(self.doc_prefix):]
+            for key in self.client.scan_iter(match=f"{self.doc_prefix}*", count=self.scan_batch)
+        ]
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """
+        Three round trips however many documents: WATCH their sets, one pipeline reading
+        them, one MULTI/EXEC deleting vectors and sets with multi-key DELs. A vector added to
+        (or moved out of) one of the documents in between aborts the EXEC and it is retried.
+        """
+        self._ensure_docsets()
+        doc_keys = [self._doc_key(d) for d in doc_ids]
+        if not doc_keys:
+            return 0
+        ids: List[str] = []
+
+        def read(reads):
+            for key in doc_keys:
+                reads.smembers(key)
+
+        def write(pipe, members):
+            ids[:] = [id for m in members for id in self._member_ids(m)]
+            keys = [f"{self.ns_prefix}{id}" for id in ids] + doc_keys
+            for start in range(0, len(keys), self.delete_batch):
+                pipe.delete(*keys[start:start + self.delete_batch])
+            pipe.incr(self.version_key)
+
+        version = self._watched(doc_keys, read, write, "delete")[-1]
+        self._apply(version, lambda: [self.index.remove(id) for id in ids])
+        return len(ids)
 
     def persist(self) -> None:
         # Redis persists per its config; no-op placeholder
         return
 
     def load(self) -> None:
-        # No-op: Redis holds data; but you could implement reindexing helper here
-        return
+        """Force a bulk reload of the in-memory index from Redis."""
+        with self._lock:
+            self._reload(self._remote_version())
+
+    # ------------------------------------------------------------------
+    # Redis I/O
+    # ------------------------------------------------------------------
+    def _watched(self, keys: List[str], read, write, op: str) -> list:
+        """
+        Optimistic transaction: WATCH `keys`, run read(pipeline) in one pipelined round trip,
+        then queue write(pipe, replies) in MULTI/EXEC. Retried while another client modifies
+        a watched key before the EXEC. Returns the EXEC replies.
+        """
+        with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    with self._round_trip("watch"):
+                        pipe.watch(*keys)
+                    reads = self.client.pipeline(transaction=False)
+                    read(reads)
+                    with self._round_trip("read"):
+                        replies = reads.execute()
+                    pipe.multi()
+                    write(pipe, replies)
+                    with self._round_trip(op):
+                        return pipe.execute()
+                except redis.WatchError:
+                    continue
+
+    def _remote_version(self) -> int:
+        with self._round_trip("version"):
+            return int(self.client.get(self.version_key) or 0)
+
+    def _ensure_docsets(self) -> None:
+        """Build the per-document sets from the existing vectors, once per database."""
+        if self._docsets_ready or self.client.exists(self.docsets_key):
+            self._docsets_ready = True
+            return
+        keys = []
+        for key in self.client.scan_iter(match=f"{self.ns_prefix}*", count=self.scan_batch):
+            keys.append(key)
+            if len(keys) >= self.scan_batch:
+                self._index_keys(keys)
+                keys = []
+        if keys:
+            self._index_keys(keys)
+        self.client.set(self.docsets_key, 1)
+        self._docsets_ready = True
+
+    def _index_keys(self, keys: List[bytes]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for k in keys:
+            pipe.hmget(k, "doc_id", "metadata")
+        rows = pipe.execute()
+        pipe = self.client.pipeline(transaction=False)
+        for k, row in zip(keys, rows):
+            doc_id = self._doc_of(*row)
+            if doc_id is not None:
+                pipe.sadd(self._doc_key(doc_id), k.decode()[len(self.ns_prefix):])
+        pipe.execute()
+
+    def _sync(self) -> None:
+        version = self._remote_version()
+        with self._lock:
+            if self._is_stale(version):
+                self._reload(version)
+
+    def _reload(self, version: int) -> None:
+        generation = self._begin_reload()
+        keys = []
+        pending = ([], [], [])
+        for key in self.client.scan_iter(match=f"{self.ns_prefix}*", count=self.scan_batch):
+            keys.append(key)
+            if len(keys) >= self.scan_batch:
+                self._load_keys(keys, pending)
+                keys = []
+                if self._flush_due(pending):
+                    self._flush(pending, generation)
+        if keys:
+            self._load_keys(keys, pending)
+        self._flush(pending, generation)
+        self._finish_reload(version, generation)
+
+    def _load_keys(self, keys: List[bytes], pending) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for k in keys:
+            pipe.hmget(k, self._load_field, "scale", "metadata")
+        with self._round_trip("load"):
+            rows = pipe.execute()
+        missing = self._missing_vectors(keys, rows)
+        full = {}
+        if missing:
+            pipe = self.client.pipeline(transaction=False)
+            for k in missing:
+                pipe.hget(k, "vector")
+            with self._round_trip("load"):
+                full = dict(zip(missing, pipe.execute()))
+        self._decode_rows(keys, rows, full, pending)
@@ -0,0 +1,53 @@
+from typing import List, Dict, Any
+from app.core.ports.async_vector_db import AsyncVectorDBInterface
+from app.core.ports.vector_db import VectorDBInterface
+from app.utils.concurrency import run_cpu
+
+
+class ThreadedAsyncVectorDB(AsyncVectorDBInterface):
+    """
+    Async facade over a synchronous, in-process VectorDBInterface (HNSW, mmap segments):
+    every call runs on the bounded CPU pool, so scans and graph searches never block the
+    event loop. The wrapped adapter stays reachable as `sync_db` for sync callers;
+    close() only closes it when `owns_sync_db` (otherwise its creator does).
+    """
+
+    def __init__(self, sync_db: VectorDBInterface, owns_sync_db: bool = False):
+        self.sync_db = sync_db
+        self.owns_sync_db = owns_sync_db
+
+    async def insert(self, id: str, vector: List[float], metadata: Dict[str, Any] = None) -> None:
+        await run_cpu(self.sync_db.insert, id, vector, metadata)
+
+    async def insert_many(self, ids: List[str], vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        await run_cpu(self.sync_db.insert_many, ids, vectors, metadata)
+
+    async def query(self, vector: List[float], top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        return await run_cpu(self.sync_db.query, vector, top_k=top_k, filters=filters)
+
+    async def query_many(
+        self, vectors: List[List[float]], top_k: int = 5, filters: Dict[str, Any] | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        return await run_cpu(self.sync_db.query_many, vectors, top_k=top_k, filters=filters)
+
+    async def delete(self, id: str) -> None:
+        await run_cpu(self.sync_db.delete, id)
+
+    async def document_vector_ids(self, doc_id: str) -> List[str]:
+        return await run_cpu(self.sync_db.document_vector_ids, doc_id)
+
+    async def list_documents(self) -> List[str]:
+        return await run_cpu(self.sync_db.list_documents)
+
+    async def delete_documents(self, doc_ids: List[str]) -> int:
+        return await run_cpu(self.sync_db.delete_documents, doc_ids)
+
+    async def persist(self) -> None:
+        await run_cpu(self.sync_db.persist)
+
+    async def load(self) -> None:
+        await run_cpu(self.sync_db.load)
+
+    async def close(self) -> None:
+        if self.owns_sync_db and hasattr(self.sync_db, "close"):
+            await run_cpu(self.sync_db.close)
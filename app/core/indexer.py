@@ -7,14 +7,19 @@ class IndexerCore:
         self.vector_db = vector_db
 
     def index_vectors(self, doc_id: str, vectors: list[list[float]], metadata_list: list[dict]):
-        """Insert vectors into the database."""
-        for vec, meta in zip(vectors, metadata_list):
-            self.vector_db.insert(id=f"{doc_id}_{meta.get('chunk_id')}", vector=vec, metadata=meta)
+        """Insert vectors into the database, tagged with doc_id so delete_document can find them."""
+        ids = [f"{doc_id}_{meta.get('chunk_id')}" for meta in metadata_list]
+        metadata_list = [{**meta, "doc_id": doc_id} for meta in metadata_list]
+        self.vector_db.insert_many(ids, vectors, metadata_list)
 
-    def search_vectors(self, query_vector: list[float], top_k: int = 5):
-        """Query similar vectors."""
-        return self.vector_db.query(query_vector, top_k=top_k)
+    def search_vectors(self, query_vector: list[float], top_k: int = 5, filters: dict | None = None):
+        """Query similar vectors, optionally restricted by a metadata filter."""
+        return self.vector_db.query(query_vector, top_k=top_k, filters=filters)
 
-    def delete_document(self, doc_id: str):
-        """Delete all vectors associated with a document."""
-        self.vector_db.delete(doc_id)
+    def delete_document(self, doc_id: str) -> int:
+        """Delete all vectors associated with a document. Returns how many were removed."""
+        return self.vector_db.delete_document(doc_id)
+
+    def delete_documents(self, doc_ids: list[str]) -> int:
+        """Delete all vectors of several documents in one batched operation."""
+        return self.vector_db.delete_documents(doc_ids)
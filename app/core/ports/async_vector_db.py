@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any
+
+class AsyncVectorDBInterface(ABC):
+    """Async counterpart of VectorDBInterface, for adapters awaited from the event loop."""
+
+    @abstractmethod
+    async def insert(self, id: str, vector: List[float], metadata: Dict[str, Any]) -> None:
+        """Insert a new vector with its metadata into the database."""
+        raise NotImplementedError
+
+    async def insert_many(self, ids: List[str], vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        """Insert a batch of vectors. Adapters should override this to batch round trips."""
+        for id, vector, meta in zip(ids, vectors, metadata):
+            await self.insert(id, vector, meta)
+
+    @abstractmethod
+    async def query(self, vector: List[float], top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """
+        Query the top_k most similar vectors. `filters` restricts the search to vectors whose
+        metadata matches ({field: value} for equality, {field: [values]} for IN, AND across fields).
+        """
+        raise NotImplementedError
+
+    async def query_many(
+        self, vectors: List[List[float]], top_k: int = 5, filters: Dict[str, Any] | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Query a batch of vectors (same filters for all). Adapters should override this to score the batch at once."""
+        return [await self.query(vector, top_k=top_k, filters=filters) for vector in vectors]
+
+    @abstractmethod
+    async def delete(self, id: str) -> None:
+        """Remove a vector by its ID."""
+        raise NotImplementedError
+
+    async def document_vector_ids(self, doc_id: str) -> List[str]:
+        """IDs of the vectors of one document (grouped by the "doc_id" metadata field)."""
+        raise NotImplementedError
+
+    async def list_documents(self) -> List[str]:
+        """IDs of the documents that have vectors stored."""
+        raise NotImplementedError
+
+    async def delete_document(self, doc_id: str) -> int:
+        """Remove every vector of a document. Returns the number of vectors removed."""
+        return await self.delete_documents([doc_id])
+
+    async def delete_documents(self, doc_ids: List[str]) -> int:
+        """Remove every vector of several documents. Adapters should override this to batch round trips."""
+        removed = 0
+        for doc_id in doc_ids:
+            for id in await self.document_vector_ids(doc_id):
+                await self.delete(id)
+                removed += 1
+        return removed
+
+    @abstractmethod
+    async def persist(self) -> None:
+        """Persist the index to disk or remote storage."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def load(self) -> None:
+        """Load a persisted index into memory."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release connections / file handles."""
+        return
@@ -1,14 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Tuple
 
 class EmbedderInterface(ABC):
     """Interface that defines the contract for text embedding generators."""
 
+    model_version: str | None = None  # version of the model currently used by encode()
+
     @abstractmethod
     def encode(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts."""
+        """Generate embeddings for a list of texts (a list of rows or an (N, D) array)."""
         raise NotImplementedError
 
+    def encode_versioned(self, texts: List[str]) -> Tuple[List[List[float]], str | None]:
+        """Generate embeddings and return them with the model version that produced them."""
+        return self.encode(texts), self.model_version
+
     @abstractmethod
     def train(self, texts: List[str]) -> None:
         """Optional: train or fine-tune the model."""
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterable, List, Tuple
 
 class FileStorageInterface(ABC):
     """Interface for document or chunk storage management."""
@@ -9,12 +9,53 @@ class FileStorageInterface(ABC):
         """Save text chunks and return a document ID."""
         raise NotImplementedError
 
+    def save_stream(self, chunks: Iterable[str]) -> str:
+        """Save chunks produced lazily. Adapters should override this to avoid materializing them."""
+        return self.save(list(chunks))
+
     @abstractmethod
     def load(self, doc_id: str) -> List[str]:
         """Retrieve chunks from a stored document by ID."""
         raise NotImplementedError
 
+    def load_chunk(self, doc_id: str, index: int) -> str:
+        """Retrieve a single chunk. Adapters should override this to avoid loading the whole document."""
+        return self.load(doc_id)[index]
+
+    def load_chunks(self, doc_id: str, indices: List[int]) -> List[str]:
+        """Retrieve several chunks of one document. Adapters should override this to open it once."""
+        return [self.load_chunk(doc_id, i) for i in indices]
+
+    def save_chunk_pages(self, doc_id: str, pages: List[Tuple[int, int]]) -> None:
+        """Record the (first, last) source page of each chunk of a paginated document (PDF, DOCX)."""
+
+    def load_chunk_pages(self, doc_id: str) -> List[Tuple[int, int]] | None:
+        """Page spans saved by save_chunk_pages, or None if the document has none."""
+        return None
+
     @abstractmethod
     def delete(self, doc_id: str) -> None:
         """Delete a document from storage."""
         raise NotImplementedError
+
+    def list_ids(self) -> List[str]:
+        """Return the IDs of all stored documents."""
+        raise NotImplementedError
+
+    def find_by_hash(self, content_hash: str) -> str | None:
+        """Return the ID of a stored document with this content hash, if any."""
+        return None
+
+    def register_hash(self, doc_id: str, content_hash: str) -> None:
+        """Record the content hash of a stored document. No-op for adapters without dedup."""
+
+    def claim_hash(self, content_hash: str, doc_id: str) -> str | None:
+        """
+        Register doc_id under content_hash unless another stored document already holds it;
+        return that document's ID in that case. Adapters with dedup should make this atomic.
+        """
+        existing = self.find_by_hash(content_hash)
+        if existing is not None and existing != doc_id:
+            return existing
+        self.register_hash(doc_id, content_hash)
+        return None
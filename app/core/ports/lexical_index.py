@@ -0,0 +1,58 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List
+
+class PendingDocument(ABC):
+    """A document being analysed chunk by chunk (e.g. while it is written) before it is indexed."""
+
+    @abstractmethod
+    def add(self, chunk: str) -> None:
+        """Analyse the next chunk of the document."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def commit(self, doc_id: str) -> None:
+        """Index (or re-index) the document under doc_id with the chunks added so far."""
+        raise NotImplementedError
+
+
+class LexicalIndexInterface(ABC):
+    """Interface for keyword (inverted) indexes over the stored chunks."""
+
+    @abstractmethod
+    def new_document(self) -> PendingDocument:
+        """Start a document whose chunks are fed one at a time (see PendingDocument)."""
+        raise NotImplementedError
+
+    def add_document(self, doc_id: str, chunks: Iterable[str]) -> None:
+        """Index (or re-index) the chunks of a document, in order."""
+        pending = self.new_document()
+        for chunk in chunks:
+            pending.add(chunk)
+        pending.commit(doc_id)
+
+    @abstractmethod
+    def remove_document(self, doc_id: str) -> bool:
+        """Drop a document from the index. Returns False if it was not indexed."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, query: str, top_k: int = 10, doc_ids: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+        """
+        Top_k chunks by lexical relevance, best first, as
+        {"doc_id": str, "chunk_index": int, "score": float}. `doc_ids` restricts the search.
+        """
+        raise NotImplementedError
+
+    def documents(self) -> List[str]:
+        """IDs of the indexed documents."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Size counters of the index."""
+        return {}
+
+    def persist(self) -> None:
+        """Persist the index. No-op for purely in-memory indexes."""
+
+    def close(self) -> None:
+        """Flush pending changes and release resources."""
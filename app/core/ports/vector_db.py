@@ -9,16 +9,58 @@ class VectorDBInterface(ABC):
         """Insert a new vector with its metadata into the database."""
         raise NotImplementedError
 
+    def insert_many(self, ids: List[str], vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> None:
+        """Insert a batch of vectors. Adapters should override this to batch round trips."""
+        for id, vector, meta in zip(ids, vectors, metadata):
+            self.insert(id, vector, meta)
+
     @abstractmethod
-    def query(self, vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
-        """Query the top_k most similar vectors."""
+    def query(self, vector: List[float], top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """
+        Query the top_k most similar vectors. `filters` restricts the search to vectors whose
+        metadata matches ({field: value} for equality, {field: [values]} for IN, AND across fields).
+        """
         raise NotImplementedError
 
+    def query_many(
+        self, vectors: List[List[float]], top_k: int = 5, filters: Dict[str, Any] | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Query a batch of vectors (same filters for all). Adapters should override this to score the batch at once."""
+        return [self.query(vector, top_k=top_k, filters=filters) for vector in vectors]
+
     @abstractmethod
     def delete(self, id: str) -> None:
         """Remove a vector by its ID."""
         raise NotImplementedError
 
+    def fetch_vectors(self, ids: List[str]) -> List[List[float]]:
+        """
+        Stored vectors of `ids` (a list of rows or an (N, D) array), all-zero rows for ids that
+        are not stored. Lets callers score candidates found elsewhere (e.g. BM25) without re-encoding.
+        """
+        raise NotImplementedError
+
+    def document_vector_ids(self, doc_id: str) -> List[str]:
+        """IDs of the vectors of one document (grouped by the "doc_id" metadata field)."""
+        raise NotImplementedError
+
+    def list_documents(self) -> List[str]:
+        """IDs of the documents that have vectors stored."""
+        raise NotImplementedError
+
+    def delete_document(self, doc_id: str) -> int:
+        """Remove every vector of a document. Returns the number of vectors removed."""
+        return self.delete_documents([doc_id])
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """Remove every vector of several documents. Adapters should override this to batch round trips."""
+        removed = 0
+        for doc_id in doc_ids:
+            for id in self.document_vector_ids(doc_id):
+                self.delete(id)
+                removed += 1
+        return removed
+
     @abstractmethod
     def persist(self) -> None:
         """Persist the index to disk or remote storage."""
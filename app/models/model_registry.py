@@ -0,0 +1,91 @@
+# app/models/model_registry.py
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Tuple
+
+import numpy as np
+
+from app.utils.config import settings
+
+
+class ModelRegistry:
+    """
+    Versioned store for trained SkipGram artifacts:
+        <root>/versions/<version>/embeddings.npy   (V, D) float32 input embeddings
+        <root>/versions/<version>/vocab.json       word -> row
+        <root>/versions/<version>/model.pt         full state_dict (optional, for fine-tuning)
+        <root>/versions/<version>/meta.json
+        <root>/CURRENT                              name of the active version
+    A version directory is fully written under a temporary name and renamed into place,
+    then CURRENT is replaced atomically, so readers never observe a half-written model.
+    """
+
+    def __init__(self, root: str | Path | None = None, keep_versions: int | None = None):
+        self.root = Path(root or settings.MODEL_DIR)
+        self.versions_dir = self.root / "versions"
+        self.pointer_path = self.root / "CURRENT"
+        self.keep_versions = settings.MODEL_KEEP_VERSIONS if keep_versions is None else keep_versions
+
+    def current_version(self) -> str | None:
+        try:
+            return self.pointer_path.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def version_dir(self, version: str) -> Path:
+        return self.versions_dir / version
+
+    def publish(
+        self,
+        embeddings: np.ndarray,
+        word2idx: Dict[str, int],
+        state_dict: Dict[str, Any] | None = None,
+        meta: Dict[str, Any] | None = None,
+    ) -> str:
+        """Write a new version and make it current. Returns the version name."""
+        now = time.time()
+        # sortable by creation time (prune() relies on it), unique across processes
+        version = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1e6) % 1_000_000:06d}-{uuid.uuid4().hex[:4]}"
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = self.versions_dir / f".staging-{version}"
+        staging.mkdir()
+        np.save(staging / "embeddings.npy", np.ascontiguousarray(embeddings, dtype=np.float32))
+        with open(staging / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(word2idx, f)
+        if state_dict is not None:
+            import torch
+            torch.save(state_dict, staging / "model.pt")
+        with open(staging / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"version": version, "created_at": now, **(meta or {})}, f)
+        os.replace(staging, self.version_dir(version))
+
+        tmp_pointer = self.root / f".CURRENT.{version}"
+        tmp_pointer.write_text(version, encoding="utf-8")
+        os.replace(tmp_pointer, self.pointer_path)
+        self.prune()
+        return version
+
+    def load(self, version: str) -> Tuple[Dict[str, int], np.ndarray]:
+        """
+        Load (word2idx, embeddings) of a version. Embeddings are memory-mapped
+        copy-on-write, so every process shares the same page-cache pages.
+        """
+        path = self.version_dir(version)
+        with open(path / "vocab.json", "r", encoding="utf-8") as f:
+            word2idx = json.load(f)
+        embeddings = np.load(path / "embeddings.npy", mmap_mode="c")
+        return word2idx, embeddings
+
+    def prune(self) -> None:
+        """Drop old versions beyond keep_versions (never the current one)."""
+        if not self.keep_versions or not self.versions_dir.exists():
+            return
+        current = self.current_version()
+        versions = sorted(p.name for p in self.versions_dir.iterdir() if p.is_dir() and not p.name.startswith("."))
+        for version in versions[:-self.keep_versions]:
+            if version != current:
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
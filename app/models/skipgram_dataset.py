@@ -1,6 +1,9 @@
 # models/skipgram_dataset.py
+from array import array
+from collections import Counter
+import numpy as np
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, IterableDataset, get_worker_info
 
 class SkipGramDataset(Dataset):
     def __init__(self, data, window_size=2):
@@ -11,6 +14,8 @@ class SkipGramDataset(Dataset):
                                for token in sentence.split()]))
         self.word2idx = {word: idx for idx, word in enumerate(self.vocab)}
         self.idx2word = {idx: word for word, idx in self.word2idx.items()}
+        freq = Counter(token.lower() for sentence in self.data for token in sentence.split())
+        self.counts = [freq[word] for word in self.vocab]  # used by negative sampling / Huffman tree
         self.data = self.gen_dataset()
  
     def gen_dataset(self):
@@ -31,3 +36,111 @@ class SkipGramDataset(Dataset):
 
     def __getitem__(self, idx):
         return self.data[idx]
+
+
+class StreamingSkipGramDataset(IterableDataset):
+    """
+    Memory-lean SkipGram dataset: the corpus is kept as one int32 token-id array plus
+    sentence end offsets, and (center, context) pairs are generated on the fly.
+    - Vocabulary and counts are built in a single pass; `data` may be any iterable of strings
+    - Words below min_count are dropped, frequent words are subsampled (Mikolov et al.)
+      with threshold `subsample` (0 disables it), re-drawn every epoch
+    - Window sizes are sampled uniformly in [1, window_size] per center token
+    - Pairs never cross sentence boundaries, same as SkipGramDataset
+    - Iteration yields ready (center, context) LongTensor batches of `batch_size`, so use it
+      with DataLoader(dataset, batch_size=None); DataLoader workers split the corpus by blocks
+    """
+
+    def __init__(self, data, window_size=2, batch_size=1024, subsample=1e-3, min_count=1,
+                 block_tokens=1_000_000, seed=0):
+        super().__init__()
+        self.window = window_size
+        self.batch_size = batch_size
+        self.subsample = subsample
+        self.seed = seed
+        self._iterations = 0
+
+        word2idx = {}
+        tokens = array("i")
+        ends = array("q")
+        for sentence in data:
+            for token in sentence.lower().split():
+                idx = word2idx.get(token)
+                if idx is None:
+                    idx = word2idx[token] = len(word2idx)
+                tokens.append(idx)
+            ends.append(len(tokens))
+        tokens = np.frombuffer(tokens, dtype=np.int32) if len(tokens) else np.zeros(0, dtype=np.int32)
+        ends = np.frombuffer(ends, dtype=np.int64) if len(ends) else np.zeros(0, dtype=np.int64)
+        counts = np.bincount(tokens, minlength=len(word2idx)).astype(np.int64)
+        vocab = list(word2idx)
+
+        if min_count > 1:
+            keep_word = counts >= min_count
+            remap = np.full(len(vocab), -1, dtype=np.int32)
+            remap[keep_word] = np.arange(int(keep_word.sum()), dtype=np.int32)
+            keep_token = keep_word[tokens]
+            kept_before = np.concatenate([[0], np.cumsum(keep_token)])
+            ends = kept_before[ends]
+            tokens = remap[tokens[keep_token]]
+            vocab = [w for w, k in zip(vocab, keep_word) if k]
+            counts = counts[keep_word]
+
+        self.tokens = tokens
+        self.sentence_ends = ends
+        self.vocab = vocab
+        self.word2idx = {word: idx for idx, word in enumerate(vocab)}
+        self.idx2word = {idx: word for word, idx in self.word2idx.items()}
+        self.counts = counts.tolist()
+
+        total = max(int(counts.sum()), 1)
+        freq = counts / total
+        if subsample:
+            self.keep_prob = np.minimum(1.0, (np.sqrt(freq / subsample) + 1) * subsample / np.maximum(freq, 1e-12))
+        else:
+            self.keep_prob = np.ones(len(vocab))
+
+        # blocks of whole sentences with ~block_tokens tokens each: the unit of work per worker
+        cuts = np.searchsorted(ends, np.arange(block_tokens, len(tokens), block_tokens), side="left")
+        bounds = np.unique(np.concatenate([[0], cuts + 1, [len(ends)]])).clip(0, len(ends))
+        self.blocks = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info else (0, 1)
+        self._iterations += 1
+        rng = np.random.default_rng([self.seed, torch.initial_seed() % 2**32, self._iterations, worker_id])
+        blocks = self.blocks[worker_id::num_workers]
+        for i in rng.permutation(len(blocks)):
+            centers, contexts = self._block_pairs(*blocks[i], rng)
+            for start in range(0, len(centers), self.batch_size):
+                yield (
+                    torch.from_numpy(centers[start:start + self.batch_size]),
+                    torch.from_numpy(contexts[start:start + self.batch_size]),
+                )
+
+    def _block_pairs(self, first_sentence, last_sentence, rng):
+        """All (center, context) pairs of a block of sentences, shuffled."""
+        start = int(self.sentence_ends[first_sentence - 1]) if first_sentence else 0
+        end = int(self.sentence_ends[last_sentence - 1])
+        ids = self.tokens[start:end]
+        lengths = np.diff(np.concatenate([[start], self.sentence_ends[first_sentence:last_sentence]]))
+        sentence = np.repeat(np.arange(len(lengths)), lengths)
+        keep = rng.random(len(ids)) < self.keep_prob[ids]
+        ids, sentence = ids[keep].astype(np.int64), sentence[keep]
+        window = rng.integers(1, self.window + 1, size=len(ids))
+
+        centers, contexts = [], []
+        for d in range(1, self.window + 1):
+            if d >= len(ids):
+                break
+            same = sentence[:-d] == sentence[d:]
+            forward = same & (window[:-d] >= d)   # center i, context i + d
+            backward = same & (window[d:] >= d)   # center i + d, context i
+            centers += [ids[:-d][forward], ids[d:][backward]]
+            contexts += [ids[d:][forward], ids[:-d][backward]]
+        if not centers:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        centers, contexts = np.concatenate(centers), np.concatenate(contexts)
+        order = rng.permutation(len(centers))
+        return centers[order], contexts[order]
@@ -1,13 +1,119 @@
+import heapq
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 class SkipGramModel(nn.Module):
     def __init__(self, vocab_size, embedding_dim):
         super().__init__()
         self.embed = nn.Embedding(vocab_size, embedding_dim)
         self.output = nn.Linear(embedding_dim, vocab_size)
-    
+
     def forward(self, center_ids):
         embeds = self.embed(center_ids)
         scores = self.output(embeds)
-        return scores
\ No newline at end of file
+        return scores
+
+
+def unigram_table(counts, table_size=1_000_000, power=0.75):
+    """word2vec noise table: word ids repeated proportionally to count**power."""
+    weights = torch.tensor(counts, dtype=torch.float64) ** power
+    probs = weights / weights.sum()
+    repeats = torch.clamp(torch.round(probs * table_size).long(), min=1)
+    return torch.repeat_interleave(torch.arange(len(counts)), repeats)
+
+
+def huffman_paths(counts):
+    """
+    Build a Huffman tree over the vocabulary (frequent words get short paths).
+    Returns padded (V, L) tensors: inner-node ids along each word's path, the
+    binary code at each step, and a mask for the valid steps.
+    """
+    vocab_size = len(counts)
+    heap = [(c, i) for i, c in enumerate(counts)]
+    heapq.heapify(heap)
+    parent, bit = {}, {}
+    next_id = vocab_size
+    while len(heap) > 1:
+        c1, a = heapq.heappop(heap)
+        c2, b = heapq.heappop(heap)
+        parent[a], bit[a] = next_id, 0
+        parent[b], bit[b] = next_id, 1
+        heapq.heappush(heap, (c1 + c2, next_id))
+        next_id += 1
+    paths = []
+    for word in range(vocab_size):
+        points, codes = [], []
+        node = word
+        while node in parent:
+            codes.append(bit[node])
+            node = parent[node]
+            points.append(node - vocab_size)  # inner nodes are numbered 0..V-2
+        paths.append((points[::-1], codes[::-1]))
+    max_len = max((len(p) for p, _ in paths), default=1) or 1
+    points = torch.zeros(vocab_size, max_len, dtype=torch.long)
+    codes = torch.zeros(vocab_size, max_len)
+    mask = torch.zeros(vocab_size, max_len)
+    for word, (p, c) in enumerate(paths):
+        points[word, :len(p)] = torch.tensor(p, dtype=torch.long)
+        codes[word, :len(c)] = torch.tensor(c, dtype=torch.float)
+        mask[word, :len(p)] = 1.0
+    return points, codes, mask
+
+
+class SkipGramNegSamplingModel(nn.Module):
+    """
+    SkipGram with negative sampling: each (center, context) pair is scored against
+    `negatives` noise words drawn from the unigram^0.75 table instead of a full softmax,
+    so a step costs O(negatives) rather than O(V). Embeddings use sparse gradients.
+    `embed` holds the word vectors used for inference, same as SkipGramModel.
+    """
+
+    def __init__(self, vocab_size, embedding_dim, counts, negatives=5, sparse=True):
+        super().__init__()
+        self.negatives = negatives
+        self.embed = nn.Embedding(vocab_size, embedding_dim, sparse=sparse)
+        self.context = nn.Embedding(vocab_size, embedding_dim, sparse=sparse)
+        nn.init.uniform_(self.embed.weight, -0.5 / embedding_dim, 0.5 / embedding_dim)
+        nn.init.zeros_(self.context.weight)
+        self.register_buffer("noise_table", unigram_table(counts), persistent=False)
+
+    def forward(self, center_ids, context_ids):
+        """Returns the mean negative-sampling loss of the batch."""
+        v = self.embed(center_ids)                                   # (B, D)
+        u = self.context(context_ids)                                # (B, D)
+        noise = self.noise_table[
+            torch.randint(len(self.noise_table), (center_ids.shape[0], self.negatives), device=center_ids.device)
+        ]
+        n = self.context(noise)                                      # (B, K, D)
+        pos = F.logsigmoid((v * u).sum(-1))
+        neg = F.logsigmoid(-torch.bmm(n, v.unsqueeze(2)).squeeze(2)).sum(-1)
+        return -(pos + neg).mean()
+
+
+class SkipGramHierarchicalSoftmaxModel(nn.Module):
+    """
+    SkipGram with hierarchical softmax: the context word is predicted as a sequence of
+    binary decisions along its Huffman path, O(log V) per pair. Embeddings use sparse gradients.
+    """
+
+    def __init__(self, vocab_size, embedding_dim, counts, sparse=True):
+        super().__init__()
+        self.embed = nn.Embedding(vocab_size, embedding_dim, sparse=sparse)
+        self.inner = nn.Embedding(max(vocab_size - 1, 1), embedding_dim, sparse=sparse)
+        nn.init.uniform_(self.embed.weight, -0.5 / embedding_dim, 0.5 / embedding_dim)
+        nn.init.zeros_(self.inner.weight)
+        points, codes, mask = huffman_paths(counts)
+        self.register_buffer("points", points, persistent=False)
+        self.register_buffer("codes", codes, persistent=False)
+        self.register_buffer("mask", mask, persistent=False)
+
+    def forward(self, center_ids, context_ids):
+        """Returns the mean hierarchical-softmax loss of the batch."""
+        v = self.embed(center_ids)                                   # (B, D)
+        nodes = self.inner(self.points[context_ids])                 # (B, L, D)
+        logits = torch.bmm(nodes, v.unsqueeze(2)).squeeze(2)         # (B, L)
+        mask = self.mask[context_ids]
+        # word2vec convention: label 1 - code at each inner node
+        losses = F.binary_cross_entropy_with_logits(logits, 1.0 - self.codes[context_ids], reduction="none")
+        return (losses * mask).sum(-1).mean()
@@ -1,26 +1,98 @@
+import time
 import torch
 import torch.optim as optim
 import torch.nn as nn
 from torch.utils.data import DataLoader
 
 from app.models.skipgram_dataset import SkipGramDataset
-from app.models.skipgram_model import SkipGramModel
+from app.models.skipgram_model import (
+    SkipGramModel,
+    SkipGramNegSamplingModel,
+    SkipGramHierarchicalSoftmaxModel,
+)
+from app.utils.logger import get_logger, setup_logging
+from app.utils.metrics import STAGE_SECONDS, TRAINING_PAIRS
 
-def train_skipgram(model, loss_function, optimizer, data_loader, num_epochs=1000):
+logger = get_logger(__name__)
+_TRAIN_STEP_SECONDS = STAGE_SECONDS.labels("train_step")
+
+TRAINING_MODES = ("softmax", "negative", "hierarchical")
+
+
+class TrainingCancelled(Exception):
+    """Raised inside train_skipgram when should_stop() asks the loop to stop."""
+
+
+def build_training_setup(mode, vocab_size, counts, embedding_dim, lr=0.001, negatives=5):
+    """
+    Returns (model, loss_function, optimizer) for a training mode:
+    - "softmax": full softmax over the vocabulary (SkipGramModel + CrossEntropyLoss), O(V) per pair
+    - "negative": negative sampling with a unigram^0.75 noise table, O(negatives) per pair
+    - "hierarchical": hierarchical softmax over a Huffman tree, O(log V) per pair
+    The sampled modes compute their own loss (loss_function is None) and use sparse
+    embedding gradients, hence SparseAdam.
+    """
+    if mode == "softmax":
+        model = SkipGramModel(vocab_size=vocab_size, embedding_dim=embedding_dim)
+        return model, nn.CrossEntropyLoss(), optim.Adam(model.parameters(), lr=lr)
+    if mode == "negative":
+        model = SkipGramNegSamplingModel(vocab_size, embedding_dim, counts, negatives=negatives)
+    elif mode == "hierarchical":
+        model = SkipGramHierarchicalSoftmaxModel(vocab_size, embedding_dim, counts)
+    else:
+        raise ValueError(f"Unknown training mode: {mode} (expected one of {TRAINING_MODES})")
+    return model, None, optim.SparseAdam(list(model.parameters()), lr=lr)
+
+
+def train_skipgram(model, loss_function, optimizer, data_loader, num_epochs=1000,
+                   progress_callback=None, should_stop=None):
+    """
+    Train for num_epochs over (center, context) batches.
+    With loss_function=None the model's forward(center, context) returns the loss itself
+    (negative sampling / hierarchical softmax). Returns per-epoch stats.
+    progress_callback(stats) is called after every epoch; should_stop() is polled every
+    batch and raises TrainingCancelled when it returns True.
+    """
+    history = []
     for epoch in range(num_epochs):
         total_loss = 0
+        steps = 0
+        pairs = 0
+        start = time.perf_counter()
         for center, context in data_loader:
-            scores = model(center)
-            loss = loss_function(scores, context)
+            if should_stop is not None and should_stop():
+                raise TrainingCancelled(f"Training cancelled during epoch {epoch + 1}")
+            step_start = time.perf_counter()
+            if loss_function is None:
+                loss = model(center, context)
+            else:
+                scores = model(center)
+                loss = loss_function(scores, context)
             optimizer.zero_grad()
             loss.backward()
             optimizer.step()
             total_loss += loss.item()
+            steps += 1
+            pairs += center.numel()
+            _TRAIN_STEP_SECONDS.observe(time.perf_counter() - step_start)
+            TRAINING_PAIRS.inc(center.numel())
 
-        print(f"Epoch {epoch + 1}: Loss: {total_loss / len(data_loader)}")
+        elapsed = time.perf_counter() - start
+        stats = {
+            "epoch": epoch + 1,
+            "loss": total_loss / max(steps, 1),
+            "pairs": pairs,
+            "pairs_per_sec": pairs / elapsed if elapsed > 0 else 0.0,
+        }
+        history.append(stats)
+        if progress_callback is not None:
+            progress_callback(stats)
+        logger.info("Epoch %d: loss %.6f | %.0f pairs/sec", epoch + 1, stats["loss"], stats["pairs_per_sec"])
+    return history
 
 
 if __name__ == "__main__":
+    setup_logging()
     # Simulación de prueba de entrenamiento
     sentences = [
         "El modelo aprende representaciones de palabras",
@@ -33,12 +105,12 @@ if __name__ == "__main__":
     num_epochs = 10
 
     dataset = SkipGramDataset(sentences)
-    data_loader = DataLoader(dataset, batch_size=1, shuffle=True)
-    model = SkipGramModel(len(dataset.vocab), embedding_size=embedding_size)
-    optimizer = optim.Adam(model.parameters(), lr=learning_rate)
-    loss_function = nn.CrossEntropyLoss()
+    data_loader = DataLoader(dataset, batch_size=4, shuffle=True)
+    model, loss_function, optimizer = build_training_setup(
+        "negative", len(dataset.vocab), dataset.counts, embedding_size, lr=learning_rate
+    )
 
     train_skipgram(model, loss_function, optimizer, data_loader, num_epochs=num_epochs)
 
     torch.save(model.state_dict(), "skipgram_model.pt")
-    print("✅ Modelo entrenado y guardado en skipgram_model.pt")
+    logger.info("Modelo entrenado y guardado en skipgram_model.pt")
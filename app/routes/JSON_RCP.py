@@ -1,29 +1,50 @@
-from fastapi import APIRouter, Request
-from app.services.embedding.embedding_service import EmbeddingService
-from app.services.storage.storage_service import StorageService
-from app.services.training.training_service import TrainingService
+import asyncio
+from fastapi import APIRouter, Depends, Request
+from app.services.container import get_embedding_service, get_storage_service, get_reindex_engine
+from app.services.training.job_runner import get_job_runner, TrainingQueueFull
+from app.utils.config import settings
 import uuid
-from typing import Dict, Any
-
-EMBED_SVC = EmbeddingService()
-STORAGE_SVC = StorageService()
-TRAIN_SVC = TrainingService()
+from typing import Dict, Any, List
 
 router = APIRouter(prefix="/mcp")
 
 @router.post("/mcp")
-async def mcp_http_entry(request: Request) -> Dict[str, Any]:
+async def mcp_http_entry(
+    request: Request,
+    embed_service=Depends(get_embedding_service),
+    storage_service=Depends(get_storage_service),
+    reindex_engine=Depends(get_reindex_engine),
+) -> Dict[str, Any] | List[Dict[str, Any]]:
     """
     Accepts JSON-RPC 2.0 POSTs and routes to configured services.
     Expected jsonrpc request:
     { "jsonrpc":"2.0", "method":"<method>", "params":{...}, "id":"<id>" }
+    A batch (JSON array of requests, up to settings.JSONRPC_MAX_BATCH) runs its calls
+    concurrently and returns the responses in the same order.
     Supported methods:
       - upload_document: params { "filename": str, "content": str }
-      - generate_embeddings: params { "doc_id": str, "reindex": bool? }
-      - search_embeddings: params { "query": str, "top_k": int? }
-      - train_model: params { "doc_ids": [str], "epochs": int? }
+      - generate_embeddings: params { "doc_id": str, "reindex": bool?, "metadata": {...}? } -> reindex re-embeds every chunk
+      - reindex: params { "doc_ids": [str]?, "force": bool? } -> background re-embedding of stale docs
+      - reindex_status: params {}
+      - delete_documents: params { "doc_ids": [str], "delete_files": bool? } -> batched vector delete
+      - search_embeddings: params { "query": str, "top_k": int?, "filters": {field: value | [values]}?, "mode": "vector" | "lexical" | "hybrid"? }
+      - search_embeddings_batch: params { "queries": [str], "top_k": int?, "filters": {...}?, "mode": str? } -> one encode + one scan
+      - train_model: params { "doc_ids": [str], "epochs": int? } -> queues a background job
+      - training_status: params { "job_id": str }
+      - cancel_training: params { "job_id": str }
     """
     payload = await request.json()
+    if isinstance(payload, list):
+        if not payload or len(payload) > settings.JSONRPC_MAX_BATCH:
+            return {"jsonrpc":"2.0", "error": {"code":400, "message":f"Batch must hold 1 to {settings.JSONRPC_MAX_BATCH} requests"}, "id": None}
+        return list(await asyncio.gather(*(_dispatch(item, embed_service, storage_service, reindex_engine) for item in payload)))
+    return await _dispatch(payload, embed_service, storage_service, reindex_engine)
+
+
+async def _dispatch(payload: Any, embed_service, storage_service, reindex_engine) -> Dict[str, Any]:
+    """Runs a single JSON-RPC request object and returns its response object."""
+    if not isinstance(payload, dict):
+        return {"jsonrpc":"2.0", "error": {"code":400, "message":"Invalid request"}, "id": None}
     method = payload.get("method")
     params = payload.get("params", {})
     req_id = payload.get("id", str(uuid.uuid4()))
@@ -34,30 +55,91 @@ async def mcp_http_entry(request: Request) -> Dict[str, Any]:
             content = params.get("content")
             if not filename or content is None:
                 return {"jsonrpc":"2.0", "error": {"code":400, "message":"Missing filename or content"}, "id": req_id}
-            doc_id = STORAGE_SVC.save_raw(filename, content)
+            doc_id = await asyncio.to_thread(storage_service.save_raw, filename, content)
             return {"jsonrpc":"2.0", "result": {"doc_id": doc_id}, "id": req_id}
 
         if method == "generate_embeddings":
             doc_id = params.get("doc_id")
             if not doc_id:
                 return {"jsonrpc":"2.0", "error": {"code":400, "message":"Missing doc_id"}, "id": req_id}
-            chunks = STORAGE_SVC.get_chunks(doc_id)
-            out = EMBED_SVC.embed_and_store(doc_id, chunks)
+            chunks = await asyncio.to_thread(storage_service.get_chunks, doc_id)
+            if not chunks:
+                return {"jsonrpc":"2.0", "error": {"code":404, "message":"Document not found or empty"}, "id": req_id}
+            metadata = params.get("metadata")
+            if metadata is None:
+                previous = embed_service.ledger.get(doc_id)
+                metadata = previous["metadata"] if previous else None
+            pages = await asyncio.to_thread(storage_service.get_chunk_pages, doc_id)
+            out = await embed_service.aembed_and_store(
+                doc_id, chunks, metadata=metadata, force=bool(params.get("reindex", False)), pages=pages
+            )
             return {"jsonrpc":"2.0", "result": out, "id": req_id}
 
+        if method == "reindex":
+            doc_ids = params.get("doc_ids")
+            status = await asyncio.to_thread(reindex_engine.start, doc_ids, bool(params.get("force", False)))
+            return {"jsonrpc":"2.0", "result": status, "id": req_id}
+
+        if method == "reindex_status":
+            return {"jsonrpc":"2.0", "result": await asyncio.to_thread(reindex_engine.status), "id": req_id}
+
         if method == "search_embeddings":
             query = params.get("query", "")
             top_k = int(params.get("top_k", 5))
             if not query:
                 return {"jsonrpc":"2.0", "error": {"code":400, "message":"Missing query"}, "id": req_id}
-            res = EMBED_SVC.query_similar_chunks(query, top_k=top_k)
+            try:
+                res = await embed_service.aquery_similar_chunks(
+                    query, top_k=top_k, filters=params.get("filters"), mode=params.get("mode", "vector")
+                )
+            except ValueError as e:
+                return {"jsonrpc":"2.0", "error": {"code":400, "message": str(e)}, "id": req_id}
+            return {"jsonrpc":"2.0", "result": {"results": res}, "id": req_id}
+
+        if method == "search_embeddings_batch":
+            queries = params.get("queries", [])
+            top_k = int(params.get("top_k", 5))
+            if not queries or not all(isinstance(q, str) and q for q in queries):
+                return {"jsonrpc":"2.0", "error": {"code":400, "message":"Missing queries"}, "id": req_id}
+            try:
+                res = await embed_service.aquery_similar_chunks_many(
+                    queries, top_k=top_k, filters=params.get("filters"), mode=params.get("mode", "vector")
+                )
+            except ValueError as e:
+                return {"jsonrpc":"2.0", "error": {"code":400, "message": str(e)}, "id": req_id}
             return {"jsonrpc":"2.0", "result": {"results": res}, "id": req_id}
 
+        if method == "delete_documents":
+            doc_ids = params.get("doc_ids", [])
+            if not doc_ids or not all(isinstance(d, str) and d for d in doc_ids):
+                return {"jsonrpc":"2.0", "error": {"code":400, "message":"Missing doc_ids"}, "id": req_id}
+            if len(doc_ids) > settings.DELETE_MAX_DOCUMENTS:
+                return {"jsonrpc":"2.0", "error": {"code":400, "message":f"At most {settings.DELETE_MAX_DOCUMENTS} documents per request"}, "id": req_id}
+            removed = await embed_service.adelete_documents(doc_ids)
+            if params.get("delete_files"):
+                await asyncio.to_thread(lambda: [storage_service.delete_document(d) for d in doc_ids])
+            return {"jsonrpc":"2.0", "result": {"documents": len(doc_ids), "deleted_vectors": removed}, "id": req_id}
+
         if method == "train_model":
             doc_ids = params.get("doc_ids", [])
             epochs = int(params.get("epochs", 10))
-            TRAIN_SVC.train_on_documents(doc_ids, epochs)
-            return {"jsonrpc":"2.0", "result": {"status":"training_started"}, "id": req_id}
+            try:
+                job = get_job_runner().submit(doc_ids, epochs)
+            except TrainingQueueFull as e:
+                return {"jsonrpc":"2.0", "error": {"code":429, "message": str(e)}, "id": req_id}
+            return {"jsonrpc":"2.0", "result": {"status": job["status"], "job_id": job["job_id"]}, "id": req_id}
+
+        if method == "training_status":
+            job = get_job_runner().get(params.get("job_id", ""))
+            if job is None:
+                return {"jsonrpc":"2.0", "error": {"code":404, "message":"Training job not found"}, "id": req_id}
+            return {"jsonrpc":"2.0", "result": job, "id": req_id}
+
+        if method == "cancel_training":
+            job_id = params.get("job_id", "")
+            if not get_job_runner().cancel(job_id):
+                return {"jsonrpc":"2.0", "error": {"code":404, "message":"Training job not found or already finished"}, "id": req_id}
+            return {"jsonrpc":"2.0", "result": {"status":"cancelling", "job_id": job_id}, "id": req_id}
 
         return {"jsonrpc":"2.0", "error": {"code":404, "message":"Unknown method"}, "id": req_id}
     except Exception as e:
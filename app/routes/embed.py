@@ -1,21 +1,139 @@
 # app/routes/embed.py
-from fastapi import APIRouter, HTTPException
-from app.services.embedding.embedding_service import EmbeddingService
-from app.services.storage.storage_service import StorageService
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from typing import Any, Dict, List
+from app.services.container import get_embedding_service, get_storage_service, get_reindex_engine
+from app.utils.config import settings
 
 router = APIRouter(prefix="/embed", tags=["embedding"])
 
-embed_service = EmbeddingService()
-storage_service = StorageService()
+class EmbedRequest(BaseModel):
+    metadata: Dict[str, Any] | None = None  # copied onto every chunk, e.g. {"tenant": "acme", "tags": ["q3"]}
+
+class ReindexRequest(BaseModel):
+    doc_ids: List[str] | None = None
+    force: bool = False
+
+# fixed paths are registered before /{doc_id} so they are not taken as document IDs
+@router.post("/reindex", status_code=202)
+async def start_reindex(request: ReindexRequest, engine=Depends(get_reindex_engine)):
+    """
+    Starts a background re-embedding run over stale documents (indexed with another model
+    version), or over the given doc_ids; force re-embeds them even if up to date.
+    Poll GET /embed/reindex for progress.
+    """
+    return await asyncio.to_thread(engine.start, request.doc_ids, request.force)
+
+@router.get("/reindex")
+async def reindex_status(engine=Depends(get_reindex_engine)):
+    """
+    Progress of the current or last reindex run and the number of stale documents.
+    """
+    return await asyncio.to_thread(engine.status)
+
+@router.delete("/reindex")
+async def cancel_reindex(engine=Depends(get_reindex_engine)):
+    """
+    Stops the running reindex; documents already re-embedded stay up to date.
+    """
+    if not engine.cancel():
+        raise HTTPException(status_code=404, detail="No reindex running")
+    return {"status": "cancelling"}
+
+class DeleteRequest(BaseModel):
+    doc_ids: List[str]
+    delete_files: bool = False
+
+@router.get("/documents")
+async def list_indexed_documents(embed_service=Depends(get_embedding_service)):
+    """
+    Lists the documents that have vectors in the vector DB.
+    """
+    doc_ids = await embed_service.alist_indexed_documents()
+    return {"count": len(doc_ids), "doc_ids": doc_ids}
+
+@router.post("/delete")
+async def delete_documents(
+    request: DeleteRequest,
+    embed_service=Depends(get_embedding_service),
+    storage_service=Depends(get_storage_service),
+):
+    """
+    Bulk delete: removes every vector of the given documents in a few batched round trips
+    (up to settings.DELETE_MAX_DOCUMENTS per request); delete_files also removes the stored documents.
+    """
+    if len(request.doc_ids) > settings.DELETE_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.DELETE_MAX_DOCUMENTS} documents per request")
+    removed = await embed_service.adelete_documents(request.doc_ids)
+    if request.delete_files:
+        await asyncio.to_thread(lambda: [storage_service.delete_document(d) for d in request.doc_ids])
+    return {"status": "ok", "documents": len(request.doc_ids), "deleted_vectors": removed}
+
+@router.get("/{doc_id}/chunks")
+async def list_document_vectors(doc_id: str, embed_service=Depends(get_embedding_service)):
+    """
+    IDs of the stored vectors of one document (read from its per-document index, no key scan).
+    """
+    ids = await embed_service.adocument_vector_ids(doc_id)
+    if not ids:
+        raise HTTPException(status_code=404, detail="Document has no vectors")
+    return {"doc_id": doc_id, "chunk_ids": ids}
+
+@router.delete("/{doc_id}")
+async def delete_document_vectors(
+    doc_id: str,
+    delete_files: bool = Query(False),
+    embed_service=Depends(get_embedding_service),
+    storage_service=Depends(get_storage_service),
+):
+    """
+    Removes every vector of a document; delete_files=true also removes the stored document.
+    """
+    removed = await embed_service.adelete_documents([doc_id])
+    if delete_files:
+        await asyncio.to_thread(storage_service.delete_document, doc_id)
+    return {"status": "ok", "doc_id": doc_id, "deleted_vectors": removed}
 
 @router.post("/{doc_id}")
-async def generate_embeddings(doc_id: str):
+async def generate_embeddings(
+    doc_id: str,
+    request: EmbedRequest | None = None,
+    reindex: bool = Query(False),
+    embed_service=Depends(get_embedding_service),
+    storage_service=Depends(get_storage_service),
+):
     """
     Generates embeddings for a given document ID and stores them in Redis.
+    Only chunks whose content or model version changed since the last run are re-encoded;
+    reindex=true re-embeds the whole document.
+    The optional body's metadata (filterable in /search) is stored on every chunk;
+    without it the metadata of the previous indexing is kept.
+    Chunks of PDF/DOCX uploads also get their source pages (page_start, page_end).
     """
-    chunks = storage_service.get_chunks(doc_id)
+    chunks = await asyncio.to_thread(storage_service.get_chunks, doc_id)
     if not chunks:
         raise HTTPException(status_code=404, detail="Document not found or empty")
 
-    result = embed_service.embed_and_store(doc_id, chunks)
+    metadata = request.metadata if request and request.metadata is not None else None
+    if metadata is None:
+        previous = embed_service.ledger.get(doc_id)
+        metadata = previous["metadata"] if previous else None
+    pages = await asyncio.to_thread(storage_service.get_chunk_pages, doc_id)
+    result = await embed_service.aembed_and_store(doc_id, chunks, metadata=metadata, force=reindex, pages=pages)
     return {"status": "ok", "processed_chunks": len(chunks), "result": result}
+
+@router.get("/stats")
+async def dedup_stats(
+    embed_service=Depends(get_embedding_service),
+    storage_service=Depends(get_storage_service),
+):
+    """
+    Content deduplication counters: duplicate uploads resolved to an existing document,
+    embedding cache hits/misses and incremental indexing (chunks encoded vs unchanged).
+    """
+    return {
+        "documents": storage_service.stats(),
+        "embedding_cache": embed_service.embedding_cache.stats(),
+        "index": await asyncio.to_thread(embed_service.index_stats),
+    }
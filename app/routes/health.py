@@ -0,0 +1,21 @@
+# app/routes/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.container import container
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live")
+async def liveness():
+    """
+    Liveness probe: the process is up and serving HTTP.
+    """
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness():
+    """
+    Readiness probe: 200 once the model and the vector DB are loaded, 503 while warming up.
+    """
+    status = container.readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
@@ -0,0 +1,92 @@
+# app/routes/ingest.py
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from pydantic import BaseModel
+from typing import Any, Dict
+from app.services.container import get_ingest_engine
+from app.utils.config import settings
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+class IngestRequest(BaseModel):
+    source: str  # directory, .zip/.tar archive or single file under settings.INGEST_ROOT on the server
+    metadata: Dict[str, Any] | None = None  # copied onto every chunk, next to "source" (path within the source)
+    force: bool = False
+
+@router.post("/", status_code=202)
+async def start_ingest(request: IngestRequest, engine=Depends(get_ingest_engine)):
+    """
+    Starts a background bulk ingestion of a directory or archive on the server:
+    PDF/DOCX extraction in a process pool, chunking and encoding in worker threads and
+    batched vector inserts, connected by bounded queues. Files already in the ingest
+    manifest are skipped unless force is set. Poll GET /ingest for per-stage throughput.
+    The source must resolve to a path under settings.INGEST_ROOT; without that setting the
+    endpoint is disabled (use POST /ingest/archive or the CLI).
+    """
+    if settings.INGEST_ROOT is None:
+        raise HTTPException(status_code=403, detail="Server-side ingestion is disabled (INGEST_ROOT is not set)")
+    if engine.status()["status"] == "running":
+        raise HTTPException(status_code=409, detail="An ingestion is already running")
+    try:
+        return await asyncio.to_thread(
+            engine.start, request.source, request.metadata, request.force, False, settings.INGEST_ROOT
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/archive", status_code=202)
+async def ingest_archive(
+    file: UploadFile = File(...),
+    metadata: str | None = Form(None),
+    force: bool = Form(False),
+    engine=Depends(get_ingest_engine),
+):
+    """
+    Same as POST /ingest for an uploaded .zip or .tar(.gz) archive; metadata is a JSON object.
+    The archive is kept on disk until the ingestion completes (so it can resume after a restart).
+    """
+    if engine.status()["status"] == "running":
+        raise HTTPException(status_code=409, detail="An ingestion is already running")
+    try:
+        parsed = json.loads(metadata) if metadata else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+    if parsed is not None and not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+    path = await asyncio.to_thread(_spool_upload, file)
+    try:
+        return await asyncio.to_thread(engine.start, path, parsed, force, True)
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
+async def ingest_status(engine=Depends(get_ingest_engine)):
+    """
+    Progress of the current or last ingestion: files done/skipped/failed, queue depths and,
+    per stage (extract, chunk, encode, insert), documents, chunks, busy seconds and throughput.
+    """
+    return await asyncio.to_thread(engine.status)
+
+@router.delete("/")
+async def cancel_ingest(engine=Depends(get_ingest_engine)):
+    """
+    Stops the running ingestion; files already inserted stay in the manifest.
+    """
+    if not engine.cancel():
+        raise HTTPException(status_code=404, detail="No ingestion running")
+    return {"status": "cancelling"}
+
+def _spool_upload(file: UploadFile) -> str:
+    os.makedirs(settings.TMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix="".join(Path(file.filename or "").suffixes[-2:]), dir=settings.TMP_DIR)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(file.file, out, settings.UPLOAD_READ_BLOCK)
+    return path
@@ -0,0 +1,15 @@
+# app/routes/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.utils import metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """
+    Process metrics in the Prometheus text format: per-stage latency histograms
+    (tokenize/encode, scoring/top-k, chunking, extraction, training steps), Redis round trips,
+    storage I/O, and counters (chunks, texts encoded, vectors scanned/inserted, cache hits/misses).
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
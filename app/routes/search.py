@@ -1,15 +1,58 @@
-from fastapi import APIRouter, Query
-from app.services.embedding.embedding_service import EmbeddingService
+import json
+from typing import Any, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from app.services.container import get_embedding_service
 
 router = APIRouter(prefix="/search", tags=["search"])
 
-embed_service = EmbeddingService()
+class SearchRequest(BaseModel):
+    query: str
+    top_k: int = 5
+    filters: Dict[str, Any] | None = None
+    mode: str = "vector"  # "vector" | "lexical" | "hybrid"
+
+async def _search(embed_service, query: str, top_k: int, filters: Dict[str, Any] | None, mode: str):
+    try:
+        results = await embed_service.aquery_similar_chunks(query, top_k=top_k, filters=filters, mode=mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": query, "top_k": top_k, "filters": filters, "mode": mode, "results": results}
 
 @router.get("/")
-async def search_embeddings(query: str = Query(...), top_k: int = Query(5)): ##Cambiar a recibir por body
+async def search_embeddings(
+    query: str = Query(...), top_k: int = Query(5),
+    filters: str | None = Query(None, description='JSON metadata filter, e.g. {"doc_id": ["a", "b"], "tenant": "acme"}'),
+    mode: str = Query("vector", description='"vector", "lexical" (BM25 only) or "hybrid" (BM25 candidates re-scored with vectors)'),
+    embed_service=Depends(get_embedding_service),
+):
     """
     Performs a semantic search over stored embeddings.
-    Returns the most similar text chunks.
+    Returns the most similar text chunks, optionally restricted to those whose metadata matches `filters`.
+    """
+    try:
+        parsed = json.loads(filters) if filters else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="filters must be a JSON object")
+    return await _search(embed_service, query, top_k, parsed, mode)
+
+@router.post("/")
+async def search_embeddings_body(request: SearchRequest, embed_service=Depends(get_embedding_service)):
+    """
+    Same as GET /search/, with the query and metadata filter in the request body.
+    """
+    return await _search(embed_service, request.query, request.top_k, request.filters, request.mode)
+
+@router.get("/stats")
+async def search_batching_stats(embed_service=Depends(get_embedding_service)):
+    """
+    Micro-batching metrics: batches formed, queries served and achieved batch sizes,
+    plus the size of the lexical (BM25) index.
     """
-    results = embed_service.query_similar_chunks(query, top_k=top_k)
-    return {"query": query, "top_k": top_k, "results": results}
+    batcher = embed_service.query_batcher
+    lexical = embed_service.lexical_index
+    return {
+        "enabled": batcher is not None,
+        **(batcher.stats() if batcher else {}),
+        "lexical_index": lexical.stats() if lexical is not None else None,
+    }
@@ -1,26 +1,54 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List
-from app.services.training.training_service import TrainingService
+from app.services.training.job_runner import get_job_runner, TrainingQueueFull
 
 router = APIRouter(prefix="/train", tags=["training"])
 
-train_service = TrainingService()
-
 # Definir modelo Pydantic para validación
 class TrainRequest(BaseModel):
     doc_ids: List[str]
     epochs: int = 10
 
-@router.post("/")
+@router.post("/", status_code=202)
 async def train_model(request: TrainRequest):
     """
-    Starts training process for the embedding model using given document IDs.
-    This is a simplified endpoint (in a real-world scenario, you might run this asynchronously).
+    Queues a training job for the embedding model using given document IDs.
+    Training runs in a separate process; poll GET /train/{job_id} for progress.
     """
-    train_service.train_on_documents(request.doc_ids, request.epochs)
+    try:
+        job = get_job_runner().submit(request.doc_ids, request.epochs)
+    except TrainingQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     return {
-        "status": "training_started", 
-        "doc_ids": request.doc_ids, 
+        "status": job["status"],
+        "job_id": job["job_id"],
+        "doc_ids": request.doc_ids,
         "epochs": request.epochs
-    }
\ No newline at end of file
+    }
+
+@router.get("/")
+async def list_training_jobs():
+    """
+    Lists known training jobs with their status and progress.
+    """
+    return {"jobs": get_job_runner().list()}
+
+@router.get("/{job_id}")
+async def get_training_job(job_id: str):
+    """
+    Returns status and progress (epoch, loss, pairs/sec) of a training job.
+    """
+    job = get_job_runner().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@router.delete("/{job_id}")
+async def cancel_training_job(job_id: str):
+    """
+    Cancels a queued or running training job.
+    """
+    if not get_job_runner().cancel(job_id):
+        raise HTTPException(status_code=404, detail="Training job not found or already finished")
+    return {"status": "cancelling", "job_id": job_id}
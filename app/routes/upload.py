@@ -1,24 +1,48 @@
 # app/routes/upload.py
-from fastapi import APIRouter, UploadFile, File, Form
-from app.services.storage.storage_service import StorageService
+import asyncio
+import os
+import shutil
+import tempfile
+from fastapi import APIRouter, Depends, UploadFile, File, Form
+from app.services.container import get_storage_service
+from app.utils.config import settings
+from app.utils.file_loader import PAGED_EXTENSIONS
 
 router = APIRouter(prefix="/upload", tags=["upload"])
-storage_service = StorageService()
 
 @router.post("/")
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...), storage_service=Depends(get_storage_service)):
     """
     Receives a file (PDF, TXT, DOCX) and stores it in the system.
+    Text uploads are read in blocks, decoded incrementally and chunked as they stream,
+    so memory stays constant regardless of the file size. PDF and DOCX uploads are
+    spooled to disk and their pages extracted as a stream (large PDFs in parallel);
+    the source pages of each chunk end up in its metadata when the document is embedded.
     Returns a document ID for later embedding or search.
     """
-    content = await file.read()
-    doc_id = storage_service.save_raw(file.filename, content.decode("utf-8", errors="ignore"))
+    if os.path.splitext(file.filename or "")[1].lower() in PAGED_EXTENSIONS:
+        doc_id = await asyncio.to_thread(_save_paged, storage_service, file)
+    else:
+        doc_id = await asyncio.to_thread(storage_service.save_stream, file.filename, file.file)
     return {"doc_id": doc_id, "filename": file.filename}
 
+def _save_paged(storage_service, file: UploadFile) -> str:
+    os.makedirs(settings.TMP_DIR, exist_ok=True)
+    suffix = os.path.splitext(file.filename)[1].lower()
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=settings.TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(file.file, out, settings.UPLOAD_READ_BLOCK)
+        return storage_service.save_file(file.filename, path)
+    finally:
+        os.remove(path)
+
 @router.post("/text")
-async def upload_text(filename: str = Form(...), content: str = Form(...)):
+async def upload_text(
+    filename: str = Form(...), content: str = Form(...), storage_service=Depends(get_storage_service)
+):
     """
     Alternative endpoint for direct text upload (no file object).
     """
-    doc_id = storage_service.save_raw(filename, content)
+    doc_id = await asyncio.to_thread(storage_service.save_raw, filename, content)
     return {"doc_id": doc_id, "filename": filename}
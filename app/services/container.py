@@ -0,0 +1,178 @@
+# app/services/container.py
+import asyncio
+import threading
+from typing import Any, Callable, Dict
+
+
+class ServiceContainer:
+    """
+    Contenedor de dependencias compartido por todo el proceso:
+    - Construye cada componente pesado (embedder, base vectorial, servicios) una sola vez
+      y de forma perezosa, en el primer uso; todas las rutas reciben la misma instancia
+    - Los imports de torch / redis / PyPDF2 / docx ocurren dentro de las fábricas, así que
+      arrancar un worker solo importa FastAPI y la configuración
+    - warmup() construye todo por adelantado (se lanza en segundo plano desde el lifespan)
+      y readiness() indica si el worker ya puede atender búsquedas
+    """
+
+    components = (
+        "embedder", "vector_db", "async_vector_db", "lexical_index", "embedding_service", "storage_service",
+        "reindex_engine", "ingest_engine",
+    )
+
+    def __init__(self):
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        # un lock por componente: construir el embedder no bloquea la base vectorial ni readiness()
+        self._locks = {name: threading.Lock() for name in self.components}
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._locks[name]:
+                instance = self._instances.get(name)
+                if instance is None:
+                    try:
+                        instance = factory()
+                    except Exception as e:
+                        self._errors[name] = str(e)
+                        raise
+                    self._errors.pop(name, None)
+                    self._instances[name] = instance
+        return instance
+
+    # -------------------------------------------------------------------------
+    # Componentes
+    # -------------------------------------------------------------------------
+    def embedder(self):
+        def build():
+            from app.adapters.embedder.torch_embedder import TorchSkipGramEmbedderAdapter
+            return TorchSkipGramEmbedderAdapter()
+        return self._get("embedder", build)
+
+    def vector_db(self):
+        def build():
+            from app.adapters.vector_db.factory import build_vector_db
+            return build_vector_db()
+        return self._get("vector_db", build)
+
+    def async_vector_db(self):
+        def build():
+            from app.adapters.vector_db.factory import build_async_vector_db
+            return build_async_vector_db(sync_db=self.vector_db())
+        return self._get("async_vector_db", build)
+
+    def lexical_index(self):
+        """Índice BM25 de los chunks guardados, o None si settings.LEXICAL_INDEX_ENABLED es False."""
+        def build():
+            from app.adapters.lexical.bm25_index import BM25Index
+            from app.utils.config import settings
+            # False (deshabilitado) queda cacheado igual que un componente construido
+            return BM25Index() if settings.LEXICAL_INDEX_ENABLED else False
+        return self._get("lexical_index", build) or None
+
+    def embedding_service(self):
+        def build():
+            from app.services.embedding.embedding_service import EmbeddingService
+            return EmbeddingService(
+                embedder=self.embedder(), vector_db=self.vector_db(), async_vector_db=self.async_vector_db(),
+                lexical_index=self.lexical_index(), storage_service=self.storage_service(),
+            )
+        return self._get("embedding_service", build)
+
+    def storage_service(self):
+        def build():
+            from app.services.storage.storage_service import StorageService
+            service = StorageService(lexical_index=self.lexical_index())
+            # recupera lo guardado después del último snapshot del índice léxico
+            service.sync_lexical_index()
+            return service
+        return self._get("storage_service", build)
+
+    def reindex_engine(self):
+        def build():
+            from app.services.embedding.reindex_service import ReindexEngine
+            from app.utils.config import settings
+            engine = ReindexEngine(self.embedding_service(), self.storage_service())
+            engine.resume()  # una corrida interrumpida por una caída sigue donde quedó
+            if settings.REINDEX_ON_MODEL_CHANGE:
+                engine.watch()
+            return engine
+        return self._get("reindex_engine", build)
+
+    def ingest_engine(self):
+        def build():
+            from app.services.ingestion.ingest_service import IngestEngine
+            engine = IngestEngine(self.embedding_service(), self.storage_service())
+            engine.resume()  # una ingesta interrumpida por una caída sigue donde quedó
+            return engine
+        return self._get("ingest_engine", build)
+
+    # -------------------------------------------------------------------------
+    # Ciclo de vida
+    # -------------------------------------------------------------------------
+    def warmup(self) -> None:
+        """Construye todos los componentes; los errores quedan reflejados en readiness()."""
+        for name in self.components:
+            try:
+                getattr(self, name)()
+            except Exception:
+                pass
+
+    def readiness(self) -> Dict[str, Any]:
+        status = {name: name in self._instances for name in self.components}
+        errors = dict(self._errors)
+        embedder = self._instances.get("embedder")
+        return {
+            "ready": all(status.values()),
+            "components": status,
+            "model_version": getattr(embedder, "model_version", None),
+            "errors": errors,
+        }
+
+    async def aclose(self) -> None:
+        for name in ("ingest_engine", "reindex_engine"):
+            engine = self._instances.get(name)
+            if engine is not None:
+                # deja de escribir en la base vectorial antes de cerrarla
+                await asyncio.to_thread(engine.close)
+        async_vector_db = self._instances.get("async_vector_db")
+        if async_vector_db is not None:
+            await async_vector_db.close()
+        self.close()
+
+    def close(self) -> None:
+        for name in ("ingest_engine", "reindex_engine"):
+            engine = self._instances.get(name)
+            if engine is not None:
+                engine.close()
+        vector_db = self._instances.get("vector_db")
+        if vector_db is not None and hasattr(vector_db, "close"):
+            vector_db.close()
+        lexical_index = self._instances.get("lexical_index")
+        if lexical_index:
+            lexical_index.close()
+        self._instances.clear()
+
+
+container = ServiceContainer()
+
+
+# -----------------------------------------------------------------------------
+# Dependencias FastAPI (síncronas: FastAPI las ejecuta en su threadpool, así que
+# la primera construcción de un componente no bloquea el event loop)
+# -----------------------------------------------------------------------------
+def get_embedding_service():
+    return container.embedding_service()
+
+
+def get_storage_service():
+    return container.storage_service()
+
+
+def get_reindex_engine():
+    return container.reindex_engine()
+
+
+def get_ingest_engine():
+    return container.ingest_engine()
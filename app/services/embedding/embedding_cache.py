@@ -0,0 +1,66 @@
+# app/services/embedding/embedding_cache.py
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from app.utils.config import settings
+from app.utils.metrics import CACHE_HITS, CACHE_MISSES
+
+CacheKey = Tuple[str, str | None]  # (hash del chunk, versión del modelo)
+
+
+class EmbeddingCache:
+    """
+    Caché LRU de vectores indexada por (hash del chunk, versión del modelo):
+    - Un chunk repetido (en el mismo documento o en otro) no se vuelve a codificar
+    - Al cambiar el modelo las claves cambian solas, así que nunca se sirve un vector viejo
+    - stats() expone aciertos/fallos
+    Es segura entre hilos: el encode corre en el pool de CPU.
+    """
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = settings.EMBEDDING_CACHE_SIZE if max_size is None else max_size
+        self._vectors: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0}
+
+    def get_many(self, keys: Iterable[CacheKey]) -> Dict[CacheKey, np.ndarray]:
+        """Vectores en caché para las claves dadas (las ausentes no aparecen)."""
+        found: Dict[CacheKey, np.ndarray] = {}
+        hits = misses = 0
+        with self._lock:
+            for key in keys:
+                vector = self._vectors.get(key)
+                if vector is None:
+                    misses += 1
+                else:
+                    self._vectors.move_to_end(key)
+                    found[key] = vector
+                    hits += 1
+            self._counts["hits"] += hits
+            self._counts["misses"] += misses
+        CACHE_HITS.labels("embedding").inc(hits)
+        CACHE_MISSES.labels("embedding").inc(misses)
+        return found
+
+    def put_many(self, keys: List[CacheKey], vectors: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._vectors[key] = vector
+                self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+                "size": len(self._vectors),
+                "max_size": self.max_size,
+            }
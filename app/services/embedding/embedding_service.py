@@ -1,60 +1,409 @@
-from typing import List, Dict, Any
-from app.adapters.embedder.torch_embedder import TorchSkipGramEmbedderAdapter
-from app.adapters.vector_db.redis_db import RedisVectorDBAdapter
-from app.utils.file_loader import extract_text_from_file
-from app.utils.chunk_splitter import split_into_chunks
+import threading
+from typing import List, Dict, Any, NamedTuple, Set, Tuple
+import numpy as np
+from app.adapters.vector_db.factory import build_vector_db, build_async_vector_db
+from app.adapters.vector_db.metadata_filter import matches, parse_filters
+from app.core.ports.async_vector_db import AsyncVectorDBInterface
+from app.core.ports.embedder import EmbedderInterface
+from app.core.ports.lexical_index import LexicalIndexInterface
+from app.core.ports.vector_db import VectorDBInterface
+from app.services.embedding.embedding_cache import EmbeddingCache
+from app.services.embedding.query_batcher import QueryBatcher
+from app.services.embedding.vector_ledger import VectorLedger
+from app.utils.config import settings
+from app.utils.concurrency import run_cpu
+from app.utils.content_hash import content_hash
+from app.utils.file_loader import iter_pages
+from app.utils.chunk_splitter import split_pages_into_chunks
+
+
+class _IndexPlan(NamedTuple):
+    """Qué hay que escribir para dejar un documento al día en la base vectorial."""
+    chunk_ids: List[str]
+    metas: List[Dict[str, Any]]
+    hashes: List[str]
+    model_version: str | None
+    stale: List[int]  # posiciones de los chunks a (re)insertar
+    vectors: np.ndarray  # vectores de esos chunks, en el mismo orden
+    removed: List[str]  # chunks que el documento ya no tiene
 
 
 class EmbeddingService:
     """
     Servicio encargado de:
     - Generar embeddings a partir de texto usando el modelo SkipGram.
-    - Guardar embeddings en la base vectorial (Redis).
+    - Guardar embeddings en la base vectorial (Redis, HNSW o segmentos mmap, según settings.VECTOR_DB_BACKEND).
     - Consultar similitudes de embeddings.
     - Procesar archivos (PDF, DOCX, TXT, etc.) para generar embeddings desde su contenido.
+    Los métodos con prefijo `a` son las variantes async usadas por las rutas: el encode corre
+    en el pool de CPU y la base vectorial se consulta con su adapter async. Las búsquedas
+    async concurrentes se agrupan en lotes con QueryBatcher (settings.SEARCH_MAX_BATCH).
+    Al indexar, cada chunk se identifica por el hash BLAKE2 de su texto normalizado: los
+    vectores se reutilizan desde EmbeddingCache por (hash, versión del modelo) y VectorLedger
+    registra con qué versión y qué hashes se indexó cada documento, así que reindexar solo
+    vuelve a codificar e insertar lo desactualizado.
+    Las búsquedas admiten tres modos (SEARCH_MODES): "vector" (recorre el índice vectorial),
+    "lexical" (solo BM25) e "hybrid" (BM25 propone settings.HYBRID_CANDIDATES candidatos que
+    se puntúan con sus vectores guardados y se fusionan por reciprocal rank fusion, sin recorrer el índice).
     """
 
+    SEARCH_MODES = ("vector", "lexical", "hybrid")
+
     def __init__(
         self,
-        embedder: TorchSkipGramEmbedderAdapter | None = None,
-        vector_db: RedisVectorDBAdapter | None = None
+        embedder: EmbedderInterface | None = None,
+        vector_db: VectorDBInterface | None = None,
+        async_vector_db: AsyncVectorDBInterface | None = None,
+        ledger: VectorLedger | None = None,
+        lexical_index: LexicalIndexInterface | None = None,
+        storage_service=None,
     ):
-        self.embedder = embedder or TorchSkipGramEmbedderAdapter()
-        self.vector_db = vector_db or RedisVectorDBAdapter()
+        if embedder is None:
+            # import diferido: torch solo se carga cuando se construye el embedder
+            from app.adapters.embedder.torch_embedder import TorchSkipGramEmbedderAdapter
+            embedder = TorchSkipGramEmbedderAdapter()
+        self.embedder = embedder
+        # `is None`: un índice en memoria vacío (HNSW) tiene __len__ 0 y sería falso
+        self.vector_db = build_vector_db() if vector_db is None else vector_db
+        self.async_vector_db = (
+            build_async_vector_db(sync_db=self.vector_db) if async_vector_db is None else async_vector_db
+        )
+        self.query_batcher = (
+            QueryBatcher(self.embedder, self.async_vector_db) if settings.SEARCH_MAX_BATCH > 1 else None
+        )
+        self.embedding_cache = EmbeddingCache()
+        self.ledger = ledger or VectorLedger()
+        self.lexical_index = lexical_index
+        self.storage_service = storage_service  # páginas de origen de los resultados léxicos
+        self._counts = {"documents_indexed": 0, "documents_unchanged": 0, "chunks_encoded": 0, "chunks_unchanged": 0}
+        self._counts_lock = threading.Lock()
 
     # -------------------------------------------------------------------------
     # 🔹 Embeddings desde texto directamente
     # -------------------------------------------------------------------------
     def embed_and_store(
-        self, doc_id: str, chunks: List[str], metadata: Dict[str, Any] = None
+        self, doc_id: str, chunks: List[str], metadata: Dict[str, Any] = None, force: bool = False,
+        pages: List[Tuple[int, int]] | None = None,
     ) -> List[Dict[str, Any]]:
         """
         Genera embeddings para cada chunk y los guarda en Redis con metadata.
-        Devuelve una lista con los IDs insertados y los metadatos.
+        Cada vector registra en su metadata la versión del modelo que lo generó (model_version)
+        y el hash de su contenido (content_hash).
+        Es incremental: solo se codifican e insertan los chunks cuyo hash o versión de modelo
+        difieren de lo registrado en el VectorLedger (force=True reindexa todo el documento).
+        `pages` (de StorageService.get_chunk_pages) agrega page_start / page_end a cada chunk.
+        Devuelve una lista con los IDs de todos los chunks y sus metadatos.
+        """
+        plan = self._plan_index(doc_id, chunks, metadata, force, pages)
+        self.store_plans([(doc_id, plan, metadata)])
+        return [{"chunk_id": cid, "metadata": meta} for cid, meta in zip(plan.chunk_ids, plan.metas)]
+
+    def plan_index(
+        self, doc_id: str, chunks: List[str], metadata: Dict[str, Any] = None, force: bool = False,
+        pages: List[Tuple[int, int]] | None = None,
+    ) -> "_IndexPlan":
+        """
+        Primera mitad de embed_and_store: codifica lo desactualizado sin escribir nada.
+        Permite separar el encode de la inserción en etapas distintas (ver IngestEngine).
+        """
+        return self._plan_index(doc_id, chunks, metadata, force, pages)
+
+    def store_plans(self, items: List[Tuple[str, "_IndexPlan", Dict[str, Any] | None]]) -> None:
+        """
+        Segunda mitad de embed_and_store para varios documentos (doc_id, plan, metadata):
+        los vectores de todos van en un solo insert_many y luego se anotan en el ledger.
+        """
+        stale = [(doc_id, plan) for doc_id, plan, _ in items if plan.stale]
+        if stale:
+            # Inserción en bloque: un round trip por lote en lugar de uno por chunk
+            self.vector_db.insert_many(
+                [plan.chunk_ids[i] for _, plan in stale for i in plan.stale],
+                np.concatenate([np.asarray(plan.vectors, dtype=np.float32) for _, plan in stale]),
+                [plan.metas[i] for _, plan in stale for i in plan.stale],
+            )
+        for doc_id, plan, metadata in items:
+            for chunk_id in plan.removed:
+                self.vector_db.delete(chunk_id)
+            self._record_index(doc_id, plan, metadata)
+
+    async def aembed_and_store(
+        self, doc_id: str, chunks: List[str], metadata: Dict[str, Any] = None, force: bool = False,
+        pages: List[Tuple[int, int]] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Versión async de embed_and_store."""
+        plan = await run_cpu(self._plan_index, doc_id, chunks, metadata, force, pages)
+        if plan.stale:
+            await self.async_vector_db.insert_many(
+                [plan.chunk_ids[i] for i in plan.stale], plan.vectors, [plan.metas[i] for i in plan.stale]
+            )
+        for chunk_id in plan.removed:
+            await self.async_vector_db.delete(chunk_id)
+        await run_cpu(self._record_index, doc_id, plan, metadata)
+        return [{"chunk_id": cid, "metadata": meta} for cid, meta in zip(plan.chunk_ids, plan.metas)]
+
+    def _plan_index(
+        self, doc_id: str, chunks: List[str], metadata: Dict[str, Any] | None, force: bool,
+        pages: List[Tuple[int, int]] | None = None,
+    ) -> "_IndexPlan":
         """
-        vectors = self.embedder.encode(chunks)
-        responses = []
-        for i, vec in enumerate(vectors):
-            chunk_id = f"{doc_id}_chunk_{i}"
+        Compara el documento con su entrada del ledger y codifica solo los chunks desactualizados:
+        todos si cambió el modelo o la metadata (o con force), si no los de hash distinto.
+        """
+        hashes = [content_hash(chunk) for chunk in chunks]
+        previous = self.ledger.get(doc_id)
+        model_version = self.embedder.model_version
+        if force or previous is None or previous["model_version"] != model_version \
+                or previous["metadata"] != (metadata or {}):
+            stale = list(range(len(chunks)))
+        else:
+            old = previous["hashes"]
+            stale = [i for i, h in enumerate(hashes) if i >= len(old) or old[i] != h]
+        vectors, version = self._encode_cached([chunks[i] for i in stale], [hashes[i] for i in stale])
+        if version != model_version and len(stale) < len(chunks):
+            # el modelo cambió mientras tanto: el documento entero queda con la versión nueva
+            stale = list(range(len(chunks)))
+            vectors, version = self._encode_cached(chunks, hashes)
+        removed = [f"{doc_id}_chunk_{i}" for i in range(len(chunks), len(previous["hashes"]))] if previous else []
+        chunk_ids, metas = self._chunk_records(doc_id, len(chunks), metadata, version, hashes, pages)
+        return _IndexPlan(chunk_ids, metas, hashes, version, stale, vectors, removed)
+
+    def _record_index(self, doc_id: str, plan: "_IndexPlan", metadata: Dict[str, Any] | None) -> None:
+        """Anota en el ledger lo indexado (después de escribir los vectores) y actualiza los contadores."""
+        changed = bool(plan.stale or plan.removed)
+        if changed:
+            self.ledger.record(doc_id, plan.model_version, plan.hashes, metadata)
+        with self._counts_lock:
+            self._counts["documents_indexed" if changed else "documents_unchanged"] += 1
+            self._counts["chunks_encoded"] += len(plan.stale)
+            self._counts["chunks_unchanged"] += len(plan.hashes) - len(plan.stale)
+
+    def index_stats(self) -> Dict[str, Any]:
+        """Contadores de indexado incremental y resumen del ledger."""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return {**counts, "ledger": self.ledger.stats()}
+
+    def _encode_cached(self, chunks: List[str], hashes: List[str]) -> Tuple[np.ndarray, str | None]:
+        """
+        Vectores de los chunks reutilizando la caché: solo se codifican los hashes
+        que no están en caché para la versión actual del modelo (cada uno una sola vez).
+        Devuelve (vectores, versión del modelo).
+        """
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32), self.embedder.model_version
+        model_version = self.embedder.model_version
+        if model_version is None:
+            # sin modelo entrenado el embedder devuelve vectores aleatorios: no se cachean
+            vectors, model_version = self.embedder.encode_versioned(chunks)
+            return np.asarray(vectors, dtype=np.float32), model_version
+
+        first = {}  # hash -> índice del primer chunk con ese contenido
+        for i, h in enumerate(hashes):
+            first.setdefault(h, i)
+        cached = self.embedding_cache.get_many((h, model_version) for h in first)
+        missing = [h for h in first if (h, model_version) not in cached]
+        if missing:
+            encoded, version = self.embedder.encode_versioned([chunks[first[h]] for h in missing])
+            if version != model_version:
+                # el modelo cambió entre la consulta a la caché y el encode: todo con la versión nueva
+                vectors, version = self.embedder.encode_versioned(chunks)
+                return np.asarray(vectors, dtype=np.float32), version
+            encoded = np.asarray(encoded, dtype=np.float32)
+            self.embedding_cache.put_many([(h, model_version) for h in missing], encoded)
+            cached.update(zip(((h, model_version) for h in missing), encoded))
+        return np.stack([cached[(h, model_version)] for h in hashes]), model_version
+
+    @staticmethod
+    def _chunk_records(
+        doc_id: str, count: int, metadata: Dict[str, Any] | None, model_version: str | None,
+        hashes: List[str] | None = None, pages: List[Tuple[int, int]] | None = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """IDs y metadata de los chunks de un documento (con sus páginas de origen si se conocen)."""
+        if pages is not None and len(pages) != count:
+            pages = None  # páginas de otra versión del documento
+        chunk_ids, metas = [], []
+        for i in range(count):
             meta = (metadata or {}).copy()
-            meta.update({"doc_id": doc_id, "chunk_index": i})
-            self.vector_db.insert(chunk_id, vec, meta)
-            responses.append({"chunk_id": chunk_id, "metadata": meta})
-        return responses
+            meta.update({"doc_id": doc_id, "chunk_index": i, "model_version": model_version})
+            if hashes is not None:
+                meta["content_hash"] = hashes[i]
+            if pages is not None:
+                meta["page_start"], meta["page_end"] = pages[i]
+            chunk_ids.append(f"{doc_id}_chunk_{i}")
+            metas.append(meta)
+        return chunk_ids, metas
+
+    # -------------------------------------------------------------------------
+    # 🔹 Operaciones por documento (índice secundario doc_id -> vectores)
+    # -------------------------------------------------------------------------
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """
+        Borra todos los vectores de los documentos (en lote) y sus entradas del ledger.
+        Devuelve cuántos vectores se eliminaron.
+        """
+        removed = self.vector_db.delete_documents(doc_ids)
+        self.ledger.remove_many(doc_ids)
+        return removed
+
+    async def adelete_documents(self, doc_ids: List[str]) -> int:
+        """Versión async de delete_documents."""
+        removed = await self.async_vector_db.delete_documents(doc_ids)
+        await run_cpu(self.ledger.remove_many, doc_ids)
+        return removed
+
+    async def adocument_vector_ids(self, doc_id: str) -> List[str]:
+        """IDs de los vectores de un documento, sin recorrer el resto de la base."""
+        return await self.async_vector_db.document_vector_ids(doc_id)
+
+    async def alist_indexed_documents(self) -> List[str]:
+        """Documentos que tienen vectores en la base."""
+        return await self.async_vector_db.list_documents()
 
     # -------------------------------------------------------------------------
     # 🔹 Búsqueda por similitud
     # -------------------------------------------------------------------------
     def query_similar_chunks(
-        self, query_text: str, top_k: int = 5
+        self, query_text: str, top_k: int = 5, filters: Dict[str, Any] | None = None, mode: str = "vector"
     ) -> List[Dict[str, Any]]:
         """
         Busca los chunks más similares al texto de consulta.
+        Con filters, solo entre los chunks cuya metadata coincide
+        (p. ej. {"doc_id": ["a", "b"], "tenant": "acme"}).
+        mode: "vector", "lexical" o "hybrid" (ver SEARCH_MODES); en los dos últimos los
+        filtros se evalúan sobre la metadata del documento registrada en el ledger.
         """
+        if self._check_mode(mode) != "vector":
+            return self._text_search(query_text, top_k, filters, mode)
         vector = self.embedder.encode([query_text])[0]
-        results = self.vector_db.query(vector, top_k=top_k)
+        results = self.vector_db.query(vector, top_k=top_k, filters=filters)
         return results
 
+    def query_similar_chunks_many(
+        self, query_texts: List[str], top_k: int = 5, filters: Dict[str, Any] | None = None, mode: str = "vector"
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca los chunks más similares a varias consultas a la vez:
+        un solo encode y un solo recorrido del índice para todo el lote.
+        """
+        if self._check_mode(mode) != "vector":
+            return [self._text_search(text, top_k, filters, mode) for text in query_texts]
+        vectors = self.embedder.encode(query_texts)
+        return self.vector_db.query_many(vectors, top_k=top_k, filters=filters)
+
+    async def aquery_similar_chunks(
+        self, query_text: str, top_k: int = 5, filters: Dict[str, Any] | None = None, mode: str = "vector"
+    ) -> List[Dict[str, Any]]:
+        """Versión async de query_similar_chunks (micro-batching si está activo)."""
+        if self._check_mode(mode) != "vector":
+            return await run_cpu(self._text_search, query_text, top_k, filters, mode)
+        if self.query_batcher is not None:
+            return await self.query_batcher.search(query_text, top_k=top_k, filters=filters)
+        vector = (await run_cpu(self.embedder.encode, [query_text]))[0]
+        return await self.async_vector_db.query(vector, top_k=top_k, filters=filters)
+
+    async def aquery_similar_chunks_many(
+        self, query_texts: List[str], top_k: int = 5, filters: Dict[str, Any] | None = None, mode: str = "vector"
+    ) -> List[List[Dict[str, Any]]]:
+        """Versión async de query_similar_chunks_many."""
+        if self._check_mode(mode) != "vector":
+            return await run_cpu(self.query_similar_chunks_many, query_texts, top_k, filters, mode)
+        vectors = await run_cpu(self.embedder.encode, query_texts)
+        return await self.async_vector_db.query_many(vectors, top_k=top_k, filters=filters)
+
+    # -------------------------------------------------------------------------
+    # 🔹 Búsqueda léxica (BM25) e híbrida
+    # -------------------------------------------------------------------------
+    def _check_mode(self, mode: str) -> str:
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}': expected one of {', '.join(self.SEARCH_MODES)}")
+        if mode != "vector" and self.lexical_index is None:
+            raise ValueError(f"Search mode '{mode}' needs the lexical index (settings.LEXICAL_INDEX_ENABLED)")
+        return mode
+
+    def _text_search(
+        self, query_text: str, top_k: int, filters: Dict[str, Any] | None, mode: str
+    ) -> List[Dict[str, Any]]:
+        doc_ids = self._filter_documents(filters)
+        if mode == "lexical":
+            hits = self.lexical_index.search(query_text, top_k=top_k, doc_ids=doc_ids)
+            return [
+                {"id": f"{h['doc_id']}_chunk_{h['chunk_index']}", "score": h["score"], "metadata": meta}
+                for h, meta in zip(hits, self._hits_metadata(hits))
+            ]
+        hits = self.lexical_index.search(query_text, top_k=max(settings.HYBRID_CANDIDATES, top_k), doc_ids=doc_ids)
+        if not hits:
+            # sin coincidencias léxicas: búsqueda vectorial normal
+            vector = self.embedder.encode([query_text])[0]
+            return self.vector_db.query(vector, top_k=top_k, filters=filters)
+        return self._hybrid_rerank(query_text, hits, top_k)
+
+    def _hybrid_rerank(self, query_text: str, hits: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Puntúa los candidatos BM25 por coseno con la consulta, usando los vectores ya
+        guardados en la base vectorial (sin leer ni volver a codificar sus textos), y fusiona
+        ambos rankings: score = sum 1 / (HYBRID_RRF_K + rank). Un candidato sin vector
+        (documento todavía sin indexar) solo suma su término léxico.
+        """
+        ids = [f"{h['doc_id']}_chunk_{h['chunk_index']}" for h in hits]
+        vectors = np.asarray(self.vector_db.fetch_vectors(ids), dtype=np.float32).reshape(len(ids), -1)
+        q = np.asarray(self.embedder.encode([query_text])[0], dtype=np.float32)
+        vector_norms = np.linalg.norm(vectors, axis=1)
+        stored = vector_norms > 0
+        cosine = (vectors @ q) / (vector_norms * (np.linalg.norm(q) + 1e-12) + 1e-12)
+        k = settings.HYBRID_RRF_K
+        fused = [1.0 / (k + i + 1) for i in range(len(hits))]
+        ranked = np.flatnonzero(stored)
+        for rank, i in enumerate(ranked[np.argsort(-cosine[ranked], kind="stable")]):
+            fused[i] += 1.0 / (k + rank + 1)
+        order = sorted(range(len(hits)), key=lambda i: -fused[i])[:top_k]
+        metas = self._hits_metadata([hits[i] for i in order])
+        return [
+            {
+                "id": ids[i],
+                "score": fused[i],
+                "lexical_score": hits[i]["score"],
+                "vector_score": float(cosine[i]) if stored[i] else None,
+                "metadata": meta,
+            }
+            for i, meta in zip(order, metas)
+        ]
+
+    def _filter_documents(self, filters: Dict[str, Any] | None) -> Set[str] | None:
+        """
+        Documentos que cumplen los filtros según la metadata con la que se indexaron
+        (ledger); un filtro solo por doc_id no necesita recorrer el ledger.
+        """
+        parsed = parse_filters(filters)
+        if parsed is None:
+            return None
+        if set(parsed) == {"doc_id"}:
+            return {d for d in parsed["doc_id"] if isinstance(d, str)}
+        selected = set()
+        for doc_id in self.ledger.doc_ids():
+            entry = self.ledger.get(doc_id)
+            if entry and matches({**entry["metadata"], "doc_id": doc_id, "model_version": entry["model_version"]}, parsed):
+                selected.add(doc_id)
+        return selected
+
+    def _hits_metadata(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Metadata de resultados léxicos, como la de los vectores: ledger + páginas de origen."""
+        pages: Dict[str, List[Tuple[int, int]] | None] = {}
+        metas = []
+        for hit in hits:
+            doc_id, index = hit["doc_id"], hit["chunk_index"]
+            entry = self.ledger.get(doc_id)
+            meta = dict(entry["metadata"]) if entry else {}
+            meta.update({"doc_id": doc_id, "chunk_index": index})
+            if entry:
+                meta["model_version"] = entry["model_version"]
+            if self.storage_service is not None:
+                if doc_id not in pages:
+                    pages[doc_id] = self.storage_service.get_chunk_pages(doc_id)
+                if pages[doc_id] is not None and index < len(pages[doc_id]):
+                    meta["page_start"], meta["page_end"] = pages[doc_id][index]
+            metas.append(meta)
+        return metas
+
     # -------------------------------------------------------------------------
     # 🔹 Procesar archivo completo y generar embeddings desde su contenido
     # -------------------------------------------------------------------------
@@ -62,19 +411,19 @@ class EmbeddingService:
         self, file_path: str, doc_id: str, metadata: Dict[str, Any] = None
     ) -> List[Dict[str, Any]]:
         """
-        1. Extrae texto desde el archivo (PDF, DOCX, TXT, etc.).
-        2. Divide el texto en chunks manejables.
-        3. Genera embeddings para cada chunk.
+        1. Extrae el texto del archivo (PDF, DOCX, TXT) página a página (ver iter_pages).
+        2. Divide el texto en chunks manejables a medida que llegan las páginas.
+        3. Genera embeddings para cada chunk (con sus páginas de origen en la metadata).
         4. Los almacena en la base vectorial (Redis).
         """
-        
-        text = extract_text_from_file(file_path)
-
-        chunks = split_into_chunks(text)
+        chunks, pages = [], []
+        for chunk, span in split_pages_into_chunks(iter_pages(file_path)):
+            chunks.append(chunk)
+            pages.append(span)
 
         # Validación básica
         if not chunks:
             raise ValueError(f"No se generaron chunks válidos desde el archivo: {file_path}")
 
         # 🔸 (3) Generar y almacenar embeddings
-        return self.embed_and_store(doc_id, chunks, metadata)
+        return self.embed_and_store(doc_id, chunks, metadata, pages=pages)
@@ -0,0 +1,107 @@
+# app/services/embedding/query_batcher.py
+import asyncio
+import json
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+
+from app.core.ports.async_vector_db import AsyncVectorDBInterface
+from app.core.ports.embedder import EmbedderInterface
+from app.utils.concurrency import run_cpu
+from app.utils.config import settings
+
+
+class QueryBatcher:
+    """
+    Agrupa (micro-batching) las búsquedas concurrentes:
+    - Las consultas que llegan dentro de una ventana de window_ms, o hasta juntar
+      max_batch, se codifican con un único encode y se puntúan contra el índice con
+      un único query_many (producto matriz-matriz)
+    - Cada request recibe su propio top_k (el lote usa el mayor y se recorta)
+    - Las consultas con filtros de metadata comparten el encode, pero se puntúan con
+      un query_many por cada filtro distinto del lote
+    - stats() expone los tamaños de lote alcanzados
+    Mientras un lote se procesa, el siguiente ya se va llenando.
+    """
+
+    def __init__(
+        self,
+        embedder: EmbedderInterface,
+        vector_db: AsyncVectorDBInterface,
+        window_ms: float | None = None,
+        max_batch: int | None = None,
+    ):
+        self.embedder = embedder
+        self.vector_db = vector_db
+        self.window = (settings.SEARCH_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch = max_batch or settings.SEARCH_MAX_BATCH
+        self._pending: List[Tuple[str, int, Dict[str, Any] | None, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._batch_sizes: Counter = Counter()
+        # el loop solo guarda referencias débiles a las tareas: sin esta, un lote en curso
+        # podría recolectarse y dejar sus requests esperando para siempre
+        self._tasks: set[asyncio.Task] = set()
+
+    async def search(self, query_text: str, top_k: int = 5, filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query_text, top_k, filters or None, future))
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._batch_sizes[len(batch)] += 1
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, int, Dict[str, Any] | None, asyncio.Future]]) -> None:
+        try:
+            vectors = await run_cpu(self.embedder.encode, [text for text, _, _, _ in batch])
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        groups: Dict[str, List[int]] = {}
+        for i, (_, _, filters, _) in enumerate(batch):
+            groups.setdefault(json.dumps(filters, sort_keys=True), []).append(i)
+        await asyncio.gather(*(self._run_group([batch[i] for i in rows], [vectors[i] for i in rows]) for rows in groups.values()))
+
+    async def _run_group(self, group, vectors) -> None:
+        """Un query_many para las consultas del lote que comparten filtro."""
+        try:
+            results = await self.vector_db.query_many(
+                vectors, top_k=max(k for _, k, _, _ in group), filters=group[0][2]
+            )
+        except Exception as e:
+            self._fail(group, e)
+            return
+        for (_, top_k, _, future), hits in zip(group, results):
+            if not future.done():  # el request pudo cancelarse mientras esperaba
+                future.set_result(hits[:top_k])
+
+    @staticmethod
+    def _fail(batch, error: Exception) -> None:
+        for _, _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Número de lotes, consultas y distribución de tamaños de lote."""
+        batches = sum(self._batch_sizes.values())
+        queries = sum(size * n for size, n in self._batch_sizes.items())
+        return {
+            "batches": batches,
+            "queries": queries,
+            "mean_batch_size": queries / batches if batches else 0.0,
+            "max_batch_size": max(self._batch_sizes, default=0),
+            "batch_sizes": dict(sorted(self._batch_sizes.items())),
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+        }
@@ -0,0 +1,243 @@
+# app/services/embedding/reindex_service.py
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.utils.config import settings
+
+MAX_REPORTED_FAILURES = 100
+
+
+class _RateLimiter:
+    """Limita el ritmo en chunks/segundo, compartido entre los hilos del reindexado."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: int, stop: threading.Event) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + amount / self.rate
+        if start > now:
+            stop.wait(start - now)
+
+
+class ReindexEngine:
+    """
+    Reindexado incremental y consciente de la versión del modelo:
+    - Con el VectorLedger sabe qué versión y qué hashes produjeron los vectores de cada
+      documento; solo se vuelven a codificar los documentos (y dentro de ellos los chunks)
+      desactualizados
+    - start() lanza una corrida en segundo plano: varios documentos en paralelo
+      (settings.REINDEX_WORKERS) limitados a settings.REINDEX_MAX_CHUNKS_PER_SEC para no
+      competir con las búsquedas; status() expone el progreso y cancel() la detiene
+    - Reanudable: los parámetros de la corrida se guardan en settings.REINDEX_CHECKPOINT_PATH
+      y el ledger se actualiza documento a documento, así que tras una caída resume()
+      recalcula el plan y sigue solo con lo pendiente
+    - watch() revisa la versión del modelo cada settings.REINDEX_WATCH_INTERVAL segundos y
+      reindexa sola cuando entra en servicio un modelo nuevo
+    """
+
+    def __init__(
+        self,
+        embedding_service,
+        storage_service,
+        checkpoint_path: str | Path | None = None,
+        workers: int | None = None,
+        max_chunks_per_sec: float | None = None,
+        watch_interval: float | None = None,
+    ):
+        self.embedding_service = embedding_service
+        self.storage_service = storage_service
+        self.ledger = embedding_service.ledger
+        self.checkpoint_path = Path(checkpoint_path or settings.REINDEX_CHECKPOINT_PATH)
+        self.workers = workers or settings.REINDEX_WORKERS
+        self.max_chunks_per_sec = settings.REINDEX_MAX_CHUNKS_PER_SEC if max_chunks_per_sec is None else max_chunks_per_sec
+        self.watch_interval = settings.REINDEX_WATCH_INTERVAL if watch_interval is None else watch_interval
+        self._status: Dict[str, Any] = {"status": "idle"}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._watcher: threading.Thread | None = None
+
+    # -------------------------------------------------------------------------
+    # API
+    # -------------------------------------------------------------------------
+    def start(self, doc_ids: List[str] | None = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Reindexa los documentos desactualizados (o solo doc_ids, incluidos los nunca indexados).
+        force=True reindexa todos los elegidos aunque estén al día. Si ya hay una corrida
+        en curso, devuelve su estado sin lanzar otra.
+        """
+        run = {
+            "doc_ids": list(doc_ids) if doc_ids is not None else None,
+            "force": force,
+            "started_at": time.time(),
+        }
+        with self._lock:
+            if self._status["status"] != "running":
+                self._write_checkpoint(run)
+                self._launch(run, resumed=False)
+        return self.status()
+
+    def resume(self) -> bool:
+        """Retoma la corrida que quedó a medias (checkpoint presente). Devuelve si había una."""
+        try:
+            run = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return False
+        with self._lock:
+            if self._status["status"] == "running":
+                return True
+            self._launch(run, resumed=True)
+        return True
+
+    def cancel(self) -> bool:
+        """Detiene la corrida en curso (lo ya reindexado queda en el ledger)."""
+        with self._lock:
+            if self._status["status"] != "running":
+                return False
+            self._stop.set()
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = dict(self._status)
+            status["failed"] = dict(status.get("failed", {}))
+        if status["status"] == "running":
+            elapsed = time.time() - status["started_at"]
+            status["chunks_per_sec"] = status["chunks"] / elapsed if elapsed > 0 else 0.0
+        status["model_version"] = self.embedding_service.embedder.model_version
+        status["stale_documents"] = len(self.ledger.stale(status["model_version"]))
+        return status
+
+    def watch(self) -> None:
+        """Arranca el hilo que reindexa al cambiar la versión del modelo (y al iniciar si hay pendientes)."""
+        if self.watch_interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch_loop, name="reindex-watch", daemon=True)
+        self._watcher.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._closed.set()
+        self._stop.set()
+        for thread in (self._thread, self._watcher):
+            if thread is not None:
+                thread.join(timeout=timeout)
+
+    # -------------------------------------------------------------------------
+    # Corrida
+    # -------------------------------------------------------------------------
+    def _launch(self, run: Dict[str, Any], resumed: bool) -> None:
+        """Caller holds _lock."""
+        self._stop.clear()
+        self._status = {
+            "status": "running",
+            "resumed": resumed,
+            "force": run["force"],
+            "target_model_version": self.embedding_service.embedder.model_version,
+            "total": None,
+            "done": 0,
+            "chunks": 0,
+            "missing": 0,
+            "failed": {},
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+        }
+        self._thread = threading.Thread(target=self._run, args=(run,), name="reindex", daemon=True)
+        self._thread.start()
+
+    def _plan(self, run: Dict[str, Any]) -> List[str]:
+        """Documentos pendientes: los ya reindexados en esta corrida quedan fuera (reanudación)."""
+        version = self.embedding_service.embedder.model_version
+        stale = set(self.ledger.stale(version, indexed_before=run["started_at"] if run["force"] else None))
+        if run["doc_ids"] is not None:
+            return [doc_id for doc_id in run["doc_ids"] if doc_id in stale or self.ledger.get(doc_id) is None]
+        return [doc_id for doc_id in self.ledger.doc_ids() if doc_id in stale]
+
+    def _run(self, run: Dict[str, Any]) -> None:
+        limiter = _RateLimiter(self.max_chunks_per_sec)
+        try:
+            doc_ids = self._plan(run)
+            with self._lock:
+                self._status["total"] = len(doc_ids)
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reindex") as pool:
+                list(pool.map(lambda doc_id: self._reindex_document(doc_id, run["force"], limiter), doc_ids))
+            final, error = ("cancelled" if self._stop.is_set() else "completed"), None
+        except Exception as e:
+            final, error = "failed", str(e)
+        if final != "failed" and not self._closed.is_set():
+            # cerrar el proceso a mitad de corrida deja el checkpoint para reanudar al volver
+            self._remove_checkpoint()
+        with self._lock:
+            self._status.update(status=final, error=error, finished_at=time.time())
+            elapsed = self._status["finished_at"] - self._status["started_at"]
+            self._status["chunks_per_sec"] = self._status["chunks"] / elapsed if elapsed > 0 else 0.0
+
+    def _reindex_document(self, doc_id: str, force: bool, limiter: _RateLimiter) -> None:
+        if self._stop.is_set():
+            return
+        try:
+            chunks = self.storage_service.load_document(doc_id)
+            if not chunks:
+                with self._lock:
+                    self._status["missing"] += 1
+                    self._status["done"] += 1
+                return
+            limiter.acquire(len(chunks), self._stop)
+            if self._stop.is_set():
+                return
+            entry = self.ledger.get(doc_id)
+            self.embedding_service.embed_and_store(
+                doc_id, chunks, entry["metadata"] if entry else None, force=force,
+                pages=self.storage_service.get_chunk_pages(doc_id),
+            )
+            with self._lock:
+                self._status["done"] += 1
+                self._status["chunks"] += len(chunks)
+        except Exception as e:
+            with self._lock:
+                self._status["done"] += 1
+                if len(self._status["failed"]) < MAX_REPORTED_FAILURES:
+                    self._status["failed"][doc_id] = str(e)
+
+    def _watch_loop(self) -> None:
+        embedder = self.embedding_service.embedder
+        last_version = object()  # fuerza la revisión inicial: el modelo pudo cambiar con el proceso caído
+        while not self._closed.is_set():
+            try:
+                reload = getattr(embedder, "reload", None)
+                version = reload() if reload is not None else embedder.model_version
+                if version != last_version:
+                    last_version = version
+                    if version is not None and self.ledger.stale(version):
+                        self.start()
+            except Exception:
+                pass  # se reintenta en la próxima vuelta
+            self._closed.wait(self.watch_interval)
+
+    # -------------------------------------------------------------------------
+    # Checkpoint
+    # -------------------------------------------------------------------------
+    def _write_checkpoint(self, run: Dict[str, Any]) -> None:
+        os.makedirs(self.checkpoint_path.parent, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(run), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    def _remove_checkpoint(self) -> None:
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,109 @@
+# app/services/embedding/vector_ledger.py
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.utils.config import settings
+
+
+class VectorLedger:
+    """
+    Registro persistente de qué produjo los vectores guardados de cada documento:
+    versión del modelo, hash de cada chunk (en orden), metadata extra e instante de indexado.
+    - Es un archivo JSONL de solo-agregado (settings.VECTOR_LEDGER_PATH): una línea por
+      indexado, la última de cada doc_id gana; se compacta al cargar si creció demasiado
+    - Cada línea se escribe después de insertar los vectores, así que tras una caída el
+      registro nunca declara al día un documento que no lo está
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path or settings.VECTOR_LEDGER_PATH)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # última línea a medio escribir
+                if entry.get("deleted"):
+                    self._entries.pop(entry["doc_id"], None)
+                else:
+                    self._entries[entry["doc_id"]] = entry
+        if lines > 2 * len(self._entries) + 1000:
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp, self.path)
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        os.makedirs(self.path.parent, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def get(self, doc_id: str) -> Dict[str, Any] | None:
+        with self._lock:
+            return self._entries.get(doc_id)
+
+    def record(self, doc_id: str, model_version: str | None, hashes: List[str], metadata: Dict[str, Any] | None = None) -> None:
+        entry = {
+            "doc_id": doc_id,
+            "model_version": model_version,
+            "hashes": list(hashes),
+            "metadata": metadata or {},
+            "indexed_at": time.time(),
+        }
+        with self._lock:
+            self._append(entry)
+            self._entries[doc_id] = entry
+
+    def remove(self, doc_id: str) -> None:
+        self.remove_many([doc_id])
+
+    def remove_many(self, doc_ids: List[str]) -> None:
+        with self._lock:
+            removed = [doc_id for doc_id in doc_ids if self._entries.pop(doc_id, None) is not None]
+            if removed:
+                os.makedirs(self.path.parent, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps({"doc_id": doc_id, "deleted": True}) + "\n" for doc_id in removed)
+
+    def doc_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def stale(self, model_version: str | None, indexed_before: float | None = None) -> List[str]:
+        """
+        Documentos indexados con otra versión del modelo; con indexed_before, además
+        todos los indexados antes de ese instante (reindexado forzado).
+        """
+        with self._lock:
+            return [
+                doc_id for doc_id, entry in self._entries.items()
+                if entry["model_version"] != model_version
+                or (indexed_before is not None and entry["indexed_at"] < indexed_before)
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            versions = Counter(entry["model_version"] for entry in self._entries.values())
+            return {
+                "documents": len(self._entries),
+                "chunks": sum(len(entry["hashes"]) for entry in self._entries.values()),
+                "model_versions": dict(versions),
+            }
@@ -0,0 +1,563 @@
+# app/services/ingestion/ingest_service.py
+"""
+Ingesta masiva: guarda e indexa todos los .txt / .pdf / .docx de un directorio o de un
+archivo .zip / .tar(.gz, .bz2, .xz).
+
+Usage:
+    python -m app.services.ingestion.ingest_service SOURCE [--metadata '{"tenant": "acme"}'] [--force]
+        [--extract-workers N] [--encode-threads N]
+
+Con el servidor en marcha, usar POST /ingest (la CLI escribe en los mismos archivos de datos).
+Los archivos ya ingeridos (según el manifiesto) se saltean, así que repetir el comando
+tras una interrupción sigue donde quedó.
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+from app.utils.chunk_splitter import split_pages_into_chunks
+from app.utils.config import settings
+from app.utils.file_loader import PAGED_EXTENSIONS, iter_pages
+from app.utils.metrics import PAGES_EXTRACTED, STAGE_SECONDS
+
+SUPPORTED_EXTENSIONS = (".txt",) + PAGED_EXTENSIONS
+STAGES = ("extract", "chunk", "encode", "insert")
+MAX_REPORTED_FAILURES = 100
+_DONE = object()  # fin de cola
+_EXTRACT_SECONDS = STAGE_SECONDS.labels("extract")
+
+
+class _SourceFile(NamedTuple):
+    key: str  # ruta absoluta, o "<archivo comprimido>::<miembro>"
+    name: str  # ruta relativa a la fuente; queda en la metadata como "source"
+    fingerprint: str  # tamaño + fecha (o CRC): si cambia, el archivo se vuelve a ingerir
+    path: str  # archivo a leer (copia temporal para los miembros de un archivo comprimido)
+    spooled: bool
+
+
+def _extract_pages(path: str) -> Tuple[List[str], float, Tuple[List[int], float]]:
+    """
+    Páginas de un PDF / DOCX, los segundos que llevó extraerlas y las latencias por página
+    observadas (se ejecuta en el pool de procesos; medido ahí, no incluye la espera en la
+    cola del pool). Las métricas del hijo no son visibles en /metrics: el padre las suma.
+    """
+    reported = _EXTRACT_SECONDS.snapshot()
+    started = time.perf_counter()
+    pages = list(iter_pages(path, workers=1))
+    seconds = time.perf_counter() - started
+    counts, total = _EXTRACT_SECONDS.snapshot()
+    return pages, seconds, ([c - r for c, r in zip(counts, reported[0])], total - reported[1])
+
+
+class IngestEngine:
+    """
+    Ingesta masiva por etapas, conectadas por colas acotadas (settings.INGEST_QUEUE_SIZE)
+    para que una etapa lenta frene a las anteriores en lugar de acumular documentos en memoria:
+    1. extract: un hilo recorre la fuente y manda cada PDF / DOCX a un pool de procesos
+       (settings.INGEST_EXTRACT_WORKERS); los .txt se leen directamente en la etapa siguiente
+    2. chunk + encode: settings.INGEST_ENCODE_THREADS hilos trocean las páginas, guardan el
+       documento (StorageService.save_chunks: deduplicación e índice léxico) y codifican los
+       chunks (EmbeddingService.plan_index, con la caché de embeddings). Un archivo duplicado
+       de un documento que ya tiene vectores del modelo actual no se vuelve a codificar (ni
+       cambia el "source" del original)
+    3. insert: un hilo junta los vectores de varios documentos hasta settings.INGEST_INSERT_BATCH
+       chunks y los inserta de una vez (EmbeddingService.store_plans) mientras las etapas
+       anteriores siguen con los próximos
+    - Reanudable: cada archivo terminado (o fallido) se anota en el manifiesto JSONL
+      settings.INGEST_MANIFEST_PATH después de insertar sus vectores, y los parámetros de la
+      corrida en settings.INGEST_CHECKPOINT_PATH; resume() retoma una corrida interrumpida
+      saltando lo ya ingerido (los archivos cuyo tamaño o fecha cambiaron se vuelven a ingerir)
+    - status() informa, por etapa, documentos, chunks, segundos ocupados y throughput
+    """
+
+    def __init__(
+        self,
+        embedding_service,
+        storage_service,
+        manifest_path: str | Path | None = None,
+        checkpoint_path: str | Path | None = None,
+        extract_workers: int | None = None,
+        encode_threads: int | None = None,
+    ):
+        self.embedding_service = embedding_service
+        self.storage_service = storage_service
+        self.manifest_path = Path(manifest_path or settings.INGEST_MANIFEST_PATH)
+        self.checkpoint_path = Path(checkpoint_path or settings.INGEST_CHECKPOINT_PATH)
+        self.extract_workers = extract_workers or settings.INGEST_EXTRACT_WORKERS or os.cpu_count() or 1
+        self.encode_threads = encode_threads or settings.INGEST_ENCODE_THREADS
+        self.queue_size = max(1, settings.INGEST_QUEUE_SIZE)
+        self.insert_batch = settings.INGEST_INSERT_BATCH
+        self._status: Dict[str, Any] = {"status": "idle"}
+        self._lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._queues: Tuple[queue.Queue, queue.Queue] | None = None
+
+    # -------------------------------------------------------------------------
+    # API
+    # -------------------------------------------------------------------------
+    def start(
+        self, source: str | Path, metadata: Dict[str, Any] | None = None, force: bool = False,
+        remove_source: bool = False, root: str | Path | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Ingiere un directorio, un .zip / .tar o un archivo suelto en segundo plano.
+        `metadata` se copia en todos los chunks (más "source", la ruta del archivo dentro de
+        la fuente); force=True vuelve a ingerir y codificar aunque estén en el manifiesto;
+        remove_source borra la fuente al terminar (archivos subidos por la API).
+        Con `root`, la fuente (resueltos los symlinks) tiene que estar dentro de ese directorio
+        (PermissionError si no), y los archivos de un directorio que apunten fuera se saltean.
+        Si ya hay una corrida en curso, devuelve su estado sin lanzar otra.
+        """
+        source = Path(source).resolve()
+        if root is not None:
+            root = Path(root).resolve()
+            if not source.is_relative_to(root):
+                raise PermissionError(f"Source outside the ingest root: {source}")
+        if not source.exists():
+            raise ValueError(f"Source not found: {source}")
+        run = {
+            "source": str(source),
+            "root": str(root) if root is not None else None,
+            "metadata": metadata or {},
+            "force": force,
+            "remove_source": remove_source,
+            "started_at": time.time(),
+        }
+        with self._lock:
+            if self._status["status"] != "running":
+                self._write_checkpoint(run)
+                self._launch(run, resumed=False)
+        return self.status()
+
+    def resume(self) -> bool:
+        """Retoma la corrida que quedó a medias (checkpoint presente). Devuelve si había una."""
+        try:
+            run = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return False
+        if not Path(run["source"]).exists():
+            self._remove_checkpoint()
+            return False
+        with self._lock:
+            if self._status["status"] != "running":
+                self._launch(run, resumed=True)
+        return True
+
+    def cancel(self) -> bool:
+        """Detiene la corrida en curso (lo ya insertado queda en el manifiesto)."""
+        with self._lock:
+            if self._status["status"] != "running":
+                return False
+            self._stop.set()
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = dict(self._status)
+            status["failed"] = dict(status.get("failed", {}))
+            stages = {name: dict(values) for name, values in status.get("stages", {}).items()}
+            queues = self._queues
+        if "started_at" in status:
+            elapsed = (status["finished_at"] or time.time()) - status["started_at"]
+            for values in stages.values():
+                values["documents_per_sec"] = values["documents"] / elapsed if elapsed > 0 else 0.0
+                values["chunks_per_sec"] = values["chunks"] / elapsed if elapsed > 0 else 0.0
+            status["stages"] = stages
+        if queues is not None:
+            status["queued"] = {"extracted": queues[0].qsize(), "encoded": queues[1].qsize()}
+        return status
+
+    def wait(self, timeout: float | None = None) -> Dict[str, Any]:
+        """Espera a que termine la corrida en curso y devuelve su estado."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.status()
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._closed.set()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    # -------------------------------------------------------------------------
+    # Corrida
+    # -------------------------------------------------------------------------
+    def _launch(self, run: Dict[str, Any], resumed: bool) -> None:
+        """Caller holds _lock."""
+        self._stop.clear()
+        self._status = {
+            "status": "running",
+            "source": run["source"],
+            "resumed": resumed,
+            "force": run["force"],
+            "discovered": 0,
+            "skipped": 0,
+            "duplicates": 0,
+            "done": 0,
+            "chunks": 0,
+            "failed": {},
+            "failed_count": 0,
+            "stages": {name: {"documents": 0, "chunks": 0, "busy_seconds": 0.0} for name in STAGES},
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+        }
+        self._thread = threading.Thread(target=self._run, args=(run,), name="ingest", daemon=True)
+        self._thread.start()
+
+    def _run(self, run: Dict[str, Any]) -> None:
+        extracted: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        encoded: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._queues = (extracted, encoded)
+        manifest = self._load_manifest()
+        os.makedirs(self.manifest_path.parent, exist_ok=True)
+        spool_dir = Path(settings.TMP_DIR) / "ingest"
+        os.makedirs(spool_dir, exist_ok=True)
+        claimed: set = set()  # doc_ids ya encolados para codificar en esta corrida
+        encoders = [
+            threading.Thread(
+                target=self._encode_loop, args=(run, extracted, encoded, claimed), name=f"ingest-encode-{i}", daemon=True
+            )
+            for i in range(self.encode_threads)
+        ]
+        inserter = threading.Thread(target=self._insert_loop, args=(encoded,), name="ingest-insert", daemon=True)
+        for thread in encoders + [inserter]:
+            thread.start()
+
+        def pending(key: str, fingerprint: str) -> bool:
+            entry = manifest.get(key)
+            done = entry is not None and entry["status"] == "done" and entry["fingerprint"] == fingerprint
+            if done and run["force"]:
+                done = entry["at"] >= run["started_at"]  # al reanudar un force, lo de esta corrida ya está
+            if done:
+                self._add(skipped=1)
+            return not done
+
+        # spawn: el servidor tiene hilos, y un fork los copiaría a medio estado
+        pool = ProcessPoolExecutor(max_workers=self.extract_workers, mp_context=get_context("spawn"))
+        try:
+            for item in self._iter_sources(Path(run["source"]), pending, spool_dir, run.get("root")):
+                future = None
+                if os.path.splitext(item.path)[1].lower() in PAGED_EXTENSIONS:
+                    future = pool.submit(_extract_pages, item.path)
+                self._add(discovered=1)
+                extracted.put((item, future))  # bloquea si las etapas siguientes van atrasadas
+                if self._stop.is_set():
+                    break
+            final, error = ("cancelled" if self._stop.is_set() else "completed"), None
+        except Exception as e:
+            final, error = "failed", str(e)
+        finally:
+            for _ in encoders:
+                extracted.put(_DONE)
+            for thread in encoders:
+                thread.join()
+            encoded.put(_DONE)
+            inserter.join()
+            pool.shutdown(cancel_futures=True)
+        if final == "completed" and self._stop.is_set():
+            final = "cancelled"
+        if final != "failed" and not self._closed.is_set():
+            # cerrar el proceso a mitad de corrida deja el checkpoint para reanudar al volver
+            self._remove_checkpoint()
+            if final == "completed" and run.get("remove_source"):
+                self._remove_source(Path(run["source"]))
+        with self._lock:
+            self._status.update(status=final, error=error, finished_at=time.time())
+            self._queues = None
+
+    def _encode_loop(self, run: Dict[str, Any], extracted: queue.Queue, encoded: queue.Queue, claimed: set) -> None:
+        """Etapas chunk y encode (varios hilos)."""
+        while True:
+            job = extracted.get()
+            if job is _DONE:
+                return
+            item, future = job
+            try:
+                if self._stop.is_set():
+                    if future is not None:
+                        future.cancel()
+                    continue
+                if future is not None:
+                    pages, seconds, latency = future.result()
+                    _EXTRACT_SECONDS.merge(*latency)
+                    PAGES_EXTRACTED.inc(len(pages))
+                else:
+                    started = time.perf_counter()
+                    pages = list(iter_pages(item.path))
+                    seconds = time.perf_counter() - started
+                self._account("extract", seconds, 0)
+
+                started = time.perf_counter()
+                chunks, spans = [], []
+                for chunk, span in split_pages_into_chunks(pages):
+                    chunks.append(chunk)
+                    spans.append(span)
+                if not chunks:
+                    raise ValueError("No chunks could be generated from the file")
+                doc_id = self.storage_service.save_chunks(item.name, chunks, spans)
+                self._account("chunk", time.perf_counter() - started, len(chunks))
+                if self._already_indexed(run, doc_id, claimed):
+                    self._add(duplicates=1)
+                    self._record(item, "done", doc_id=doc_id, chunks=len(chunks))
+                    continue
+
+                started = time.perf_counter()
+                metadata = {"source": item.name, **run["metadata"]}
+                plan = self.embedding_service.plan_index(doc_id, chunks, metadata, run["force"], spans)
+                self._account("encode", time.perf_counter() - started, len(plan.stale))
+                encoded.put((item, doc_id, plan, metadata))
+            except Exception as e:
+                self._record(item, "failed", error=str(e))
+            finally:
+                if item.spooled:
+                    try:
+                        os.remove(item.path)
+                    except OSError:
+                        pass
+
+    def _already_indexed(self, run: Dict[str, Any], doc_id: str, claimed: set) -> bool:
+        """
+        True si doc_id (un duplicado resuelto por save_chunks) ya se codificó: en esta misma
+        corrida, o antes con la versión actual del modelo (con force, solo si fue en esta corrida).
+        """
+        with self._lock:
+            if doc_id in claimed:
+                return True
+            claimed.add(doc_id)
+        entry = self.embedding_service.ledger.get(doc_id)
+        if entry is None or entry["model_version"] != self.embedding_service.embedder.model_version:
+            return False
+        return not run["force"] or entry["indexed_at"] >= run["started_at"]
+
+    def _insert_loop(self, encoded: queue.Queue) -> None:
+        """Etapa insert: un insert_many por tanda de documentos."""
+        finished = False
+        while not finished:
+            job = encoded.get()
+            if job is _DONE:
+                return
+            batch = [job]
+            size = len(job[2].stale)
+            # junta lo que ya esté esperando, sin demorar la inserción
+            while size < self.insert_batch:
+                try:
+                    job = encoded.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _DONE:
+                    finished = True
+                    break
+                batch.append(job)
+                size += len(job[2].stale)
+            started = time.perf_counter()
+            try:
+                self.embedding_service.store_plans([(doc_id, plan, metadata) for _, doc_id, plan, metadata in batch])
+            except Exception as e:
+                for item, *_ in batch:
+                    self._record(item, "failed", error=str(e))
+                continue
+            self._account("insert", time.perf_counter() - started, size, documents=len(batch))
+            for item, doc_id, plan, _ in batch:
+                self._record(item, "done", doc_id=doc_id, chunks=len(plan.chunk_ids))
+
+    # -------------------------------------------------------------------------
+    # Fuentes
+    # -------------------------------------------------------------------------
+    def _iter_sources(
+        self, source: Path, pending: Callable[[str, str], bool], spool_dir: Path, allowed_root: str | None = None
+    ) -> Iterator[_SourceFile]:
+        """
+        Archivos soportados de la fuente, en orden estable, que todavía no fueron ingeridos.
+        Los miembros de un .zip / .tar se copian a spool_dir de a uno, a medida que se piden.
+        Con `allowed_root`, los archivos de un directorio que (por symlinks) resuelven fuera se saltean.
+        """
+        def supported(name: str) -> bool:
+            return os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+        if source.is_dir():
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if not supported(name):
+                        continue
+                    if allowed_root is not None and not Path(os.path.realpath(path)).is_relative_to(allowed_root):
+                        continue
+                    st = os.stat(path)
+                    fingerprint = f"{st.st_size}:{st.st_mtime_ns}"
+                    if pending(path, fingerprint):
+                        yield _SourceFile(path, os.path.relpath(path, source), fingerprint, path, False)
+        elif zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    key = f"{source}::{info.filename}"
+                    fingerprint = f"{info.file_size}:{info.CRC}"
+                    if info.is_dir() or not supported(info.filename) or not pending(key, fingerprint):
+                        continue
+                    with archive.open(info) as member:
+                        path = self._spool(member, info.filename, spool_dir)
+                    yield _SourceFile(key, info.filename, fingerprint, path, True)
+        elif tarfile.is_tarfile(source):
+            with tarfile.open(source, "r:*") as archive:
+                for info in archive:  # en orden de lectura: los .tar.gz se descomprimen una sola vez
+                    key = f"{source}::{info.name}"
+                    fingerprint = f"{info.size}:{info.mtime}"
+                    if not info.isfile() or not supported(info.name) or not pending(key, fingerprint):
+                        continue
+                    path = self._spool(archive.extractfile(info), info.name, spool_dir)
+                    yield _SourceFile(key, info.name, fingerprint, path, True)
+        elif source.is_file() and supported(source.name):
+            st = source.stat()
+            fingerprint = f"{st.st_size}:{st.st_mtime_ns}"
+            if pending(str(source), fingerprint):
+                yield _SourceFile(str(source), source.name, fingerprint, str(source), False)
+        else:
+            raise ValueError(f"Unsupported source (expected a directory, .zip, .tar or .txt/.pdf/.docx): {source}")
+
+    @staticmethod
+    def _spool(member, name: str, spool_dir: Path) -> str:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(name)[1].lower(), dir=spool_dir)
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(member, out, settings.UPLOAD_READ_BLOCK)
+        return path
+
+    @staticmethod
+    def _remove_source(source: Path) -> None:
+        try:
+            if source.is_dir():
+                shutil.rmtree(source)
+            else:
+                os.remove(source)
+        except OSError:
+            pass
+
+    # -------------------------------------------------------------------------
+    # Contadores y manifiesto
+    # -------------------------------------------------------------------------
+    def _add(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self._status[name] += value
+
+    def _account(self, stage: str, seconds: float, chunks: int, documents: int = 1) -> None:
+        with self._lock:
+            values = self._status["stages"][stage]
+            values["documents"] += documents
+            values["chunks"] += chunks
+            values["busy_seconds"] += seconds
+
+    def _record(self, item: _SourceFile, status: str, doc_id: str | None = None, chunks: int = 0,
+                error: str | None = None) -> None:
+        entry = {"key": item.key, "fingerprint": item.fingerprint, "status": status, "at": time.time()}
+        if doc_id is not None:
+            entry.update(doc_id=doc_id, chunks=chunks)
+        if error is not None:
+            entry["error"] = error
+        with self._manifest_lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        with self._lock:
+            if status == "done":
+                self._status["done"] += 1
+                self._status["chunks"] += chunks
+            else:
+                self._status["failed_count"] += 1
+                if len(self._status["failed"]) < MAX_REPORTED_FAILURES:
+                    self._status["failed"][item.key] = error
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Última entrada de cada archivo (las líneas truncadas por una caída se ignoran)."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        if not self.manifest_path.exists():
+            return entries
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["key"]] = entry
+        return entries
+
+    def _write_checkpoint(self, run: Dict[str, Any]) -> None:
+        os.makedirs(self.checkpoint_path.parent, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(run), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    def _remove_checkpoint(self) -> None:
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+
+def _format_stages(status: Dict[str, Any]) -> str:
+    lines = [f"{'stage':<8} {'docs':>8} {'chunks':>10} {'docs/s':>9} {'chunks/s':>10} {'busy s':>9}"]
+    for name in STAGES:
+        v = status["stages"][name]
+        lines.append(
+            f"{name:<8} {v['documents']:>8} {v['chunks']:>10} {v['documents_per_sec']:>9.1f} "
+            f"{v['chunks_per_sec']:>10.1f} {v['busy_seconds']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory, .zip/.tar archive or single file")
+    parser.add_argument("--metadata", type=json.loads, default=None, help="JSON object copied onto every chunk")
+    parser.add_argument("--force", action="store_true", help="re-ingest files already in the manifest")
+    parser.add_argument("--extract-workers", type=int, default=None)
+    parser.add_argument("--encode-threads", type=int, default=None)
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    from app.services.container import container
+    engine = IngestEngine(
+        container.embedding_service(), container.storage_service(),
+        extract_workers=args.extract_workers, encode_threads=args.encode_threads,
+    )
+    try:
+        engine.start(args.source, args.metadata, args.force)
+        try:
+            while engine.wait(args.progress_every)["status"] == "running":
+                s = engine.status()
+                print(f"discovered {s['discovered']}  done {s['done']}  failed {s['failed_count']}  "
+                      f"skipped {s['skipped']}  chunks {s['chunks']}  queued {s.get('queued')}", flush=True)
+        except KeyboardInterrupt:
+            engine.cancel()
+            engine.wait()
+        status = engine.status()
+        print(f"{status['status']}: {status['done']} files, {status['chunks']} chunks, "
+              f"{status['skipped']} already ingested, {status['duplicates']} duplicates, {status['failed_count']} failed "
+              f"in {status['finished_at'] - status['started_at']:.1f}s")
+        print(_format_stages(status))
+        for key, error in status["failed"].items():
+            print(f"  failed: {key}: {error}")
+        if status["error"]:
+            print(f"error: {status['error']}")
+    finally:
+        engine.close()
+        container.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,36 @@
-from typing import List
+import codecs
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Tuple
 from app.adapters.storage.local_file_storage import LocalFileStorageAdapter
-from app.utils.chunk_splitter import split_into_chunks
+from app.core.ports.lexical_index import LexicalIndexInterface
+from app.utils.chunk_splitter import split_into_chunks, split_into_chunks_stream, split_pages_into_chunks
+from app.utils.config import settings
+from app.utils.content_hash import DocumentHasher, document_hash
+from app.utils.file_loader import iter_pages
 
 class StorageService:
     """
     Encapsula la lógica de almacenamiento de archivos (documentos y chunks).
     No depende directamente del sistema de archivos — solo del adapter.
+    Con settings.DEDUP_DOCUMENTS, un documento cuyo contenido normalizado ya está guardado
+    (mismo hash BLAKE2 de sus chunks) no se duplica: se devuelve el doc_id existente.
+    Con un lexical_index (BM25), cada documento guardado o borrado se indexa / desindexa
+    en el mismo momento; sync_lexical_index() lo pone al día con lo que hay en disco.
     """
 
-    def __init__(self, adapter: LocalFileStorageAdapter | None = None):
+    def __init__(
+        self, adapter: LocalFileStorageAdapter | None = None, lexical_index: LexicalIndexInterface | None = None
+    ):
         self.adapter = adapter or LocalFileStorageAdapter()
+        self.lexical_index = lexical_index
+        self.dedup = settings.DEDUP_DOCUMENTS
+        self._counts = {"saved": 0, "duplicates": 0}
+        self._counts_lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._counts_lock:
+            self._counts[name] += 1
 
     def save_raw(self, filename: str, content: str) -> str:
         """
@@ -19,7 +40,123 @@ class StorageService:
         chunks = split_into_chunks(content)
         if not chunks:
             raise ValueError(f"No se pudieron generar chunks del archivo: {filename}")
-        return self.adapter.save(chunks)
+        if not self.dedup:
+            doc_id = self.adapter.save(chunks)
+            self._index_lexical(doc_id, chunks)
+            self._count("saved")
+            return doc_id
+        content_hash = document_hash(chunks)
+        existing = self.adapter.find_by_hash(content_hash)  # evita escribir un duplicado conocido
+        if existing is None:
+            doc_id = self.adapter.save(chunks)
+            # otra subida del mismo contenido puede haberse registrado entre tanto
+            existing = self.adapter.claim_hash(content_hash, doc_id)
+            if existing is not None:
+                self.adapter.delete(doc_id)
+        if existing is not None:
+            self._count("duplicates")
+            return existing
+        self._index_lexical(doc_id, chunks)
+        self._count("saved")
+        return doc_id
+
+    def save_stream(self, filename: str, stream: BinaryIO, encoding: str = "utf-8") -> str:
+        """
+        Igual que save_raw, pero leyendo un archivo binario por bloques (settings.UPLOAD_READ_BLOCK):
+        decodifica de forma incremental, genera los chunks con split_into_chunks_stream
+        y los escribe a medida que salen. La memoria no depende del tamaño del archivo.
+        El hash se conoce al terminar de escribir: si el contenido ya existía, la copia
+        recién escrita se borra y se devuelve el doc_id existente.
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+
+        def pieces():
+            while True:
+                block = stream.read(settings.UPLOAD_READ_BLOCK)
+                if not block:
+                    break
+                yield decoder.decode(block)
+            yield decoder.decode(b"", final=True)
+
+        return self.save_chunks(filename, split_into_chunks_stream(pieces()))
+
+    def save_file(self, filename: str, path: str | Path) -> str:
+        """
+        Guarda un PDF o DOCX ya escrito en disco: las páginas se extraen en streaming
+        (en paralelo para PDFs grandes, ver iter_pages) y se trocean a medida que llegan.
+        Se guarda también la primera y la última página de cada chunk (get_chunk_pages).
+        """
+        pages: List[Tuple[int, int]] = []
+
+        def chunks():
+            for chunk, span in split_pages_into_chunks(iter_pages(path)):
+                pages.append(span)
+                yield chunk
+
+        return self.save_chunks(filename, chunks(), pages)
+
+    def save_chunks(self, filename: str, chunks: Iterable[str], pages: List[Tuple[int, int]] | None = None) -> str:
+        """
+        Guarda chunks ya generados (p. ej. por la ingesta masiva), con deduplicación e índice léxico.
+        Los chunks se escriben a medida que salen (y se tokenizan para el índice léxico en
+        el mismo recorrido) y la deduplicación se resuelve al final; `pages` (que puede
+        completarse mientras se consumen los chunks) se guarda junto al documento.
+        """
+        produced = 0
+        lexical = self.lexical_index.new_document() if self.lexical_index is not None else None
+
+        def counted(chunks):
+            nonlocal produced
+            for chunk in chunks:
+                produced += 1
+                if lexical is not None:
+                    lexical.add(chunk)
+                yield chunk
+
+        hasher = DocumentHasher()
+        doc_id = self.adapter.save_stream(hasher.wrap(counted(chunks)))
+        if not produced:
+            self.adapter.delete(doc_id)
+            raise ValueError(f"No se pudieron generar chunks del archivo: {filename}")
+        if self.dedup:
+            # búsqueda y registro atómicos: de dos subidas simultáneas del mismo contenido queda una
+            existing = self.adapter.claim_hash(hasher.hexdigest(), doc_id)
+            if existing is not None:
+                self.adapter.delete(doc_id)
+                self._count("duplicates")
+                return existing
+        if pages:
+            self.adapter.save_chunk_pages(doc_id, pages)
+        if lexical is not None:
+            lexical.commit(doc_id)
+        self._count("saved")
+        return doc_id
+
+    def _index_lexical(self, doc_id: str, chunks: Iterable[str]) -> None:
+        if self.lexical_index is not None:
+            self.lexical_index.add_document(doc_id, chunks)
+
+    def sync_lexical_index(self) -> Dict[str, int]:
+        """
+        Reconcilia el índice léxico con los documentos guardados: indexa los que faltan
+        (p. ej. tras una caída antes del último snapshot) y quita los que ya no existen.
+        """
+        if self.lexical_index is None:
+            return {"added": 0, "removed": 0}
+        stored = self.adapter.list_ids()
+        indexed = set(self.lexical_index.documents())
+        missing = [doc_id for doc_id in stored if doc_id not in indexed]
+        extra = indexed.difference(stored)
+        for doc_id in missing:
+            self.lexical_index.add_document(doc_id, self.adapter.load(doc_id))
+        for doc_id in extra:
+            self.lexical_index.remove_document(doc_id)
+        return {"added": len(missing), "removed": len(extra)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Documentos guardados y subidas resueltas como duplicado de uno existente."""
+        with self._counts_lock:
+            return {"dedup": self.dedup, **self._counts}
 
     def get_chunks(self, doc_id: str) -> List[str]:
         """
@@ -28,11 +165,17 @@ class StorageService:
         """
         return self.adapter.load(doc_id)
 
+    def get_chunk_pages(self, doc_id: str) -> List[Tuple[int, int]] | None:
+        """(primera, última) página de origen de cada chunk, o None si el documento no es paginado."""
+        return self.adapter.load_chunk_pages(doc_id)
+
     def save_document(self, chunks: List[str]) -> str:
         """
         Guarda un documento dividido en chunks y retorna su ID único.
         """
-        return self.adapter.save(chunks)
+        doc_id = self.adapter.save(chunks)
+        self._index_lexical(doc_id, chunks)
+        return doc_id
 
     def load_document(self, doc_id: str) -> List[str]:
         """
@@ -40,8 +183,16 @@ class StorageService:
         """
         return self.adapter.load(doc_id)
 
+    def list_documents(self) -> List[str]:
+        """
+        IDs de todos los documentos guardados (los más antiguos primero).
+        """
+        return self.adapter.list_ids()
+
     def delete_document(self, doc_id: str) -> None:
         """
         Elimina archivos asociados a un documento.
         """
-        self.adapter.delete(doc_id)
\ No newline at end of file
+        self.adapter.delete(doc_id)
+        if self.lexical_index is not None:
+            self.lexical_index.remove_document(doc_id)
\ No newline at end of file
@@ -0,0 +1,240 @@
+# app/services/training/job_runner.py
+import multiprocessing as mp
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from typing import List, Dict, Any
+
+from app.utils.config import settings
+from app.utils.metrics import STAGE_SECONDS, TRAINING_PAIRS
+
+_TRAIN_STEP_SECONDS = STAGE_SECONDS.labels("train_step")
+
+
+class TrainingQueueFull(Exception):
+    """La cola de entrenamientos pendientes está llena."""
+
+
+def _run_training_job(doc_ids: List[str], epochs: int, options: Dict[str, Any], events, cancel_event) -> None:
+    """
+    Punto de entrada del proceso hijo: entrena y reporta eventos al proceso padre.
+    Se importa TrainingService aquí para que torch solo se cargue en el proceso de entrenamiento.
+    Cada evento de progreso lleva las latencias de los pasos de la época ("step_latency"),
+    que el padre suma a sus métricas: las del hijo no son visibles en /metrics.
+    """
+    from app.utils.logger import setup_logging
+    from app.services.training.training_service import TrainingService
+    from app.models.train_skipgram import TrainingCancelled
+
+    setup_logging()  # proceso spawn: no hereda la configuración del padre
+
+    reported = _TRAIN_STEP_SECONDS.snapshot()
+
+    def progress(stats):
+        nonlocal reported
+        counts, total = _TRAIN_STEP_SECONDS.snapshot()
+        delta = ([c - r for c, r in zip(counts, reported[0])], total - reported[1])
+        reported = (counts, total)
+        events.put(("progress", {**stats, "step_latency": delta}))
+
+    try:
+        result = TrainingService().train_on_documents(
+            doc_ids, epochs,
+            progress_callback=progress,
+            should_stop=cancel_event.is_set,
+            **options,
+        )
+        if isinstance(result, dict) and "error" in result:
+            events.put(("failed", result["error"]))
+        else:
+            events.put(("completed", result))
+    except TrainingCancelled:
+        events.put(("cancelled", None))
+    except Exception as e:
+        events.put(("failed", str(e)))
+
+
+class TrainingJobRunner:
+    """
+    Ejecuta entrenamientos en segundo plano, cada uno en un proceso aparte,
+    para que el event loop de la API siga atendiendo búsquedas y uploads:
+    - submit() encola un job (cola acotada: TRAINING_MAX_QUEUED) y devuelve su estado
+    - get()/list() exponen estado y progreso (época, loss, pairs/sec); de los terminados se
+      guardan los últimos TRAINING_KEEP_FINISHED, durante TRAINING_FINISHED_TTL segundos
+    - cancel() saca de la cola un job pendiente (libera su lugar) o pide al proceso que se
+      detenga (terminate() si no lo hace en TRAINING_CANCEL_GRACE segundos)
+    Los jobs se ejecutan de a uno: el entrenamiento ya usa todos los núcleos.
+    """
+
+    def __init__(self, max_queued: int | None = None, cancel_grace: float | None = None):
+        self._ctx = mp.get_context("spawn")
+        self.max_queued = max_queued or settings.TRAINING_MAX_QUEUED
+        self.cancel_grace = settings.TRAINING_CANCEL_GRACE if cancel_grace is None else cancel_grace
+        self.keep_finished = settings.TRAINING_KEEP_FINISHED
+        self.finished_ttl = settings.TRAINING_FINISHED_TTL
+        self._pending: deque = deque()  # job_ids en cola, en orden de llegada
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cancel_events: Dict[str, Any] = {}  # solo de los jobs en cola o en curso
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)
+        self._worker = threading.Thread(target=self._dispatch_loop, name="training-jobs", daemon=True)
+        self._worker.start()
+
+    def submit(self, doc_ids: List[str], epochs: int, **options) -> Dict[str, Any]:
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "doc_ids": list(doc_ids),
+            "epochs": epochs,
+            "options": options,
+            "progress": {"epoch": 0, "epochs": epochs, "loss": None, "pairs_per_sec": None},
+            "history": [],
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            if len(self._pending) >= self.max_queued:
+                raise TrainingQueueFull("Demasiados entrenamientos en cola; intenta más tarde.")
+            self._prune()
+            self._jobs[job_id] = job
+            self._cancel_events[job_id] = self._ctx.Event()
+            self._pending.append(job_id)
+            self._queued.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if k != "options"}
+            snapshot["history"] = list(job["history"])
+            return snapshot
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = list(self._jobs)
+        return [job for job in map(self.get, ids) if job is not None]
+
+    def cancel(self, job_id: str) -> bool:
+        """Devuelve False si el job no existe o ya terminó."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ("queued", "running"):
+                return False
+            if job["status"] == "queued":
+                self._pending.remove(job_id)
+                self._finish(job, "cancelled")
+            else:
+                self._cancel_events[job_id].set()
+            return True
+
+    # -------------------------------------------------------------------------
+    # Hilo despachador
+    # -------------------------------------------------------------------------
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._queued.wait()
+                job = self._jobs[self._pending.popleft()]
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                cancel_event = self._cancel_events[job["job_id"]]
+            self._run(job, cancel_event)
+
+    def _run(self, job: Dict[str, Any], cancel_event) -> None:
+        events = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_run_training_job,
+            args=(job["doc_ids"], job["epochs"], job["options"], events, cancel_event),
+            name=f"training-{job['job_id']}",
+            daemon=True,
+        )
+        process.start()
+        final = None
+        cancel_deadline = None
+        while final is None:
+            try:
+                final = self._handle_event(job, *events.get(timeout=0.5))
+                continue
+            except queue.Empty:
+                pass
+            if cancel_event.is_set():
+                cancel_deadline = cancel_deadline or time.time() + self.cancel_grace
+                if time.time() > cancel_deadline and process.is_alive():
+                    process.terminate()
+                    final = ("cancelled", None)
+            if final is None and not process.is_alive():
+                # drain what the child flushed right before exiting
+                try:
+                    while final is None:
+                        final = self._handle_event(job, *events.get(timeout=1.0))
+                except queue.Empty:
+                    final = ("failed", f"El proceso de entrenamiento terminó con código {process.exitcode}")
+        process.join(timeout=self.cancel_grace)
+        kind, payload = final
+        with self._lock:
+            if kind == "completed":
+                job["result"] = payload
+            elif kind == "failed":
+                job["error"] = payload
+            self._finish(job, kind)
+
+    def _finish(self, job: Dict[str, Any], status: str) -> None:
+        """Caller holds _lock."""
+        job["status"] = status
+        job["finished_at"] = time.time()
+        self._cancel_events.pop(job["job_id"], None)
+        self._prune()
+
+    def _prune(self) -> None:
+        """
+        Olvida los jobs terminados hace más de finished_ttl y, de los que quedan, los más
+        viejos por encima de keep_finished. Caller holds _lock.
+        """
+        finished = sorted(
+            (job for job in self._jobs.values() if job["finished_at"] is not None), key=lambda job: job["finished_at"]
+        )
+        expired = time.time() - self.finished_ttl
+        excess = len(finished) - self.keep_finished
+        for i, job in enumerate(finished):
+            if i < excess or job["finished_at"] < expired:
+                del self._jobs[job["job_id"]]
+
+    def _handle_event(self, job: Dict[str, Any], kind: str, payload):
+        """Aplica un evento de progreso; devuelve (estado, payload) si es el evento final."""
+        if kind != "progress":
+            return kind, payload
+        latency = payload.pop("step_latency", None)
+        if latency is not None:
+            _TRAIN_STEP_SECONDS.merge(*latency)
+        TRAINING_PAIRS.inc(payload["pairs"])
+        with self._lock:
+            job["history"].append(payload)
+            job["progress"] = {
+                "epoch": payload["epoch"],
+                "epochs": job["epochs"],
+                "loss": payload["loss"],
+                "pairs_per_sec": payload["pairs_per_sec"],
+            }
+        return None
+
+
+_runner: TrainingJobRunner | None = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> TrainingJobRunner:
+    """Runner compartido por las rutas REST y JSON-RPC del proceso."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = TrainingJobRunner()
+        return _runner
@@ -1,72 +1,84 @@
 # app/services/training_service.py
-import os
-import json
 from typing import List
-import torch
-import torch.optim as optim
-import torch.nn as nn
 from torch.utils.data import DataLoader
 
 from app.adapters.storage.local_file_storage import LocalFileStorageAdapter
+from app.models.model_registry import ModelRegistry
 from app.utils.config import settings
-from app.models.skipgram_dataset import SkipGramDataset
-from app.models.skipgram_model import SkipGramModel
-from app.models.train_skipgram import train_skipgram
+from app.utils.logger import get_logger
+from app.models.skipgram_dataset import StreamingSkipGramDataset
+from app.models.train_skipgram import train_skipgram, build_training_setup
+
+logger = get_logger(__name__)
 
 class TrainingService:
     """
     Servicio responsable del entrenamiento del modelo SkipGram:
     - Carga textos desde almacenamiento.
-    - Entrena el modelo con PyTorch.
-    - Guarda pesos y vocabulario.
+    - Entrena el modelo con PyTorch (softmax completo, negative sampling o
+      hierarchical softmax según settings.TRAINING_MODE, en lotes de settings.BATCH_SIZE).
+    - Publica pesos y vocabulario como una nueva versión del ModelRegistry
+      (los embedders en ejecución la toman sin reiniciar).
     """
 
-    def __init__(self, storage_adapter: LocalFileStorageAdapter | None = None):
+    def __init__(self, storage_adapter: LocalFileStorageAdapter | None = None, registry: ModelRegistry | None = None):
         self.storage = storage_adapter or LocalFileStorageAdapter()
-        self.model_dir = os.path.dirname(settings.MODEL_PATH)
-        os.makedirs(self.model_dir, exist_ok=True)
+        self.registry = registry or ModelRegistry()
 
-    def train_on_documents(self, doc_ids: List[str], num_epochs: int = 5, lr: float = 0.001):
+    def train_on_documents(
+        self, doc_ids: List[str], num_epochs: int = 5, lr: float = 0.001,
+        mode: str | None = None, batch_size: int | None = None,
+        progress_callback=None, should_stop=None
+    ):
         """
         Entrena el modelo SkipGram usando los documentos almacenados localmente.
+        progress_callback / should_stop se pasan a train_skipgram (progreso por época
+        y cancelación cooperativa; ver TrainingJobRunner).
         """
-        # 1️⃣ Reunir texto de todos los documentos
-        all_sentences = []
-        for doc_id in doc_ids:
-            chunks = self.storage.load(doc_id)
-            all_sentences.extend(chunks)
-        if not all_sentences:
-            # Si la lista está vacía, no hay nada que entrenar.
-            # Debes retornar un mensaje de error y evitar el resto de la función.
-            # Lanza una excepción controlada aquí.
-            # Por ejemplo, puedes usar HTTPException de FastAPI (si está disponible aquí):
-            # from fastapi import HTTPException
-            # raise HTTPException(status_code=400, detail="No se pudo cargar texto de los IDs proporcionados. Dataset vacío.")
-            
-            # O simplemente retorna un error de forma segura:
-            print("⚠️ ERROR: No se encontró texto para los IDs de documentos proporcionados.")
+        # 1️⃣ Reunir texto de todos los documentos (en streaming: el corpus solo existe
+        #    como array de token ids dentro del dataset, nunca como lista de pares)
+        sentences = (chunk for doc_id in doc_ids for chunk in self.storage.load(doc_id))
+        dataset = StreamingSkipGramDataset(
+            sentences,
+            window_size=settings.WINDOW_SIZE,
+            batch_size=batch_size or settings.BATCH_SIZE,
+            subsample=settings.SUBSAMPLE_THRESHOLD,
+            min_count=settings.MIN_COUNT,
+        )
+        if not len(dataset.tokens):
+            # Si no hay texto, no hay nada que entrenar.
+            logger.warning("No se encontró texto para los IDs de documentos proporcionados: %s", doc_ids)
             return { "error": "No hay datos para entrenar." } # Retorna para salir de la función
 
-        # 2️⃣ Crear dataset y modelo
-        dataset = SkipGramDataset(all_sentences)
-        data_loader = DataLoader(dataset, batch_size=1, shuffle=True)
-        model = SkipGramModel(vocab_size=len(dataset.vocab), embedding_dim=settings.EMBEDDING_DIM)
-        optimizer = optim.Adam(model.parameters(), lr=lr)
-        loss_function = nn.CrossEntropyLoss()
+        # 2️⃣ Crear modelo (el dataset ya entrega lotes: batch_size=None)
+        mode = mode or settings.TRAINING_MODE
+        data_loader = DataLoader(dataset, batch_size=None, num_workers=settings.DATALOADER_WORKERS)
+        model, loss_function, optimizer = build_training_setup(
+            mode, len(dataset.vocab), dataset.counts, settings.EMBEDDING_DIM,
+            lr=lr, negatives=settings.NEGATIVE_SAMPLES,
+        )
 
         # 3️⃣ Entrenar modelo
-        train_skipgram(model, loss_function, optimizer, data_loader, num_epochs=num_epochs)
+        history = train_skipgram(
+            model, loss_function, optimizer, data_loader, num_epochs=num_epochs,
+            progress_callback=progress_callback, should_stop=should_stop,
+        )
 
-        # 4️⃣ Guardar pesos y vocabulario
-        torch.save(model.state_dict(), settings.MODEL_PATH)
-        with open(settings.VOCAB_PATH, "w", encoding="utf-8") as f:
-            json.dump(dataset.word2idx, f, indent=2)
+        # 4️⃣ Publicar pesos y vocabulario en una ruta versionada y mover el puntero CURRENT
+        version = self.registry.publish(
+            model.embed.weight.detach().cpu().numpy(),
+            dataset.word2idx,
+            state_dict=model.state_dict(),
+            meta={"mode": mode, "epochs": num_epochs, "vocab_size": len(dataset.vocab)},
+        )
 
-        print(f"✅ Modelo entrenado y guardado en {settings.MODEL_PATH}")
-        print(f"✅ Vocabulario guardado en {settings.VOCAB_PATH}")
+        logger.info("Modelo entrenado y publicado como versión %s", version)
 
         return {
             "vocab_size": len(dataset.vocab),
             "epochs": num_epochs,
-            "model_path": settings.MODEL_PATH,
+            "mode": mode,
+            "history": history,
+            "model_version": version,
+            "model_path": str(self.registry.version_dir(version)),
         }
@@ -1,4 +1,9 @@
-from typing import List
+import time
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+from app.utils.metrics import CHUNKS, STAGE_SECONDS
+
+_CHUNK_SECONDS = STAGE_SECONDS.labels("chunk")
 
 
 def split_into_chunks(
@@ -17,6 +22,7 @@ def split_into_chunks(
     if not text or not text.strip():
         return []
 
+    started = time.perf_counter()
     text = text.strip().replace("\n", " ")
 
     chunks = []
@@ -30,4 +36,123 @@ def split_into_chunks(
             chunks.append(chunk)
         start += max_chunk_size - overlap
 
+    _CHUNK_SECONDS.observe(time.perf_counter() - started)
+    CHUNKS.inc(len(chunks))
     return chunks
+
+
+class StreamingChunker:
+    """
+    Versión incremental de split_into_chunks: recibe el texto en trozos con feed() y
+    devuelve los chunks en cuanto se conocen; finish() devuelve los últimos.
+    La salida es idéntica a split_into_chunks sobre el texto completo, pero solo se
+    mantiene en memoria la ventana actual (max_chunk_size caracteres + el último trozo).
+    """
+
+    def __init__(self, max_chunk_size: int = 500, overlap: int = 50):
+        self.max_chunk_size = max_chunk_size
+        self.step = max_chunk_size - overlap
+        self._buffer = ""
+        self._buffer_start = 0  # posición absoluta del primer carácter de _buffer
+        self._length = 0  # caracteres recibidos (tras el strip inicial)
+        self._text_end = 0  # fin del texto sin espacios finales (equivale al rstrip)
+        self._start = 0  # inicio de la próxima ventana
+        self._started = False
+
+    @property
+    def position(self) -> int:
+        """Posición absoluta (en el texto ya sin espacios iniciales) del próximo carácter."""
+        return self._length
+
+    def feed(self, piece: str) -> List[str]:
+        return [chunk for chunk, _ in self.feed_spans(piece)]
+
+    def finish(self) -> List[str]:
+        return [chunk for chunk, _ in self.finish_spans()]
+
+    def feed_spans(self, piece: str) -> List[Tuple[str, Tuple[int, int]]]:
+        """Como feed(), con la posición absoluta (inicio, fin) de cada chunk."""
+        started = time.perf_counter()
+        if not self._started:
+            piece = piece.lstrip()
+            if not piece:
+                return []
+            self._started = True
+        piece = piece.replace("\n", " ")
+        stripped = len(piece.rstrip())
+        if stripped:
+            self._text_end = self._length + stripped
+        self._length += len(piece)
+        self._buffer += piece
+        chunks = []
+        # una ventana está completa cuando el texto (sin espacios finales) llega a su final
+        while self._start + self.max_chunk_size <= self._text_end:
+            chunks.extend(self._window(self._start + self.max_chunk_size))
+        self._trim()
+        _CHUNK_SECONDS.observe(time.perf_counter() - started)
+        CHUNKS.inc(len(chunks))
+        return chunks
+
+    def finish_spans(self) -> List[Tuple[str, Tuple[int, int]]]:
+        started = time.perf_counter()
+        chunks = []
+        while self._start < self._text_end:
+            chunks.extend(self._window(min(self._start + self.max_chunk_size, self._text_end)))
+        self._trim()
+        _CHUNK_SECONDS.observe(time.perf_counter() - started)
+        CHUNKS.inc(len(chunks))
+        return chunks
+
+    def _window(self, end: int) -> List[Tuple[str, Tuple[int, int]]]:
+        offset = self._buffer_start
+        raw = self._buffer[self._start - offset:end - offset]
+        chunk = raw.strip()
+        start = self._start + len(raw) - len(raw.lstrip())
+        self._start += self.step
+        return [(chunk, (start, start + len(chunk)))] if chunk else []
+
+    def _trim(self) -> None:
+        drop = min(self._start, self._length) - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start += drop
+
+
+def split_into_chunks_stream(
+    pieces: Iterable[str],
+    max_chunk_size: int = 500,
+    overlap: int = 50
+) -> Iterator[str]:
+    """
+    Generador equivalente a split_into_chunks("".join(pieces)) que nunca arma el texto
+    completo: procesa los trozos a medida que llegan (p. ej. bloques decodificados de un upload).
+    """
+    chunker = StreamingChunker(max_chunk_size, overlap)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
+
+
+def split_pages_into_chunks(
+    pages: Iterable[str],
+    max_chunk_size: int = 500,
+    overlap: int = 50
+) -> Iterator[Tuple[str, Tuple[int, int]]]:
+    """
+    Chunks de un documento paginado (p. ej. iter_pages de un PDF) a medida que llegan
+    las páginas, junto con la primera y la última página (desde 1) que abarca cada uno.
+    Los chunks son los de split_into_chunks("\n".join(pages)).
+    """
+    chunker = StreamingChunker(max_chunk_size, overlap)
+    starts: List[int] = []  # posición absoluta donde empieza cada página
+
+    def located(spans):
+        for chunk, (start, end) in spans:
+            yield chunk, (bisect_right(starts, start), bisect_right(starts, max(start, end - 1)))
+
+    for number, page in enumerate(pages):
+        if number:
+            yield from located(chunker.feed_spans("\n"))
+        starts.append(chunker.position)
+        yield from located(chunker.feed_spans(page))
+    yield from located(chunker.finish_spans())
@@ -0,0 +1,33 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from app.utils.config import settings
+
+_cpu_executor: ThreadPoolExecutor | None = None
+_cpu_executor_lock = threading.Lock()
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """
+    Pool acotado (settings.CPU_WORKERS hilos, por defecto uno por núcleo) para el trabajo
+    de CPU que se llama desde el event loop: encode con torch y scoring con numpy.
+    Ambos liberan el GIL, así que los hilos corren en paralelo de verdad.
+    """
+    global _cpu_executor
+    with _cpu_executor_lock:
+        if _cpu_executor is None:
+            _cpu_executor = ThreadPoolExecutor(
+                max_workers=settings.CPU_WORKERS or os.cpu_count() or 1,
+                thread_name_prefix="cpu",
+            )
+        return _cpu_executor
+
+
+async def run_cpu(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Ejecuta func(*args, **kwargs) en el pool de CPU sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), partial(func, *args, **kwargs))
@@ -1,6 +1,5 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
-import torch
 class Settings(BaseSettings):
     BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
     DATA_DIR: Path = BASE_DIR / "data"
@@ -11,24 +10,100 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: str | None = None
+    REDIS_SCAN_BATCH: int = 1000
+    REDIS_INSERT_BATCH: int = 500
+    REDIS_MAX_CONNECTIONS: int = 64  # connection pool size of the async Redis adapter
+    CPU_WORKERS: int = 0  # threads for encode/scoring offloaded from the event loop; 0 = one per core
+
+    VECTOR_DB_BACKEND: str = "redis"  # "redis" | "hnsw" | "mmap"
+    VECTOR_STORAGE_DTYPE: str = "float32"  # "float32" | "float16" | "int8"
+    VECTOR_PQ_SUBSPACES: int = 0  # > 0 enables product quantization of the in-memory index
+    VECTOR_RERANK_FACTOR: int = 4  # candidates re-ranked on the stored vectors = top_k * factor
+    VECTOR_RERANK_FULL_PRECISION: bool = False  # compressed storage also keeps the float32 blob to re-rank on
+    VECTOR_FILTER_FIELDS: list[str] = ["doc_id", "tenant", "tags", "source", "model_version"]  # metadata fields with an inverted index for filtered search
+    VECTOR_FILTER_SCAN_RATIO: float = 0.5  # above this selectivity a filtered search scans everything and masks
+    PQ_TRAIN_SIZE: int = 20000
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 64
+    HNSW_FILTER_EXACT_LIMIT: int = 20000  # filtered searches matching fewer nodes are scored exactly
+    HNSW_INDEX_PATH: Path = DATA_DIR / "index" / "hnsw.npz"
+    HNSW_PERSIST_EVERY: int = 1000
+    HNSW_COMPACTION_THRESHOLD: float = 0.3  # tombstone ratio that triggers a graph rebuild; 0 disables it
+    MMAP_INDEX_DIR: Path = DATA_DIR / "index" / "segments"
+    MMAP_SEGMENT_SIZE: int = 65536
+    MMAP_COMPACTION_INTERVAL: float = 60.0  # seconds; 0 disables the background compactor
+    MMAP_COMPACTION_THRESHOLD: float = 0.3  # dead-row ratio that triggers a segment rewrite
+    MMAP_MANIFEST_EVERY: int = 1000  # inserted/deleted rows between fsynced manifest writes; 1 = every write
+    SEARCH_BATCH_WINDOW_MS: float = 2.0  # how long a search waits for others to share its batch
+    SEARCH_MAX_BATCH: int = 64  # queries per encode/score batch; <= 1 disables micro-batching
+    JSONRPC_MAX_BATCH: int = 100  # requests accepted in one JSON-RPC batch array
+    DELETE_MAX_DOCUMENTS: int = 10000  # documents accepted by one bulk delete request
 
     EMBEDDING_DIM: int = 300
     MODEL_PATH: Path = MODEL_DIR / "skipgram.pt"
     VOCAB_PATH: Path = MODEL_DIR / "skipgram_vocab.json"
+    MODEL_KEEP_VERSIONS: int = 3  # trained versions kept under MODEL_DIR/versions; 0 keeps all
+    MODEL_RELOAD_INTERVAL: float = 2.0  # seconds between embedder checks of MODEL_DIR/CURRENT
     EMBEDDING_SIZE: int = 300
+    ENCODE_THREADS: int = 1  # > 1 splits large encode batches across threads
+    ENCODE_PARALLEL_MIN_BATCH: int = 4096
     WINDOW_SIZE: int = 2
     LEARNING_RATE: float = 0.001
     NUM_EPOCHS: int = 1000
-    BATCH_SIZE: int = 1
+    BATCH_SIZE: int = 1024
+    TRAINING_MODE: str = "negative"  # "softmax" | "negative" | "hierarchical"
+    NEGATIVE_SAMPLES: int = 5
+    SUBSAMPLE_THRESHOLD: float = 1e-3  # frequent-word subsampling; 0 disables it
+    MIN_COUNT: int = 1
+    DATALOADER_WORKERS: int = 0
+    TRAINING_MAX_QUEUED: int = 4  # pending training jobs accepted before rejecting new ones
+    TRAINING_CANCEL_GRACE: float = 10.0  # seconds to wait for a cooperative stop before terminate()
+    TRAINING_KEEP_FINISHED: int = 100  # finished jobs kept for status queries (oldest dropped first)
+    TRAINING_FINISHED_TTL: float = 86400.0  # seconds a finished job stays queryable
 
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 50
+    DOC_STORAGE_FORMAT: str = "compact"  # "compact" (single .doc file) | "legacy" (.txt + .chunks)
+    DOC_COMPRESSION: str = "none"  # "none" | "zstd" (needs the zstandard package)
+    DOC_BLOCK_SIZE: int = 1 << 16  # uncompressed bytes per zstd block of a .doc file
+    DOC_ZSTD_LEVEL: int = 3
+    UPLOAD_READ_BLOCK: int = 1 << 20  # bytes read per step when ingesting an upload as a stream
+    PDF_PARALLEL_MIN_PAGES: int = 1500  # PDFs with at least this many pages are extracted in a process pool (measured crossover)
+    PDF_WORKERS: int = 0  # processes of that shared pool; 0 = one per core
+    PDF_PAGES_PER_TASK: int = 32  # pages extracted per pool task
+    DEDUP_DOCUMENTS: bool = True  # identical uploads (BLAKE2 of the normalized text) reuse the stored doc_id
+    EMBEDDING_CACHE_SIZE: int = 20000  # vectors cached by (chunk hash, model version); 0 disables the cache
+    VECTOR_LEDGER_PATH: Path = DATA_DIR / "index" / "ledger.jsonl"  # model version + chunk hashes of indexed docs
+    REINDEX_CHECKPOINT_PATH: Path = DATA_DIR / "index" / "reindex.json"
+    REINDEX_ON_MODEL_CHANGE: bool = True  # re-embed stale documents when a new model version goes live
+    REINDEX_WATCH_INTERVAL: float = 30.0  # seconds between model version checks; 0 disables the watcher
+    REINDEX_WORKERS: int = 2  # documents re-embedded in parallel
+    REINDEX_MAX_CHUNKS_PER_SEC: float = 2000.0  # throttle protecting serving latency; 0 = unthrottled
+    INGEST_ROOT: Path | None = None  # POST /ingest only reads sources under this directory; unset disables it
+    INGEST_MANIFEST_PATH: Path = DATA_DIR / "index" / "ingest_manifest.jsonl"  # files already ingested (resume)
+    INGEST_CHECKPOINT_PATH: Path = DATA_DIR / "index" / "ingest.json"  # parameters of an unfinished ingest run
+    INGEST_EXTRACT_WORKERS: int = 0  # processes extracting PDF/DOCX pages; 0 = one per core
+    INGEST_ENCODE_THREADS: int = 2  # threads chunking, storing and encoding documents
+    INGEST_QUEUE_SIZE: int = 32  # documents buffered between two stages (backpressure)
+    INGEST_INSERT_BATCH: int = 2000  # chunks of several documents merged into one vector insert
+    LEXICAL_INDEX_ENABLED: bool = True  # BM25 index of the stored chunks (lexical / hybrid search)
+    LEXICAL_INDEX_PATH: Path = DATA_DIR / "index" / "bm25.npz"
+    LEXICAL_PERSIST_EVERY: int = 100  # document adds/removes between snapshots of the BM25 index
+    LEXICAL_DECODED_CACHE: int = 4096  # posting lists kept decoded in memory
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    HYBRID_CANDIDATES: int = 200  # BM25 candidates re-scored with vectors in hybrid search
+    HYBRID_RRF_K: int = 60  # reciprocal rank fusion constant
+
+    WARMUP_ON_STARTUP: bool = True  # build model/vector DB in the background right after boot
 
     LOG_LEVEL: str = "INFO"
     USE_GPU: bool = False
 
     @property
     def DEVICE(self) -> str:
+        import torch  # deferred: only code that actually runs a model should pay for importing torch
         return "cuda" if self.USE_GPU and torch.cuda.is_available() else "cpu"
 
     class Config:
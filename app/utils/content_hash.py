@@ -0,0 +1,48 @@
+import hashlib
+import unicodedata
+from typing import Iterable, Iterator
+
+DIGEST_SIZE = 16  # 128 bits: colisiones despreciables para el volumen de documentos/chunks
+
+
+def normalize_text(text: str) -> str:
+    """
+    Forma canónica del texto para deduplicar: Unicode NFC y espacios colapsados.
+    Dos textos con la misma forma canónica producen los mismos tokens en el embedder.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_hash(text: str) -> str:
+    """BLAKE2b (hex) del texto normalizado."""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=DIGEST_SIZE).hexdigest()
+
+
+class DocumentHasher:
+    """
+    Hash de un documento completo calculado chunk a chunk, sin tenerlo entero en memoria.
+    Como los chunks salen de forma determinista del texto, dos subidas idénticas dan el mismo hash.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+    def update(self, chunk: str) -> None:
+        self._hash.update(normalize_text(chunk).encode("utf-8"))
+        self._hash.update(b"\0")
+
+    def wrap(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Deja pasar los chunks actualizando el hash."""
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def document_hash(chunks: Iterable[str]) -> str:
+    hasher = DocumentHasher()
+    for chunk in chunks:
+        hasher.update(chunk)
+    return hasher.hexdigest()
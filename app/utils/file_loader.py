@@ -1,28 +1,59 @@
-from typing import Union
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Iterator, List, Tuple, Union
 from pathlib import Path
+from app.utils.config import settings
+from app.utils.metrics import PAGES_EXTRACTED, STAGE_SECONDS
 
-from PyPDF2 import PdfReader
-from docx import Document
+PAGED_EXTENSIONS = (".pdf", ".docx")
+_EXTRACT_SECONDS = STAGE_SECONDS.labels("extract")
 
 
 def extract_text_from_file(file_path: Union[str, Path]) -> str:
     """
     Extrae texto de un archivo .txt, .pdf o .docx y devuelve un string con el contenido limpio.
+    Las páginas se unen con un salto de línea (ver iter_pages).
+    """
+    return "\n".join(iter_pages(file_path)).strip()
+
+
+def iter_pages(file_path: Union[str, Path], workers: int | None = None) -> Iterator[str]:
+    """
+    Generador del texto de un archivo página a página, en orden, para que el chunker
+    (split_pages_into_chunks) empiece antes de terminar la lectura.
+    - .pdf: con settings.PDF_PARALLEL_MIN_PAGES páginas o más, las páginas se extraen en el
+      pool de procesos compartido (get_pdf_pool) por tandas de settings.PDF_PAGES_PER_TASK,
+      con un número acotado de tandas en vuelo; workers=1 fuerza la lectura en serie
+    - .docx: una "página" por salto de página del documento
+    - .txt: todo el archivo es una sola página
+    Cada página cuenta en la métrica de extracción solo el tiempo de producirla (no el del consumidor).
     """
     file_path = Path(file_path)
     if not file_path.exists():
         raise FileNotFoundError(f"El archivo no existe: {file_path}")
 
+    start = time.perf_counter()
     ext = file_path.suffix.lower()
     if ext == ".txt":
-        return _read_txt(file_path)
+        pages = iter([_read_txt(file_path)])
     elif ext == ".pdf":
-        return _read_pdf(file_path)
+        pages = _iter_pdf_pages(file_path, workers)
     elif ext == ".docx":
-        return _read_docx(file_path)
+        pages = _iter_docx_pages(file_path)
     else:
         raise ValueError(f"Tipo de archivo no soportado: {ext}")
 
+    for page in pages:
+        _EXTRACT_SECONDS.observe(time.perf_counter() - start)
+        PAGES_EXTRACTED.inc()
+        yield page
+        start = time.perf_counter()
+
 
 # ---------------------------------------------------------------
 # Lectores individuales por tipo
@@ -34,18 +65,117 @@ def _read_txt(path: Path) -> str:
         return f.read().strip()
 
 
-def _read_pdf(path: Path) -> str:
-    """Lee texto de un archivo PDF usando PyPDF2."""
-    text = ""
+_pdf_pool: ProcessPoolExecutor | None = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido (settings.PDF_WORKERS, por defecto uno por núcleo) para
+    extraer PDFs grandes, creado la primera vez que se usa: los procesos se arrancan una
+    sola vez y varias extracciones a la vez no multiplican los procesos.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: el servidor tiene hilos, y un fork los copiaría a medio estado
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_WORKERS or os.cpu_count() or 1, mp_context=get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Descarta un pool roto (un proceso murió) para que el próximo uso cree otro."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+_worker_pdfs: "OrderedDict[Tuple[str, int, int], Any]" = OrderedDict()  # PdfReaders abiertos en este proceso
+_WORKER_OPEN_PDFS = 4
+
+
+def _pdf_page_range(path: str, version: Tuple[int, int], start: int, stop: int) -> List[str]:
+    """
+    Texto de las páginas [start, stop) de un PDF (se ejecuta en el pool). Cada proceso
+    conserva abiertos los últimos PDFs leídos, identificados por ruta, tamaño y fecha.
+    """
+    key = (path, *version)
+    reader = _worker_pdfs.get(key)
+    if reader is None:
+        from PyPDF2 import PdfReader  # import diferido: solo se paga al leer un PDF
+
+        reader = _worker_pdfs[key] = PdfReader(path)
+        while len(_worker_pdfs) > _WORKER_OPEN_PDFS:
+            _worker_pdfs.popitem(last=False)
+    else:
+        _worker_pdfs.move_to_end(key)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _iter_pdf_pages(path: Path, workers: int | None) -> Iterator[str]:
+    """Lee las páginas de un PDF usando PyPDF2, en paralelo si el archivo es grande."""
+    from PyPDF2 import PdfReader  # import diferido: solo se paga al leer un PDF
+
+    workers = workers or settings.PDF_WORKERS or os.cpu_count() or 1
     with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
         reader = PdfReader(f)
-        for page in reader.pages:
-            text += page.extract_text() or ""
-    return text.strip()
+        total = len(reader.pages)
+        if workers <= 1 or total < settings.PDF_PARALLEL_MIN_PAGES:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+
+    pool = get_pdf_pool()
+    step = max(1, settings.PDF_PAGES_PER_TASK)
+    ranges = iter(range(0, total, step))
+    args = (str(path), (st.st_size, st.st_mtime_ns))
+    pending = deque()
+    try:
+        for _ in range(2 * workers):
+            start = next(ranges, None)
+            if start is None:
+                break
+            pending.append(pool.submit(_pdf_page_range, *args, start, min(start + step, total)))
+        while pending:
+            pages = pending.popleft().result()
+            start = next(ranges, None)
+            if start is not None:
+                pending.append(pool.submit(_pdf_page_range, *args, start, min(start + step, total)))
+            yield from pages
+    except BrokenProcessPool:
+        _discard_pdf_pool(pool)
+        raise
+    finally:
+        # consumidor que abandona el generador: no dejar tandas ocupando el pool compartido
+        for future in pending:
+            future.cancel()
 
 
-def _read_docx(path: Path) -> str:
-    """Lee texto de un archivo Word (.docx)."""
+def _iter_docx_pages(path: Path) -> Iterator[str]:
+    """
+    Lee un archivo Word (.docx) párrafo a párrafo, cortando en los saltos de página: los que
+    Word registró al maquetar (lastRenderedPageBreak, la página empieza en ese párrafo) o,
+    si el archivo no los tiene, los saltos manuales (la página siguiente empieza tras el párrafo).
+    """
+    from docx import Document  # import diferido: solo se paga al leer un .docx
+    from docx.oxml.ns import qn
+
     doc = Document(path)
-    text = "\n".join(p.text for p in doc.paragraphs)
-    return text.strip()
+    rendered = next(doc.element.body.iter(qn("w:lastRenderedPageBreak")), None) is not None
+    lines: List[str] = []
+    for paragraph in doc.paragraphs:
+        element = paragraph._p
+        if rendered and lines and next(element.iter(qn("w:lastRenderedPageBreak")), None) is not None:
+            yield "\n".join(lines)
+            lines = []
+        lines.append(paragraph.text)
+        if not rendered and any(br.get(qn("w:type")) == "page" for br in element.iter(qn("w:br"))):
+            yield "\n".join(lines)
+            lines = []
+    if lines:
+        yield "\n".join(lines)
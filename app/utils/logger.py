@@ -2,18 +2,18 @@ import logging
 import os
 from datetime import datetime
 
+LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-def get_logger(name: str = "app") -> logging.Logger:
-    """
-    Devuelve un logger configurado para toda la aplicación.
-    Crea automáticamente un archivo de log por día en la carpeta /logs.
-
-    Args:
-        name (str): Nombre del módulo o componente que usa el logger.
 
-    Returns:
-        logging.Logger: Instancia lista para usar.
+def setup_logging(level: int = logging.INFO) -> None:
     """
+    Configura el logging del proceso: consola y un archivo por día en la carpeta /logs.
+    Se llama una sola vez al arrancar cada proceso (main.py, el proceso hijo de
+    entrenamiento); si el root ya tiene handlers no hace nada.
+    """
+    if logging.getLogger().handlers:
+        return
 
     # Crear carpeta de logs si no existe
     os.makedirs("logs", exist_ok=True)
@@ -21,23 +21,26 @@ def get_logger(name: str = "app") -> logging.Logger:
     # Nombre del archivo de log basado en la fecha actual
     log_filename = f"logs/app_{datetime.now().strftime('%Y-%m-%d')}.log"
 
-    # Configuración del formato de salida
-    log_format = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
-
-    # Configurar logging básico (solo una vez)
     logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        datefmt=date_format,
+        level=level,
+        format=LOG_FORMAT,
+        datefmt=DATE_FORMAT,
         handlers=[
             logging.FileHandler(log_filename, encoding="utf-8"),
             logging.StreamHandler()  # También muestra los logs en consola
         ]
     )
 
-    # Crear logger con nombre del módulo
-    logger = logging.getLogger(name)
-    logger.propagate = False  # Evita duplicados si se llama varias veces
 
-    return logger
+def get_logger(name: str = "app") -> logging.Logger:
+    """
+    Devuelve el logger de un módulo o componente. No configura nada: sus mensajes
+    propagan a los handlers del root que instala setup_logging al arrancar.
+
+    Args:
+        name (str): Nombre del módulo o componente que usa el logger.
+
+    Returns:
+        logging.Logger: Instancia lista para usar.
+    """
+    return logging.getLogger(name)
@@ -0,0 +1,198 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# Límites (segundos) de los histogramas de latencia: de 50 µs (un encode de una consulta)
+# a un minuto (una época de entrenamiento o la recarga completa de un índice grande)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def _samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{labels} {_number(self.value)}"]
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # el último es +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def time(self) -> _Timer:
+        """Context manager que observa la duración del bloque."""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(observaciones por bucket, suma), p. ej. para enviarlas desde un proceso hijo."""
+        with self._lock:
+            return list(self._counts), self._sum
+
+    def merge(self, counts: List[int], total: float) -> None:
+        """Suma observaciones hechas en otro proceso (ver snapshot)."""
+        with self._lock:
+            for i, count in enumerate(counts):
+                self._counts[i] += count
+            self._sum += total
+
+    def _samples(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self._bounds + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            lines.append(f"{name}_bucket{_with_label(labels, 'le', le)} {cumulative}")
+        lines.append(f"{name}_sum{labels} {_number(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Metric:
+    """
+    Familia de métricas (un nombre, varias series por valores de etiqueta).
+    labels(*values) devuelve la serie, creada la primera vez; conviene resolverla una vez
+    a nivel de módulo y usarla en el camino caliente. Sin etiquetas, la familia se usa
+    directamente (inc / observe / time).
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Tuple[str, ...], factory):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._default = None if labelnames else self._children.setdefault((), factory())
+
+    def labels(self, *values: str):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        (self._default or self.labels()).inc(amount)
+
+    def observe(self, value: float) -> None:
+        (self._default or self.labels()).observe(value)
+
+    def time(self) -> _Timer:
+        return (self._default or self.labels()).time()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values))
+            lines.extend(child._samples(self.name, f"{{{labels}}}" if labels else ""))
+        return lines
+
+
+_REGISTRY: List[_Metric] = []
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> _Metric:
+    """Registra un contador (el nombre debe terminar en _total)."""
+    metric = _Metric("counter", name, documentation, tuple(labelnames), _CounterChild)
+    _REGISTRY.append(metric)
+    return metric
+
+
+def histogram(
+    name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS
+) -> _Metric:
+    """Registra un histograma con los límites `buckets` (ordenados, sin +Inf)."""
+    bounds = tuple(sorted(buckets))
+    metric = _Metric("histogram", name, documentation, tuple(labelnames), lambda: _HistogramChild(bounds))
+    _REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    """Todas las métricas registradas en el formato de texto de Prometheus (0.0.4)."""
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) or abs(value) >= 1e15 else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _with_label(labels: str, name: str, value: str) -> str:
+    extra = f'{name}="{value}"'
+    return f"{{{labels[1:-1]},{extra}}}" if labels else f"{{{extra}}}"
+
+
+# ---------------------------------------------------------------
+# Métricas del servicio
+# ---------------------------------------------------------------
+# Las tasas (chunks/s, vectores/s...) se obtienen en Prometheus con rate() sobre los contadores.
+
+STAGE_SECONDS = histogram(
+    "mcp_stage_duration_seconds",
+    "Latency of a pipeline stage (tokenize, encode, score, topk, lexical, chunk, extract, train_step).",
+    ("stage",),
+)
+REDIS_SECONDS = histogram("mcp_redis_roundtrip_seconds", "Latency of a Redis round trip by operation.", ("op",))
+STORAGE_SECONDS = histogram("mcp_storage_io_seconds", "Latency of document storage I/O by operation.", ("op",))
+
+CHUNKS = counter("mcp_chunks_total", "Chunks produced by the chunker.")
+PAGES_EXTRACTED = counter("mcp_pages_extracted_total", "Pages (or whole text files) extracted from documents.")
+TEXTS_ENCODED = counter("mcp_texts_encoded_total", "Texts encoded into vectors by the embedder.")
+VECTORS_SCANNED = counter("mcp_vectors_scanned_total", "Vector similarity scores computed by searches (rows x queries).")
+VECTORS_INSERTED = counter("mcp_vectors_inserted_total", "Vectors written to the vector DB.")
+TRAINING_PAIRS = counter("mcp_training_pairs_total", "Skip-gram (center, context) pairs trained on.")
+CACHE_HITS = counter("mcp_cache_hits_total", "Cache lookups served from the cache.", ("cache",))
+CACHE_MISSES = counter("mcp_cache_misses_total", "Cache lookups that missed.", ("cache",))
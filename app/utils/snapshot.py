@@ -0,0 +1,25 @@
+import json
+import os
+from typing import Any, Dict, Tuple
+import numpy as np
+
+
+def save_snapshot(path: str, header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Escribe de forma atómica un snapshot .npz: los arrays tal cual y `header` (ids,
+    metadatos, parámetros) como JSON. No usa pickle, así que leerlo con load_snapshot
+    nunca ejecuta código.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    encoded = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+    with open(tmp_path, "wb") as f:  # con un fichero abierto, numpy no añade la extensión .npz
+        np.savez(f, header=encoded, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """(header, arrays) de un snapshot escrito con save_snapshot."""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    return json.loads(arrays.pop("header").tobytes()), arrays
@@ -0,0 +1,55 @@
+"""
+Latency of metadata-filtered search on InMemoryVectorIndex as the filter's selectivity varies.
+Vectors are spread over --docs documents; filtering on k of them matches k/docs of the corpus.
+
+Usage:
+    python -m benchmarks.filtered_search --n 200000 --dim 300 --docs 1000
+"""
+import argparse
+import time
+import numpy as np
+
+from app.adapters.vector_db.in_memory_index import InMemoryVectorIndex
+from benchmarks.hnsw_recall import clustered_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = clustered_vectors(args.n, args.dim, args.clusters, rng)
+    queries = clustered_vectors(args.queries, args.dim, args.clusters, rng)
+    ids = [str(i) for i in range(args.n)]
+    metas = [{"doc_id": f"doc{i % args.docs}", "tenant": f"t{i % 10}"} for i in range(args.n)]
+
+    index = InMemoryVectorIndex(args.dim)
+    index.add(ids, data, metas)
+
+    def timed(filters):
+        start = time.perf_counter()
+        for q in queries:
+            index.search(q, args.top_k, filters=filters)
+        return (time.perf_counter() - start) * 1000 / args.queries
+
+    print(f"{'filter':<28} {'matches':>9} {'ms/query':>9}")
+    print(f"{'none':<28} {args.n:>9} {timed(None):>9.3f}")
+    for k in (1, 10, 100):
+        if k > args.docs:
+            break
+        filters = {"doc_id": [f"doc{d}" for d in range(k)]}
+        print(f"{f'doc_id IN ({k} docs)':<28} {len(index.filter_rows(filters)):>9} {timed(filters):>9.3f}")
+    filters = {"tenant": "t0"}
+    print(f"{'tenant = t0':<28} {len(index.filter_rows(filters)):>9} {timed(filters):>9.3f}")
+    filters = {"tenant": [f"t{t}" for t in range(8)]}
+    print(f"{'tenant IN (8 of 10)':<28} {len(index.filter_rows(filters)):>9} {timed(filters):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Recall-vs-latency benchmark: HNSWVectorDBAdapter against exact brute-force search.
+
+Usage:
+    python -m benchmarks.hnsw_recall --n 20000 --dim 300 --queries 200 --ef 16 32 64 128 256 512
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from app.adapters.vector_db.hnsw_db import HNSWVectorDBAdapter
+from app.adapters.vector_db.in_memory_index import InMemoryVectorIndex
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian blobs: closer to real embeddings than uniform noise."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assign = rng.integers(0, clusters, size=n)
+    return centers[assign] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--M", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256, 512])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = clustered_vectors(args.n, args.dim, args.clusters, rng)
+    queries = clustered_vectors(args.queries, args.dim, args.clusters, rng)
+    ids = [str(i) for i in range(args.n)]
+
+    exact = InMemoryVectorIndex(args.dim)
+    exact.add(ids, data, [{} for _ in ids])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hnsw = HNSWVectorDBAdapter(
+            dim=args.dim, M=args.M, ef_construction=args.ef_construction,
+            index_path=os.path.join(tmp, "hnsw.npz"),
+        )
+        hnsw.persist_every = 0
+        start = time.perf_counter()
+        hnsw.insert_many(ids, data, [{} for _ in ids])
+        build_s = time.perf_counter() - start
+        print(f"build: {args.n} vectors in {build_s:.1f}s ({args.n / build_s:.0f} inserts/s)")
+
+        start = time.perf_counter()
+        truth = [{r["id"] for r in exact.search(q, args.top_k)} for q in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+        print(f"exact:  recall@{args.top_k}=1.000  latency={exact_ms:.3f} ms/query")
+
+        for ef in args.ef:
+            hnsw.ef_search = ef
+            hits = 0
+            start = time.perf_counter()
+            for q, expected in zip(queries, truth):
+                hits += len({r["id"] for r in hnsw.query(q, args.top_k)} & expected)
+            hnsw_ms = (time.perf_counter() - start) * 1000 / args.queries
+            recall = hits / (args.queries * args.top_k)
+            print(f"ef={ef:<4}  recall@{args.top_k}={recall:.3f}  latency={hnsw_ms:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Microbenchmarks for the hot paths, with JSON results and a regression check between runs.
+
+`run` times, on synthetic Zipf-distributed corpora generated in a temp directory:
+    chunking.split_into_chunks      one document of `doc_chunks` chunks
+    encode.batch / encode.query     TorchSkipGramEmbedderAdapter.encode on a random model of `vocab` words
+    redis.insert / redis.query      RedisVectorDBAdapter.insert_many / query on `chunks` vectors
+    redis.load                      bulk reload of the in-memory mirror by a fresh adapter
+    dataset.skipgram / .streaming   SkipGramDataset / StreamingSkipGramDataset construction
+    train.<mode>                    train_skipgram epochs (--epochs) per training mode
+
+Redis runs against an in-process fakeredis server (pip install fakeredis), so nothing has to be
+listening; without fakeredis the redis.* benchmarks are recorded as skipped. Scales set the
+index size and vocabulary (small: 1k chunks / 10k words, medium: 100k / 100k, large: 1M / 500k);
+the other workloads are capped so a run stays within memory.
+
+`compare` matches two result files by benchmark name and flags every median that got slower
+by more than --threshold (exit status 1 if any did, so it can gate CI).
+
+Usage:
+    python -m benchmarks.hot_paths run --scale small --out bench-before.json
+    python -m benchmarks.hot_paths run --scale medium --only redis encode --out bench-after.json
+    python -m benchmarks.hot_paths compare bench-before.json bench-after.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from app.adapters.embedder.torch_embedder import TorchSkipGramEmbedderAdapter
+from app.adapters.vector_db.redis_db import RedisVectorDBAdapter
+from app.models.model_registry import ModelRegistry
+from app.models.skipgram_dataset import SkipGramDataset, StreamingSkipGramDataset
+from app.models.train_skipgram import build_training_setup, train_skipgram
+from app.utils.chunk_splitter import split_into_chunks
+from app.utils.config import settings
+
+WORDS_PER_CHUNK = 70  # ~500 characters of "w<rank>" words, the default chunk size
+QUERY_WORDS = 12
+GROUPS = ("chunking", "encode", "redis", "dataset", "train")
+
+
+@dataclass(frozen=True)
+class Scale:
+    chunks: int  # vectors in the Redis index
+    vocab: int  # model vocabulary and corpus word pool
+    queries: int  # redis.query / encode.query samples
+    encode_batches: int  # encode.batch samples, of `encode_batch` texts each
+    doc_chunks: int  # chunks in the split_into_chunks document
+    dataset_sentences: int  # SkipGramDataset keeps every pair in a list: kept small
+    train_sentences: int  # training corpus, one sample per epoch
+
+
+SCALES = {
+    "small": Scale(1_000, 10_000, 200, 20, 1_000, 1_000, 500),
+    "medium": Scale(100_000, 100_000, 500, 50, 10_000, 5_000, 5_000),
+    "large": Scale(1_000_000, 500_000, 500, 50, 50_000, 20_000, 20_000),
+}
+
+
+# ----------------------------------------------------------------------
+# Synthetic corpus
+# ----------------------------------------------------------------------
+class ZipfCorpus:
+    """Texts of "w<rank>" words whose frequencies follow Zipf's law (exponent `a`) over `vocab` ranks."""
+
+    def __init__(self, vocab: int, seed: int = 0, a: float = 1.1):
+        self.words = np.array([f"w{i}" for i in range(vocab)], dtype=object)
+        weights = 1.0 / np.arange(1, vocab + 1) ** a
+        self.cdf = np.cumsum(weights / weights.sum())
+        self.rng = np.random.default_rng(seed)
+
+    def texts(self, n: int, words: int = WORDS_PER_CHUNK) -> List[str]:
+        ids = np.minimum(np.searchsorted(self.cdf, self.rng.random(n * words)), len(self.words) - 1)
+        tokens = self.words[ids].reshape(n, words)
+        return [" ".join(row) for row in tokens]
+
+
+def chunk_metadata(start: int, end: int, chunks_per_doc: int = 50) -> List[Dict]:
+    """Same fields EmbeddingService stores with every chunk."""
+    return [
+        {"doc_id": f"doc{i // chunks_per_doc}", "chunk_index": i % chunks_per_doc,
+         "model_version": "bench", "content_hash": f"{i:064x}"}
+        for i in range(start, end)
+    ]
+
+
+# ----------------------------------------------------------------------
+# Timing
+# ----------------------------------------------------------------------
+def summarize(samples: List[float], work: float | None = None, unit: str | None = None) -> Dict:
+    """Latency stats of the samples (seconds) and, given the work they did, its throughput."""
+    arr = np.asarray(samples)
+    result = {
+        "samples": len(samples),
+        "median": float(np.median(arr)),
+        "mean": float(arr.mean()),
+        "min": float(arr.min()),
+        "p95": float(np.percentile(arr, 95)),
+        "total": float(arr.sum()),
+    }
+    if work is not None:
+        result["throughput"] = work / result["total"] if result["total"] > 0 else 0.0
+        result["throughput_unit"] = unit
+    return result
+
+
+def repeat(fn: Callable[[], object], times: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(times):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# ----------------------------------------------------------------------
+# Benchmarks (each returns {name: summary})
+# ----------------------------------------------------------------------
+def bench_chunking(scale: Scale, corpus: ZipfCorpus, args) -> Dict:
+    text = " ".join(corpus.texts(scale.doc_chunks))
+    produced = len(split_into_chunks(text))
+    samples = repeat(lambda: split_into_chunks(text), args.repeat)
+    return {"chunking.split_into_chunks": summarize(samples, produced * len(samples), "chunks/s")}
+
+
+def bench_encode(scale: Scale, corpus: ZipfCorpus, args) -> Dict:
+    registry = ModelRegistry(os.path.join(args.workdir, "models"))
+    rng = np.random.default_rng(args.seed)
+    matrix = rng.standard_normal((scale.vocab, settings.EMBEDDING_DIM)).astype(np.float32)
+    registry.publish(matrix, {str(w): i for i, w in enumerate(corpus.words)})
+    del matrix
+    embedder = TorchSkipGramEmbedderAdapter(registry=registry)
+
+    batches = [corpus.texts(args.encode_batch) for _ in range(scale.encode_batches)]
+    queries = corpus.texts(scale.queries, QUERY_WORDS)
+    embedder.encode(batches[0])  # warm-up
+    batch_samples = []
+    for batch in batches:
+        start = time.perf_counter()
+        embedder.encode(batch)
+        batch_samples.append(time.perf_counter() - start)
+    query_samples = []
+    for query in queries:
+        start = time.perf_counter()
+        embedder.encode([query])
+        query_samples.append(time.perf_counter() - start)
+    return {
+        "encode.batch": summarize(batch_samples, args.encode_batch * len(batches), "texts/s"),
+        "encode.query": summarize(query_samples, len(queries), "queries/s"),
+    }
+
+
+def bench_redis(scale: Scale, corpus: ZipfCorpus, args) -> Dict:
+    try:
+        import fakeredis
+    except ImportError:
+        return {name: {"skipped": "requires the 'fakeredis' package"} for name in ("redis.insert", "redis.query", "redis.load")}
+
+    server = fakeredis.FakeServer()
+
+    def adapter() -> RedisVectorDBAdapter:
+        db = RedisVectorDBAdapter()
+        db.client = fakeredis.FakeRedis(server=server)
+        return db
+
+    dim = settings.EMBEDDING_DIM
+    rng = np.random.default_rng(args.seed)
+    db = adapter()
+    insert_samples = []
+    for start in range(0, scale.chunks, args.insert_batch):
+        end = min(start + args.insert_batch, scale.chunks)
+        ids = [f"doc{i // 50}_chunk_{i % 50}" for i in range(start, end)]
+        vectors = rng.standard_normal((end - start, dim)).astype(np.float32)
+        metas = chunk_metadata(start, end)
+        t0 = time.perf_counter()
+        db.insert_many(ids, vectors, metas)
+        insert_samples.append(time.perf_counter() - t0)
+
+    queries = rng.standard_normal((scale.queries, dim)).astype(np.float32)
+    db.query(queries[0], top_k=args.top_k)  # warm-up
+    query_samples = []
+    for vector in queries:
+        t0 = time.perf_counter()
+        db.query(vector, top_k=args.top_k)
+        query_samples.append(time.perf_counter() - t0)
+
+    load_samples = repeat(lambda: adapter().load(), max(1, args.repeat // 2), warmup=0)
+    return {
+        "redis.insert": summarize(insert_samples, scale.chunks, "vectors/s"),
+        "redis.query": summarize(query_samples, len(queries), "queries/s"),
+        "redis.load": summarize(load_samples, scale.chunks * len(load_samples), "vectors/s"),
+    }
+
+
+def bench_dataset(scale: Scale, corpus: ZipfCorpus, args) -> Dict:
+    sentences = corpus.texts(scale.dataset_sentences)
+    pairs = len(SkipGramDataset(sentences, window_size=settings.WINDOW_SIZE))
+    times = max(1, args.repeat // 2)
+    listed = repeat(lambda: SkipGramDataset(sentences, window_size=settings.WINDOW_SIZE), times, warmup=0)
+    streaming = repeat(
+        lambda: StreamingSkipGramDataset(sentences, window_size=settings.WINDOW_SIZE, batch_size=settings.BATCH_SIZE),
+        times, warmup=0,
+    )
+    tokens = scale.dataset_sentences * WORDS_PER_CHUNK
+    return {
+        "dataset.skipgram": summarize(listed, pairs * len(listed), "pairs/s"),
+        "dataset.streaming": summarize(streaming, tokens * len(streaming), "tokens/s"),
+    }
+
+
+def bench_train(scale: Scale, corpus: ZipfCorpus, args) -> Dict:
+    torch.manual_seed(args.seed)
+    dataset = StreamingSkipGramDataset(
+        corpus.texts(scale.train_sentences), window_size=settings.WINDOW_SIZE, batch_size=settings.BATCH_SIZE,
+        subsample=settings.SUBSAMPLE_THRESHOLD, min_count=settings.MIN_COUNT, seed=args.seed,
+    )
+    loader = DataLoader(dataset, batch_size=None)
+    results = {}
+    for mode in args.train_modes:
+        model, loss_function, optimizer = build_training_setup(
+            mode, len(dataset.vocab), dataset.counts, settings.EMBEDDING_DIM, negatives=settings.NEGATIVE_SAMPLES,
+        )
+        history = train_skipgram(model, loss_function, optimizer, loader, num_epochs=args.epochs)
+        samples = [stats["pairs"] / stats["pairs_per_sec"] for stats in history if stats["pairs_per_sec"] > 0]
+        results[f"train.{mode}"] = summarize(samples, sum(stats["pairs"] for stats in history), "pairs/s")
+    return results
+
+
+BENCHMARKS = {
+    "chunking": bench_chunking,
+    "encode": bench_encode,
+    "redis": bench_redis,
+    "dataset": bench_dataset,
+    "train": bench_train,
+}
+
+
+# ----------------------------------------------------------------------
+# run / compare
+# ----------------------------------------------------------------------
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "embedding_dim": settings.EMBEDDING_DIM,
+        "vector_storage_dtype": settings.VECTOR_STORAGE_DTYPE,
+    }
+
+
+def run(args) -> int:
+    scale = SCALES[args.scale]
+    if args.chunks:
+        scale = replace(scale, chunks=args.chunks)
+    if args.vocab:
+        scale = replace(scale, vocab=args.vocab)
+    args.workdir = tempfile.mkdtemp(prefix="hot-paths-")
+    report = {"scale": args.scale, "params": asdict(scale), "environment": environment(), "results": {}}
+    try:
+        for group in args.only or GROUPS:
+            print(f"[{group}] ...", flush=True)
+            corpus = ZipfCorpus(scale.vocab, seed=args.seed)
+            for name, result in BENCHMARKS[group](scale, corpus, args).items():
+                report["results"][name] = result
+                print(f"  {format_result(name, result)}", flush=True)
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.out}")
+    return 0
+
+
+def format_result(name: str, result: Dict) -> str:
+    if "skipped" in result:
+        return f"{name:<28} skipped: {result['skipped']}"
+    line = f"{name:<28} median {result['median'] * 1e3:>10.3f} ms  p95 {result['p95'] * 1e3:>10.3f} ms"
+    if "throughput" in result:
+        line += f"  {result['throughput']:>12,.0f} {result['throughput_unit']}"
+    return line
+
+
+def compare(args) -> int:
+    with open(args.baseline, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        new = json.load(f)
+    old_params, new_params = old.get("params", {}), new.get("params", {})
+    differing = sorted(k for k in set(old_params) | set(new_params) if old_params.get(k) != new_params.get(k))
+    if differing:
+        print("warning: runs used different parameters: " + ", ".join(
+            f"{k} {old_params.get(k)} -> {new_params.get(k)}" for k in differing
+        ))
+
+    regressions = 0
+    print(f"{'benchmark':<28} {'baseline ms':>12} {'candidate ms':>13} {'change':>8}")
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        before, after = old["results"].get(name), new["results"].get(name)
+        if not before or not after or "skipped" in before or "skipped" in after:
+            print(f"{name:<28} {'(not in both runs)':>35}")
+            continue
+        change = after["median"] / before["median"] - 1 if before["median"] > 0 else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{name:<28} {before['median'] * 1e3:>12.3f} {after['median'] * 1e3:>13.3f} {change:>+8.1%}{flag}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the benchmarks and optionally write a JSON report")
+    run_parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    run_parser.add_argument("--chunks", type=int, default=0, help="override the scale's index size")
+    run_parser.add_argument("--vocab", type=int, default=0, help="override the scale's vocabulary size")
+    run_parser.add_argument("--only", nargs="+", choices=GROUPS, help="benchmark groups to run (default: all)")
+    run_parser.add_argument("--out", help="JSON report path")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--encode-batch", type=int, default=256)
+    run_parser.add_argument("--insert-batch", type=int, default=settings.INGEST_INSERT_BATCH)
+    run_parser.add_argument("--top-k", type=int, default=10)
+    run_parser.add_argument("--train-modes", nargs="+", default=["negative", "hierarchical"])
+    run_parser.add_argument("--epochs", type=int, default=2)
+    run_parser.add_argument("--seed", type=int, default=0)
+
+    compare_parser = sub.add_parser("compare", help="flag regressions between two JSON reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown of the median to flag")
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Build time, size and query latency of the BM25 lexical index on a synthetic Zipf corpus.
+
+Usage:
+    python -m benchmarks.lexical_search --chunks 100000 --vocab 50000
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+
+from app.adapters.lexical.bm25_index import BM25Index
+
+
+def zipf_chunks(n: int, vocab: int, length: int, rng: np.random.Generator):
+    """n chunks of ~length words drawn from a Zipf(1.1) vocabulary of `vocab` terms."""
+    ranks = np.minimum(rng.zipf(1.1, size=n * length), vocab) - 1
+    words = [f"w{r}" for r in range(vocab)]
+    return [" ".join(words[r] for r in ranks[i * length:(i + 1) * length]) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--vocab", type=int, default=50000)
+    parser.add_argument("--length", type=int, default=80, help="words per chunk")
+    parser.add_argument("--per-doc", type=int, default=20, help="chunks per document")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunks = zipf_chunks(args.chunks, args.vocab, args.length, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BM25Index(index_path=f"{tmp}/bm25.npz")
+        index.persist_every = 0
+        start = time.perf_counter()
+        for d, first in enumerate(range(0, len(chunks), args.per_doc)):
+            index.add_document(f"doc{d}", chunks[first:first + args.per_doc])
+        build = time.perf_counter() - start
+        stats = index.stats()
+        postings = sum(len(c.split()) for c in chunks)
+        print(f"indexed {stats['chunks']} chunks / {stats['terms']} terms in {build:.2f}s "
+              f"({stats['chunks'] / build:.0f} chunks/s), {stats['postings_bytes'] / 2**20:.1f} MiB postings "
+              f"({stats['postings_bytes'] / postings:.2f} B/token)")
+
+        # rare (mid-Zipf) terms, as keyword lookups of codes and names are
+        terms = [f"w{r}" for r in rng.integers(100, args.vocab, size=(args.queries, 2)).ravel()]
+        queries = [" ".join(terms[i:i + 2]) for i in range(0, len(terms), 2)]
+        common = [f"w{a} w{b}" for a, b in rng.integers(0, 20, size=(args.queries, 2))]
+        for name, batch in (("rare terms", queries), ("frequent terms", common)):
+            for q in batch[:10]:
+                index.search(q, args.top_k)  # warm the decoded-postings cache
+            start = time.perf_counter()
+            for q in batch:
+                index.search(q, args.top_k)
+            us = (time.perf_counter() - start) * 1e6 / len(batch)
+            print(f"{name:<15} {us:>9.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Memory / recall / latency of the compressed InMemoryVectorIndex codecs against exact float32 search.
+
+Usage:
+    python -m benchmarks.quantization_recall --n 100000 --dim 300 --pq 30 60
+"""
+import argparse
+import time
+import numpy as np
+
+from app.adapters.vector_db.in_memory_index import InMemoryVectorIndex
+from app.adapters.vector_db.quantization import build_codec
+from benchmarks.hnsw_recall import clustered_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--pq", type=int, nargs="*", default=[30, 60], help="PQ subspace counts to try")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = clustered_vectors(args.n, args.dim, args.clusters, rng)
+    queries = clustered_vectors(args.queries, args.dim, args.clusters, rng)
+    ids = [str(i) for i in range(args.n)]
+    metas = [{} for _ in ids]
+
+    def full_precision(batch_ids):
+        return data[[int(i) for i in batch_ids]]
+
+    exact = InMemoryVectorIndex(args.dim)
+    exact.add(ids, data, metas)
+    truth = [{r["id"] for r in exact.search(q, args.top_k)} for q in queries]
+    base_bytes = exact.nbytes
+
+    configs = [("float32", 0), ("float16", 0), ("int8", 0)] + [("float32", m) for m in args.pq]
+    print(f"{'codec':<10} {'bytes/vec':>9} {'ratio':>6} {'recall':>7} {'+rerank':>8} {'ms/query':>9}")
+    for dtype, pq in configs:
+        index = InMemoryVectorIndex(args.dim, codec=build_codec(dtype, args.dim, pq))
+        index.add(ids, data, metas)
+        name = f"pq{pq}" if pq else dtype
+
+        approx_hits = rerank_hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            found = index.search(q, args.top_k, rerank=full_precision, rerank_factor=args.rerank_factor)
+            rerank_hits += len({r["id"] for r in found} & expected)
+        ms = (time.perf_counter() - start) * 1000 / args.queries
+        for q, expected in zip(queries, truth):
+            approx_hits += len({r["id"] for r in index.search(q, args.top_k)} & expected)
+
+        total = args.queries * args.top_k
+        print(
+            f"{name:<10} {index.nbytes / args.n:>9.0f} {base_bytes / index.nbytes:>5.1f}x "
+            f"{approx_hits / total:>7.3f} {rerank_hits / total:>8.3f} {ms:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Concurrent search throughput with and without QueryBatcher micro-batching.
+
+Builds a throwaway mmap segment store and a random model in a temp directory, then runs
+`--clients` concurrent clients issuing `--requests` searches each through the async path.
+
+Usage:
+    python -m benchmarks.search_batching --n 200000 --clients 64 --window-ms 2 --max-batch 64
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import numpy as np
+
+from app.adapters.embedder.torch_embedder import TorchSkipGramEmbedderAdapter
+from app.adapters.vector_db.factory import build_async_vector_db
+from app.adapters.vector_db.mmap_db import MmapSegmentVectorDBAdapter
+from app.models.model_registry import ModelRegistry
+from app.services.embedding.query_batcher import QueryBatcher
+from app.utils.concurrency import run_cpu
+
+
+async def run_clients(search, queries, clients: int, requests: int) -> float:
+    async def client(c: int):
+        for r in range(requests):
+            await search(queries[(c * requests + r) % len(queries)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return clients * requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--vocab", type=int, default=50000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(prefix="search-batching-") as workdir:
+        run(args, workdir)
+
+
+def run(args, workdir: str):
+    rng = np.random.default_rng(0)
+    registry = ModelRegistry(f"{workdir}/models")
+    words = [f"w{i}" for i in range(args.vocab)]
+    registry.publish(rng.standard_normal((args.vocab, args.dim)).astype(np.float32), {w: i for i, w in enumerate(words)})
+    embedder = TorchSkipGramEmbedderAdapter(registry=registry)
+
+    store = MmapSegmentVectorDBAdapter(f"{workdir}/segments", dim=args.dim, compaction_interval=0)
+    try:
+        bench_store(args, rng, words, embedder, store)
+    finally:
+        store.close()
+
+
+def bench_store(args, rng, words, embedder, store):
+    for start in range(0, args.n, 50000):
+        end = min(start + 50000, args.n)
+        vectors = rng.standard_normal((end - start, args.dim)).astype(np.float32)
+        store.insert_many([str(i) for i in range(start, end)], vectors, [{} for _ in range(end - start)])
+    vector_db = build_async_vector_db("mmap", sync_db=store)
+    queries = [" ".join(rng.choice(words, size=12)) for _ in range(1000)]
+
+    async def unbatched(text):
+        vector = (await run_cpu(embedder.encode, [text]))[0]
+        return await vector_db.query(vector, top_k=args.top_k)
+
+    batcher = QueryBatcher(embedder, vector_db, window_ms=args.window_ms, max_batch=args.max_batch)
+
+    async def batched(text):
+        return await batcher.search(text, top_k=args.top_k)
+
+    async def bench():
+        qps_plain = await run_clients(unbatched, queries, args.clients, args.requests)
+        qps_batched = await run_clients(batched, queries, args.clients, args.requests)
+        return qps_plain, qps_batched
+
+    qps_plain, qps_batched = asyncio.run(bench())
+    stats = batcher.stats()
+    print(f"index: {args.n} x {args.dim}, clients: {args.clients}")
+    print(f"unbatched   {qps_plain:>8.1f} QPS")
+    print(f"batched     {qps_batched:>8.1f} QPS  ({qps_batched / qps_plain:.1f}x)")
+    print(f"mean batch  {stats['mean_batch_size']:>8.1f}  (max {stats['max_batch_size']}, {stats['batches']} batches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import meta, upload, embed, search, json_rcp, train
+from app.routes import meta, health, upload, embed, search, json_rcp, train, ingest, metrics
+from app.services.container import container
+from app.utils.config import settings
+from app.utils.logger import setup_logging
 
-app = FastAPI(title="Landing Agent MCP Server")
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the server starts accepting requests right away; /health/ready reports when warmup is done
+    if settings.WARMUP_ON_STARTUP:
+        asyncio.get_running_loop().run_in_executor(None, container.warmup)
+    yield
+    await container.aclose()
+
+
+app = FastAPI(title="Landing Agent MCP Server", lifespan=lifespan)
 
 app.include_router(meta.router)
+app.include_router(health.router)
 app.include_router(upload.router)
 app.include_router(embed.router)
 app.include_router(search.router)
 app.include_router(json_rcp.router)
 app.include_router(train.router)
+app.include_router(ingest.router)
+app.include_router(metrics.router)
 
 app.add_middleware(
     CORSMiddleware,
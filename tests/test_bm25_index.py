@@ -0,0 +1,164 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.adapters.lexical.bm25_index import BM25Index, _append_varint, decode_varints, encode_varints, tokenize
+
+VOCABULARY = ["alpha", "beta", "gamma", "delta", "err-404", "v2.3", "x86_64", "zeta", "eta", "theta", "iota", "kappa"]
+
+
+def _index(tmp_path):
+    index = BM25Index(index_path=str(tmp_path / "bm25.npz"))
+    index.persist_every = 0
+    return index
+
+
+def _random_document(rng):
+    weights = rng.dirichlet(np.full(len(VOCABULARY), 0.3))
+    return [
+        " ".join(rng.choice(VOCABULARY, size=int(rng.integers(1, 12)), p=weights))
+        for _ in range(int(rng.integers(1, 6)))
+    ]
+
+
+def _naive_scores(documents, query, k1, b, doc_ids=None):
+    """BM25 straight from the definition, over every live chunk."""
+    chunks = [(doc_id, i, Counter(tokenize(text))) for doc_id, texts in documents.items() for i, text in enumerate(texts)]
+    avgdl = sum(sum(c.values()) for _, _, c in chunks) / len(chunks)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(1 for _, _, counts in chunks if term in counts)
+        idf = math.log(1.0 + (len(chunks) - df + 0.5) / (df + 0.5))
+        for doc_id, i, counts in chunks:
+            tf = counts.get(term, 0)
+            if tf and (doc_ids is None or doc_id in doc_ids):
+                length = sum(counts.values())
+                score = idf * (k1 + 1.0) * tf / (tf + k1 * (1.0 - b + b * length / avgdl))
+                scores[(doc_id, i)] = scores.get((doc_id, i), 0.0) + score
+    return scores
+
+
+def _assert_matches_naive(index, documents, query, doc_ids=None):
+    results = index.search(query, top_k=10 ** 6, doc_ids=doc_ids)
+    expected = _naive_scores(documents, query, index.k1, index.b, doc_ids)
+    got = {(r["doc_id"], r["chunk_index"]): r["score"] for r in results}
+    assert got.keys() == expected.keys()
+    for key, score in expected.items():
+        assert got[key] == pytest.approx(score, rel=1e-5)
+    assert [r["score"] for r in results] == sorted(got.values(), reverse=True)
+
+
+def _postings(index, term):
+    cids, tfs = index._decode(index._postings[term])
+    return cids.tolist(), tfs.astype(int).tolist()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_varints_round_trip_and_match_the_scalar_encoder(seed):
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([
+        [0, 1, 127, 128, 16383, 16384, 2 ** 32, 2 ** 63 - 1],
+        rng.integers(0, 2 ** int(rng.integers(1, 63)), size=200),
+    ]).astype(np.int64)
+
+    encoded = encode_varints(values)
+    scalar = bytearray()
+    for value in values.tolist():
+        _append_varint(scalar, value)
+
+    assert encoded == bytes(scalar)
+    np.testing.assert_array_equal(decode_varints(encoded), values)
+    assert encode_varints(np.empty(0, dtype=np.int64)) == b"" and len(decode_varints(b"")) == 0
+
+
+def test_pending_postings_encode_positions_as_deltas_from_the_previous_document(tmp_path):
+    index = _index(tmp_path)
+    index.add_document("a", ["alpha beta", "gamma"])
+    index.add_document("b", ["beta beta", "alpha", "gamma alpha alpha", "delta"])
+
+    # chunk ids: a -> 0, 1; b -> 2, 3, 4, 5
+    assert _postings(index, "alpha") == ([0, 3, 4], [1, 1, 2])
+    assert _postings(index, "beta") == ([0, 2], [1, 2])
+    assert _postings(index, "gamma") == ([1, 4], [1, 1])
+    assert _postings(index, "delta") == ([5], [1])
+    assert index._last == {"alpha": 4, "beta": 2, "gamma": 4, "delta": 5}
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_search_matches_a_naive_scorer_through_adds_removes_and_compaction(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    index = _index(tmp_path)
+    documents = {}
+    for step in range(60):
+        doc_id = f"doc{int(rng.integers(0, 25))}"
+        if doc_id in documents and rng.random() < 0.4:
+            assert index.remove_document(doc_id)
+            del documents[doc_id]
+        else:
+            documents[doc_id] = _random_document(rng)  # re-adding replaces the document
+            index.add_document(doc_id, documents[doc_id])
+        if step % 20 == 19:
+            index.compact()
+            assert index._next == sum(map(len, documents.values()))
+        if documents:
+            query = " ".join(rng.choice(VOCABULARY, size=3))
+            _assert_matches_naive(index, documents, query)
+            subset = set(rng.choice(sorted(documents), size=min(3, len(documents)), replace=False).tolist())
+            _assert_matches_naive(index, documents, query, doc_ids=subset | {"missing"})
+    assert sorted(index.documents()) == sorted(documents)
+
+
+def test_compact_renumbers_live_chunks_densely(tmp_path):
+    index = _index(tmp_path)
+    index.add_document("a", ["alpha", "beta"])
+    index.add_document("b", ["alpha gamma"])
+    index.add_document("c", ["beta", "gamma gamma", "alpha"])
+    index.remove_document("b")
+
+    index.compact()
+
+    assert index._chunk_doc == ["a", "a", "c", "c", "c"]
+    assert index._doc_chunks == {"a": (0, 2), "c": (2, 3)}
+    assert _postings(index, "alpha") == ([0, 4], [1, 1])
+    assert _postings(index, "gamma") == ([3], [2])
+    assert index._last["gamma"] == 3
+    assert index._live[:5].all() and not index._live[5:].any()
+    index.add_document("d", ["gamma"])  # appends after the renumbered ids
+    assert _postings(index, "gamma") == ([3, 5], [2, 1])
+
+
+def test_in_documents_selects_the_chunk_spans_of_the_documents(tmp_path):
+    index = _index(tmp_path)
+    for doc_id, n in (("a", 2), ("b", 3), ("c", 1), ("d", 2)):
+        index.add_document(doc_id, ["alpha"] * n)
+    index.remove_document("c")
+
+    cids = np.arange(8)
+    assert np.flatnonzero(index._in_documents(cids, ["b", "d"])).tolist() == [2, 3, 4, 6, 7]
+    assert np.flatnonzero(index._in_documents(cids, ["a", "c", "zzz"])).tolist() == [0, 1]
+    assert not index._in_documents(cids, []).any()
+
+
+def test_snapshot_round_trip(tmp_path):
+    rng = np.random.default_rng(7)
+    index = _index(tmp_path)
+    documents = {f"doc{i}": _random_document(rng) for i in range(30)}
+    for doc_id, chunks in documents.items():
+        index.add_document(doc_id, chunks)
+    for doc_id in ("doc3", "doc11"):
+        index.remove_document(doc_id)
+        del documents[doc_id]
+    index.persist()
+
+    restored = _index(tmp_path)
+
+    assert restored.stats() | {"decoded_cached": 0} == index.stats() | {"decoded_cached": 0}
+    assert restored._postings == index._postings and restored._last == index._last
+    for query in ("alpha beta", "err-404 x86_64", "v2.3 kappa iota"):
+        assert restored.search(query, top_k=20) == index.search(query, top_k=20)
+        _assert_matches_naive(restored, documents, query)
+    restored.add_document("new", ["alpha alpha"])
+    documents["new"] = ["alpha alpha"]
+    _assert_matches_naive(restored, documents, "alpha")
@@ -0,0 +1,119 @@
+import os
+import sys
+
+import pytest
+
+from app.adapters.storage import migrate_docs
+from app.adapters.storage.compact_doc import CompactDocument, CompactDocumentWriter, write_document
+from app.adapters.storage.local_file_storage import LocalFileStorageAdapter
+from app.utils.chunk_splitter import split_into_chunks
+
+TEXT = "".join(
+    f"Párrafo {i}: la compresión de documentos — ñandú, 東京, emoji 🚀 — y algo de texto repetido. "
+    for i in range(60)
+).strip()
+CHUNKS = split_into_chunks(TEXT, max_chunk_size=120, overlap=30)
+
+
+def _compression(name):
+    if name == "zstd":
+        pytest.importorskip("zstandard")
+    return name
+
+
+@pytest.mark.parametrize("compression", ["none", "zstd"])
+@pytest.mark.parametrize("chunks", [
+    CHUNKS,
+    ["sin solape", "entre chunks", "", "entre chunks", "ñ"],
+    [],
+], ids=["overlapping", "disjoint", "empty"])
+def test_round_trip(tmp_path, compression, chunks):
+    path = str(tmp_path / "a.doc")
+
+    assert write_document(path, chunks, _compression(compression), block_size=64) == len(chunks)
+
+    assert not os.path.exists(f"{path}.tmp")
+    with CompactDocument(path) as doc:
+        assert len(doc) == len(chunks)
+        assert doc.chunks() == chunks
+        assert [doc.chunk(i) for i in range(len(chunks))] == chunks
+
+
+def test_overlapping_text_is_stored_once(tmp_path):
+    path = str(tmp_path / "a.doc")
+    write_document(path, CHUNKS)
+
+    with CompactDocument(path) as doc:
+        assert doc.text() == TEXT
+    assert os.path.getsize(path) < sum(len(c.encode("utf-8")) for c in CHUNKS)
+
+
+def test_zstd_blocks_are_decoded_independently(tmp_path):
+    _compression("zstd")
+    path = str(tmp_path / "a.doc")
+    write_document(path, CHUNKS, "zstd", block_size=100)
+
+    with CompactDocument(path) as doc:
+        assert len(doc.blocks) > 10
+        # a chunk straddling a block boundary, read without the rest of the document
+        assert doc.chunk(7) == CHUNKS[7]
+        assert doc.text() == TEXT
+
+
+def test_zstd_without_the_package_raises(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    with pytest.raises(RuntimeError, match="zstandard"):
+        CompactDocumentWriter(str(tmp_path / "a.doc"), "zstd")
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "a.doc"
+    path.write_bytes(b"\0" * 200)
+    with pytest.raises(ValueError):
+        CompactDocument(str(path))
+
+
+def _legacy_documents(path):
+    legacy = LocalFileStorageAdapter(str(path), storage_format="legacy")
+    return legacy, {legacy.save(chunks): chunks for chunks in (CHUNKS, ["uno", "dos", "tres"], CHUNKS[:3])}
+
+
+@pytest.mark.parametrize("compression", ["none", "zstd"])
+def test_migrate_legacy_documents(tmp_path, compression):
+    _, documents = _legacy_documents(tmp_path)
+    converted = sorted(documents)[0]
+    LocalFileStorageAdapter(str(tmp_path), storage_format="compact").write_compact(converted, documents[converted])
+
+    report = migrate_docs.migrate(str(tmp_path), _compression(compression), remove_legacy=True)
+
+    assert report["migrated"] == 2 and report["skipped"] == 1 and report["failed"] == []
+    assert report["bytes_after"] < report["bytes_before"]
+    compact = LocalFileStorageAdapter(str(tmp_path), storage_format="compact")
+    for doc_id, chunks in documents.items():
+        assert os.path.exists(tmp_path / f"{doc_id}.doc")
+        assert compact.load(doc_id) == chunks
+        assert compact.load_chunk(doc_id, 1) == chunks[1]
+        migrated = doc_id != converted
+        assert os.path.exists(tmp_path / f"{doc_id}.txt") != migrated
+        assert os.path.exists(tmp_path / f"{doc_id}.chunks") != migrated
+
+
+def test_migrate_dry_run_and_failed_verification(tmp_path, monkeypatch):
+    _, documents = _legacy_documents(tmp_path)
+
+    report = migrate_docs.migrate(str(tmp_path), dry_run=True)
+    assert report["migrated"] == 3
+    assert not any(name.endswith(".doc") for name in os.listdir(tmp_path))
+
+    class Corrupted(CompactDocument):
+        def chunks(self):
+            return super().chunks()[:-1]
+
+    monkeypatch.setattr(migrate_docs, "CompactDocument", Corrupted)
+    report = migrate_docs.migrate(str(tmp_path), remove_legacy=True)
+
+    assert report["migrated"] == 0 and sorted(report["failed"]) == sorted(documents)
+    legacy = LocalFileStorageAdapter(str(tmp_path), storage_format="legacy")
+    for doc_id, chunks in documents.items():
+        assert not os.path.exists(tmp_path / f"{doc_id}.doc")
+        assert legacy.load(doc_id) == chunks
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("hnswlib")
+
+from app.adapters.vector_db.hnsw_db import HNSWVectorDBAdapter
+
+DIM = 8
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def _index(tmp_path):
+    index = HNSWVectorDBAdapter(dim=DIM, index_path=str(tmp_path / "hnsw.npz"))
+    index.persist_every = 0
+    return index
+
+
+def _top_ids(index, q, k=5):
+    return [r["id"] for r in index.query(q, k)]
+
+
+def _exact_ids(vectors, ids, q, k=5):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [ids[i] for i in np.argsort(-(unit @ q))[:k]]
+
+
+def test_compact_drops_replaced_nodes_and_keeps_results(tmp_path):
+    index = _index(tmp_path)
+    ids = [f"d{i % 4}:{i}" for i in range(300)]
+    for seed in range(3):
+        vectors = _vectors(300, seed=seed)
+        index.insert_many(ids, vectors, [{"doc_id": id.split(":")[0]} for id in ids])
+    assert len(index._ids) == 900 and len(index) == 300
+
+    assert index.compact() == 600
+
+    assert len(index._ids) == 300 and not index._deleted
+    for q in _vectors(20, seed=9):
+        assert _top_ids(index, q) == _exact_ids(vectors, ids, q / np.linalg.norm(q))
+    assert _top_ids(index, vectors[7], 1) == [ids[7]]
+    assert [r["id"] for r in index.query(vectors[7], 3, {"doc_id": "d3"})][0] == ids[7]
+    assert index.document_vector_ids("d1") == [id for id in ids if id.startswith("d1:")]
+
+
+def test_deletes_past_the_threshold_trigger_compaction(tmp_path):
+    index = _index(tmp_path)
+    ids = [str(i) for i in range(2000)]
+    index.insert_many(ids, _vectors(2000), [{} for _ in ids])
+
+    for id in ids[:1023]:
+        index.delete(id)
+    assert len(index._ids) == 2000
+
+    index.delete(ids[1023])  # 1024 tombstones, over 30% of the nodes
+    assert len(index._ids) == len(index) == 976
+    assert not index._deleted
+
+
+def test_compact_replays_writes_made_during_the_rebuild(tmp_path, monkeypatch):
+    index = _index(tmp_path)
+    ids = [str(i) for i in range(100)]
+    vectors = _vectors(100)
+    index.insert_many(ids, vectors, [{} for _ in ids])
+    for id in ids[:50]:
+        index.delete(id)
+
+    new_graph = index._new_graph
+
+    def build_while_writing(capacity):
+        index.delete("60")
+        index.insert("70", vectors[0], {"replaced": True})
+        index.insert("new", vectors[1], {})
+        return new_graph(capacity)
+
+    monkeypatch.setattr(index, "_new_graph", build_while_writing)
+    index.compact()
+
+    assert len(index) == 50 and "60" not in index._node_of
+    assert index.query(vectors[0], 1)[0] == {"id": "70", "score": pytest.approx(1.0, abs=1e-5), "metadata": {"replaced": True}}
+    assert _top_ids(index, vectors[1], 1) == ["new"]
+    assert all(r["id"] != "60" for r in index.query(vectors[60], 50))
+
+
+def test_snapshot_round_trip_after_compaction(tmp_path):
+    index = _index(tmp_path)
+    ids = [str(i) for i in range(200)]
+    vectors = _vectors(200)
+    index.insert_many(ids, vectors, [{"doc_id": "d"} for _ in ids])
+    for id in ids[::2]:
+        index.delete(id)
+    index.compact()
+    index.persist()
+
+    restored = _index(tmp_path)
+
+    assert len(restored) == 100
+    assert restored.list_documents() == ["d"]
+    for q in _vectors(10, seed=3):
+        assert restored.query(q, 5) == index.query(q, 5)
+    np.testing.assert_allclose(restored.fetch_vectors(["1", "2"]), index.fetch_vectors(["1", "2"]))
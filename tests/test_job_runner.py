@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from app.services.training import job_runner
+from app.services.training.job_runner import TrainingJobRunner, TrainingQueueFull
+
+
+def _stub_training_job(doc_ids, epochs, options, events, cancel_event):
+    """Stand-in for _run_training_job (spawned, so it lives at module level)."""
+    mode = options.get("mode")
+    if mode == "complete":
+        for epoch in range(1, epochs + 1):
+            events.put(("progress", {"epoch": epoch, "loss": 1.0 / epoch, "pairs": 10, "pairs_per_sec": 100.0}))
+        events.put(("completed", {"docs": len(doc_ids)}))
+    elif mode == "wait":  # runs until asked to stop
+        while not cancel_event.wait(0.05):
+            pass
+        events.put(("cancelled", None))
+    elif mode == "ignore_cancel":
+        time.sleep(60)
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setattr(job_runner, "_run_training_job", _stub_training_job)
+    runner = TrainingJobRunner(max_queued=2, cancel_grace=0.5)
+    yield runner
+    for job in runner.list():
+        runner.cancel(job["job_id"])
+    for job in runner.list():
+        _wait_for(runner, job["job_id"], lambda job: job is None or job["status"] not in ("queued", "running"))
+
+
+def _wait_for(runner, job_id, condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if condition(job):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} stuck in {runner.get(job_id)}")
+
+
+def _running(runner, job):
+    return _wait_for(runner, job["job_id"], lambda job: job["status"] == "running")
+
+
+def test_completed_job_reports_progress_and_result(runner):
+    job = runner.submit(["a", "b"], 3, mode="complete")
+
+    done = _wait_for(runner, job["job_id"], lambda job: job["status"] == "completed")
+
+    assert done["result"] == {"docs": 2}
+    assert [event["epoch"] for event in done["history"]] == [1, 2, 3]
+    assert done["progress"] == {"epoch": 3, "epochs": 3, "loss": pytest.approx(1 / 3), "pairs_per_sec": 100.0}
+    assert done["finished_at"] >= done["started_at"] >= done["created_at"]
+
+
+def test_queue_is_bounded_and_cancelling_a_queued_job_frees_its_slot(runner):
+    running = runner.submit(["a"], 1, mode="wait")
+    _running(runner, running)
+    first = runner.submit(["b"], 1, mode="complete")
+    runner.submit(["c"], 1, mode="complete")
+
+    with pytest.raises(TrainingQueueFull):
+        runner.submit(["d"], 1, mode="complete")
+
+    assert runner.cancel(first["job_id"])
+    assert runner.get(first["job_id"])["status"] == "cancelled"
+    assert not runner.cancel(first["job_id"])  # already finished
+    runner.submit(["d"], 1, mode="complete")
+    assert runner.get(running["job_id"])["status"] == "running"
+
+
+def test_cancel_while_running(runner):
+    job = runner.submit(["a"], 1, mode="wait")
+    _running(runner, job)
+
+    assert runner.cancel(job["job_id"])
+
+    done = _wait_for(runner, job["job_id"], lambda job: job["status"] == "cancelled")
+    assert done["error"] is None and done["result"] is None
+
+
+def test_cancel_terminates_a_job_that_ignores_it_after_the_grace_period(runner):
+    job = runner.submit(["a"], 1, mode="ignore_cancel")
+    _running(runner, job)
+
+    started = time.monotonic()
+    runner.cancel(job["job_id"])
+    _wait_for(runner, job["job_id"], lambda job: job["status"] == "cancelled")
+
+    assert time.monotonic() - started >= runner.cancel_grace
+    queued = runner.submit(["b"], 1, mode="complete")  # the dispatcher moves on
+    _wait_for(runner, queued["job_id"], lambda job: job["status"] == "completed")
+
+
+def test_finished_jobs_are_pruned_by_count_and_age(runner):
+    runner.max_queued = 10
+    runner.keep_finished = 2
+    running = runner.submit(["a"], 1, mode="wait")
+    _running(runner, running)
+    queued = [runner.submit([str(i)], 1, mode="complete") for i in range(4)]
+
+    for job in queued:
+        runner.cancel(job["job_id"])
+
+    kept = [job["job_id"] for job in runner.list() if job["status"] == "cancelled"]
+    assert kept == [job["job_id"] for job in queued[-2:]]
+
+    runner.finished_ttl = 0.0
+    fresh = runner.submit(["z"], 1, mode="complete")  # submit prunes expired jobs
+    assert {job["job_id"] for job in runner.list()} == {running["job_id"], fresh["job_id"]}
@@ -0,0 +1,130 @@
+import json
+import os
+
+import numpy as np
+
+from app.adapters.vector_db.mmap_db import MmapSegmentVectorDBAdapter, _Segment
+
+DIM = 8
+
+
+def _vectors(n, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _store(path, segment_size=16):
+    return MmapSegmentVectorDBAdapter(str(path), dim=DIM, segment_size=segment_size, compaction_interval=0)
+
+
+def _insert(store, ids, vectors):
+    store.insert_many(ids, vectors, [{"doc_id": f"d{int(id) % 3}", "n": int(id)} for id in ids])
+
+
+def test_segment_append_and_records(tmp_path):
+    segment = _Segment(str(tmp_path), "seg", DIM, capacity=8, count=0, create=True)
+    vectors = _vectors(5)
+
+    assert segment.append(vectors[:3], [{"id": str(i)} for i in range(3)]) == 0
+    assert segment.append(vectors[3:], [{"id": "x", "metadata": {"ü": 1}}, {"id": "y"}]) == 3
+
+    assert segment.count == 5 and not segment.full
+    np.testing.assert_array_equal(segment.vectors[:5], vectors)
+    assert segment.record(3) == {"id": "x", "metadata": {"ü": 1}}
+    assert segment.records(np.array([4, 0, 3])) == [{"id": "y"}, {"id": "0"}, {"id": "x", "metadata": {"ü": 1}}]
+    assert segment.records(np.array([], dtype=np.int64)) == []
+    segment.close()
+
+
+def test_tombstone_bitmap(tmp_path):
+    segment = _Segment(str(tmp_path), "seg", DIM, capacity=20, count=0, create=True)
+    segment.append(_vectors(20), [{"id": str(i)} for i in range(20)])
+
+    for row in (0, 7, 8, 19):
+        segment.mark_dead(row)
+    segment.mark_dead(8)  # idempotent
+
+    assert np.flatnonzero(segment.dead_mask()).tolist() == [0, 7, 8, 19]
+    assert segment.dead_count() == 4
+    assert len(segment.tomb) == 3  # one bit per row
+    segment.flush()
+    segment.close()
+
+    reopened = _Segment(str(tmp_path), "seg", DIM, capacity=20, count=20)
+    assert np.flatnonzero(reopened.dead_mask()).tolist() == [0, 7, 8, 19]
+    reopened.close()
+
+
+def test_compaction_rewrites_sealed_segments(tmp_path):
+    store = _store(tmp_path)
+    ids = [str(i) for i in range(40)]
+    vectors = _vectors(40)
+    _insert(store, ids, vectors)
+    first = store.segments[0]
+    for id in ids[:8]:  # half of the first (sealed) segment
+        store.delete(id)
+
+    assert store.compact() == 1
+
+    assert first not in store.segments and not os.path.exists(first.path(".vec"))
+    assert store.segments[0].count == 8 and store.segments[0].dead_count() == 0
+    assert sum(s.count for s in store.segments) == 32
+    for i in (8, 15, 16, 39):
+        assert store.query(vectors[i], 1)[0]["id"] == ids[i]
+    np.testing.assert_allclose(store.fetch_vectors(["9", "3"]), np.stack([vectors[9], np.zeros(DIM)]), atol=1e-6)
+    store.close()
+
+
+def test_insert_delete_compact_reopen_round_trip(tmp_path):
+    store = _store(tmp_path)
+    ids = [str(i) for i in range(50)]
+    vectors = _vectors(50)
+    _insert(store, ids, vectors)
+    store.delete("3")
+    store.delete_documents(["d1"])
+    _insert(store, ["4", "50"], _vectors(2, seed=1))  # "4" (doc d1) moves to a new row
+    store.compact()
+    expected = {id: store.query(vectors[int(id)], 3) for id in ("0", "2", "20", "49")}
+    documents = sorted(store.list_documents())
+    members = store.document_vector_ids("d1")
+    store.close()
+
+    reopened = _store(tmp_path)
+
+    assert sorted(reopened.list_documents()) == documents
+    assert reopened.document_vector_ids("d1") == members == ["4"]
+    for id, results in expected.items():
+        assert reopened.query(vectors[int(id)], 3) == results
+    assert reopened.query(_vectors(2, seed=1)[0], 1)[0]["id"] == "4"
+    assert all(r["id"] != "3" for r in reopened.query(vectors[3], 50))
+    assert [r["id"] for r in reopened.query(vectors[5], 1, {"doc_id": "d2"})] == ["5"]
+    reopened.close()
+
+
+def test_rows_written_after_the_last_manifest_are_dropped_on_reopen(tmp_path):
+    store = _store(tmp_path)
+    vectors = _vectors(14)
+    _insert(store, [str(i) for i in range(10)], vectors[:10])
+    store.persist()
+    store.manifest_every = 10 ** 9
+    _insert(store, ["10", "11", "12", "13"], vectors[10:])  # sidecar lines and rows past the manifest count
+    for segment in store.segments:  # crash: no manifest write
+        segment.close()
+
+    with open(tmp_path / MmapSegmentVectorDBAdapter.manifest_name) as f:
+        assert [s["count"] for s in json.load(f)["segments"]] == [10]
+    reopened = _store(tmp_path)
+    assert all(r["id"] not in {"10", "11", "12", "13"} for r in reopened.query(vectors[11], 14))
+    assert reopened.query(vectors[2], 1)[0]["id"] == "2"
+
+    # new rows reuse the row numbers; their records are found through the offsets file,
+    # past the orphaned sidecar lines
+    reopened.insert("new", vectors[12], {"doc_id": "dn"})
+    hit = reopened.query(vectors[12], 1)[0]
+    assert (hit["id"], hit["metadata"]) == ("new", {"doc_id": "dn"})
+    reopened.close()
+
+    again = _store(tmp_path)
+    assert again.document_vector_ids("dn") == ["new"]
+    assert len(again.query(vectors[0], 20)) == 11
+    again.close()
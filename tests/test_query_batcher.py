@@ -0,0 +1,67 @@
+import asyncio
+import gc
+
+from app.services.embedding.query_batcher import QueryBatcher
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class FakeVectorDB:
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def query_many(self, vectors, top_k=5, filters=None):
+        self.calls.append((len(vectors), top_k, filters))
+        await self.release.wait()
+        return [[{"id": f"{vector[0]:g}-{rank}"} for rank in range(top_k)] for vector in vectors]
+
+
+def test_concurrent_searches_share_one_batch_and_keep_their_own_top_k():
+    async def main():
+        embedder, vector_db = FakeEmbedder(), FakeVectorDB()
+        batcher = QueryBatcher(embedder, vector_db, window_ms=50, max_batch=64)
+        searches = [
+            asyncio.ensure_future(batcher.search(text, top_k=top_k, filters=filters))
+            for text, top_k, filters in (
+                ("a", 1, None), ("bb", 3, None), ("ccc", 2, {"doc_id": "d"}), ("dddd", 5, None),
+            )
+        ]
+        while not vector_db.calls:
+            await asyncio.sleep(0.01)
+        assert len(batcher._tasks) == 1  # the in-flight batch is referenced
+        gc.collect()
+        vector_db.release.set()
+        results = await asyncio.gather(*searches)
+        await asyncio.sleep(0)
+        return embedder, vector_db, batcher, results
+
+    embedder, vector_db, batcher, results = asyncio.run(main())
+
+    assert embedder.calls == [["a", "bb", "ccc", "dddd"]]
+    assert sorted(vector_db.calls, key=str) == sorted([(3, 5, None), (1, 2, {"doc_id": "d"})], key=str)
+    assert [[hit["id"] for hit in hits] for hits in results] == [
+        ["1-0"], ["2-0", "2-1", "2-2"], ["3-0", "3-1"], ["4-0", "4-1", "4-2", "4-3", "4-4"],
+    ]
+    assert batcher._tasks == set()
+    assert batcher.stats()["batch_sizes"] == {4: 1}
+
+
+def test_max_batch_dispatches_without_waiting_for_the_window():
+    async def main():
+        vector_db = FakeVectorDB()
+        vector_db.release.set()
+        batcher = QueryBatcher(FakeEmbedder(), vector_db, window_ms=60_000, max_batch=2)
+        return batcher, await asyncio.wait_for(asyncio.gather(batcher.search("a", 1), batcher.search("b", 1)), 5)
+
+    batcher, results = asyncio.run(main())
+
+    assert [hits[0]["id"] for hits in results] == ["1-0", "1-0"]
+    assert batcher.stats()["batch_sizes"] == {2: 1}
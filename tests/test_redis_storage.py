@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.adapters.vector_db import redis_db
+from app.utils.config import settings
+
+DIM = 16
+
+
+@pytest.fixture
+def make_adapter(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis_db.redis, "Redis", lambda **kw: fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(settings, "EMBEDDING_DIM", DIM)
+
+    def make(dtype, pq_subspaces=0, full_precision=False):
+        monkeypatch.setattr(settings, "VECTOR_STORAGE_DTYPE", dtype)
+        monkeypatch.setattr(settings, "VECTOR_PQ_SUBSPACES", pq_subspaces)
+        monkeypatch.setattr(settings, "VECTOR_RERANK_FULL_PRECISION", full_precision)
+        return redis_db.RedisVectorDBAdapter()
+
+    return make
+
+
+def _stored_bytes(adapter, id):
+    return sum(len(v) for k, v in adapter.client.hgetall(f"vec:{id}").items() if k in (b"vector", b"codes"))
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compressed_storage_without_pq_is_smaller_than_float32(make_adapter, dtype):
+    vectors = np.random.default_rng(0).standard_normal((50, DIM)).astype(np.float32)
+    ids = [str(i) for i in range(50)]
+    adapter = make_adapter(dtype)
+    adapter.insert_many(ids, vectors, [{"doc_id": "d"} for _ in ids])
+
+    assert not adapter.stores_full and not adapter.reranks
+    assert _stored_bytes(adapter, "0") < DIM * 4
+    assert adapter.query(vectors[3], 1)[0]["id"] == "3"
+    unit = vectors[:2] / np.linalg.norm(vectors[:2], axis=1, keepdims=True)
+    np.testing.assert_allclose(adapter.fetch_vectors(["0", "1"]), unit, atol=0.02)
+
+
+def test_int8_keeps_the_float32_blob_only_for_full_precision_rerank(make_adapter):
+    vectors = np.random.default_rng(1).standard_normal((50, DIM)).astype(np.float32)
+    ids = [str(i) for i in range(50)]
+    adapter = make_adapter("int8", full_precision=True)
+    adapter.insert_many(ids, vectors, [{} for _ in ids])
+
+    assert adapter.stores_full and adapter.reranks
+    assert _stored_bytes(adapter, "0") == DIM * 4 + DIM
+    np.testing.assert_array_equal(adapter.fetch_vectors(["7"])[0], vectors[7])
+    assert adapter.query(vectors[7], 1)[0]["id"] == "7"
@@ -0,0 +1,80 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.adapters.storage.local_file_storage import HASH_LOG, LocalFileStorageAdapter
+from app.services.storage.storage_service import StorageService
+
+TEXT = ("Contenido de prueba para la deduplicación de documentos. " * 40).encode()
+
+
+def test_first_streamed_upload_without_hash_log_is_kept(tmp_path):
+    adapter = LocalFileStorageAdapter(str(tmp_path))
+    service = StorageService(adapter)
+    service.dedup = True
+    assert not (tmp_path / HASH_LOG).exists()
+
+    doc_id = service.save_stream("a.txt", io.BytesIO(TEXT))
+
+    # the hash log is built from the files on disk, which already hold this upload:
+    # it must not be treated as a duplicate of itself
+    assert adapter.load(doc_id)
+    assert service.stats()["saved"] == 1 and service.stats()["duplicates"] == 0
+
+
+def test_second_identical_streamed_upload_reuses_doc_id(tmp_path):
+    adapter = LocalFileStorageAdapter(str(tmp_path))
+    service = StorageService(adapter)
+    service.dedup = True
+
+    first = service.save_stream("a.txt", io.BytesIO(TEXT))
+    second = service.save_stream("b.txt", io.BytesIO(TEXT))
+
+    assert second == first
+    assert adapter.load(first)
+    assert service.stats()["duplicates"] == 1
+
+
+def test_concurrent_identical_uploads_keep_a_single_copy(tmp_path, monkeypatch):
+    adapter = LocalFileStorageAdapter(str(tmp_path))
+    service = StorageService(adapter)
+    service.dedup = True
+    service.save_stream("other.txt", io.BytesIO(b"Otro documento distinto. " * 40))  # builds the hash log
+    written = threading.Barrier(8)
+    save_stream = adapter.save_stream
+
+    def save_then_wait(chunks):
+        doc_id = save_stream(chunks)
+        written.wait()  # every upload is on disk before any of them checks for duplicates
+        return doc_id
+
+    monkeypatch.setattr(adapter, "save_stream", save_then_wait)
+
+    def upload(i):
+        return service.save_stream(f"{i}.txt", io.BytesIO(TEXT))
+
+    with ThreadPoolExecutor(8) as pool:
+        doc_ids = list(pool.map(upload, range(8)))
+
+    assert len(set(doc_ids)) == 1
+    assert len(adapter.list_ids()) == 2
+    assert service.stats()["saved"] == 2 and service.stats()["duplicates"] == 7
+
+
+def test_claim_hash_is_won_by_exactly_one_document(tmp_path):
+    adapter = LocalFileStorageAdapter(str(tmp_path))
+    doc_ids = [adapter.save([f"chunk {i}"]) for i in range(16)]
+    adapter.find_by_hash("warm-up")  # build the hash log before the race
+    start = threading.Barrier(len(doc_ids))
+
+    def claim(doc_id):
+        start.wait()
+        return adapter.claim_hash("same-content", doc_id)
+
+    with ThreadPoolExecutor(len(doc_ids)) as pool:
+        results = list(pool.map(claim, doc_ids))
+
+    winners = [doc_id for doc_id, existing in zip(doc_ids, results) if existing is None]
+    assert len(winners) == 1
+    assert all(existing == winners[0] for existing in results if existing is not None)
+    assert adapter.find_by_hash("same-content") == winners[0]